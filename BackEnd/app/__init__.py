@@ -59,10 +59,19 @@ def create_app(config_name=None):
     @app.route('/health', methods=['GET'])
     def health_check():
         """Endpoint para verificar que el servidor está funcionando"""
+        from app.utils.local_cache import get_local_cache_stats
+        from app.utils.token_blocklist import token_blocklist
+        from app.utils.token_cache import token_cache
+        from app.utils.notification_stream import notification_stream
+
         return jsonify({
             'status': 'healthy',
             'service': 'Pisos Kermy API',
-            'version': '1.0.0'
+            'version': '1.0.0',
+            'local_cache': get_local_cache_stats(),
+            'token_blocklist': token_blocklist.stats(),
+            'token_cache': token_cache.stats(),
+            'notification_stream': notification_stream.stats()
         }), 200
 
     # Ruta raíz
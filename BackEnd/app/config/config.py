@@ -75,14 +75,59 @@ class Config:
     # Cache
     CACHE_DEFAULT_TIMEOUT = int(os.getenv('CACHE_DEFAULT_TIMEOUT', 300))
     CACHE_PRODUCT_TIMEOUT = int(os.getenv('CACHE_PRODUCT_TIMEOUT', 600))
+    CACHE_DASHBOARD_TIMEOUT = int(os.getenv('CACHE_DASHBOARD_TIMEOUT', 60))
+    # Caché local por worker delante de Redis (invalidada por pub/sub)
+    LOCAL_CACHE_MAX_ENTRIES = int(os.getenv('LOCAL_CACHE_MAX_ENTRIES', 1024))
+    LOCAL_CACHE_TTL = int(os.getenv('LOCAL_CACHE_TTL', 30))
+    # Blocklist de JWT: filtro de Bloom por worker (capacidad, tasa de falsos
+    # positivos y reconstrucción desde MongoDB para descartar expirados)
+    TOKEN_BLOOM_CAPACITY = int(os.getenv('TOKEN_BLOOM_CAPACITY', 100000))
+    TOKEN_BLOOM_ERROR_RATE = float(os.getenv('TOKEN_BLOOM_ERROR_RATE', 0.001))
+    TOKEN_BLOOM_REBUILD_INTERVAL = int(os.getenv('TOKEN_BLOOM_REBUILD_INTERVAL', 3600))
+    # Caché por worker de claims y estado de revocación de tokens ya validados
+    TOKEN_CACHE_TTL = int(os.getenv('TOKEN_CACHE_TTL', 60))
+    TOKEN_CACHE_MAX_ENTRIES = int(os.getenv('TOKEN_CACHE_MAX_ENTRIES', 4096))
+    # Antigüedad máxima del índice de autocompletado (reconstrucción en segundo plano)
+    SUGGEST_INDEX_MAX_AGE = int(os.getenv('SUGGEST_INDEX_MAX_AGE', 300))
+    
+    # Catálogo: intervalo de la sincronización incremental de categorías/tags
+    CATALOG_SYNC_INTERVAL = int(os.getenv('CATALOG_SYNC_INTERVAL', 300))
+    # Renombres: lote por rango de _id, ritmo máximo (productos/s, 0 = sin
+    # límite) y reanudación de renombres interrumpidos o fallidos
+    CATALOG_RENAME_BATCH_SIZE = int(os.getenv('CATALOG_RENAME_BATCH_SIZE', 500))
+    CATALOG_RENAME_MAX_PER_SECOND = int(os.getenv('CATALOG_RENAME_MAX_PER_SECOND', 2000))
+    CATALOG_RENAME_RECOVERY_INTERVAL = int(os.getenv('CATALOG_RENAME_RECOVERY_INTERVAL', 600))
+    CATALOG_RENAME_STALE_SECONDS = int(os.getenv('CATALOG_RENAME_STALE_SECONDS', 600))
+    CATALOG_RENAME_MAX_ATTEMPTS = int(os.getenv('CATALOG_RENAME_MAX_ATTEMPTS', 3))
     
     # Reservations
     RESERVATION_HOLD_HOURS = int(os.getenv('RESERVATION_HOLD_HOURS', 24))
+    # La expiracion es por eventos; este intervalo es solo el barrido de reconciliacion
     RESERVATION_EXPIRY_CHECK_INTERVAL = int(
-        os.getenv('RESERVATION_EXPIRY_CHECK_INTERVAL', 300)
+        os.getenv('RESERVATION_EXPIRY_CHECK_INTERVAL', 1800)
     )
+    # Lotes reclamados hace mas de estos segundos sin liberar su stock se
+    # vuelven a liberar en el barrido (fallo a mitad de lote sin transaccion)
+    RESERVATION_EXPIRY_CLAIM_STALE_SECONDS = int(
+        os.getenv('RESERVATION_EXPIRY_CLAIM_STALE_SECONDS', 300)
+    )
+    
+    # Exportaciones: tamaño de lote del cursor y bytes en memoria antes de
+    # volcar el XLSX a un archivo temporal
+    EXPORT_BATCH_SIZE = int(os.getenv('EXPORT_BATCH_SIZE', 1000))
+    EXPORT_SPOOL_MAX_BYTES = int(os.getenv('EXPORT_SPOOL_MAX_BYTES', 8388608))
+    # Exportaciones en segundo plano: hilos, carpeta de archivos y expiración
+    EXPORT_MAX_WORKERS = int(os.getenv('EXPORT_MAX_WORKERS', 2))
+    EXPORT_FOLDER = os.getenv('EXPORT_FOLDER', 'exports')
+    EXPORT_TTL_SECONDS = int(os.getenv('EXPORT_TTL_SECONDS', 86400))
+    EXPORT_CLEANUP_INTERVAL = int(os.getenv('EXPORT_CLEANUP_INTERVAL', 900))
+    # Jobs en ejecución sin actualizar progreso en este tiempo se consideran interrumpidos
+    EXPORT_STALE_SECONDS = int(os.getenv('EXPORT_STALE_SECONDS', 1800))
     
     # Notifications
+    # Stream SSE: intervalo del keepalive (s) y eventos en cola por conexión
+    NOTIFICATION_STREAM_HEARTBEAT = int(os.getenv('NOTIFICATION_STREAM_HEARTBEAT', 15))
+    NOTIFICATION_STREAM_QUEUE_SIZE = int(os.getenv('NOTIFICATION_STREAM_QUEUE_SIZE', 100))
     NOTIFICATION_SAME_DAY_EXPIRY_HOUR = int(
         os.getenv('NOTIFICATION_SAME_DAY_EXPIRY_HOUR', 9)
     )
@@ -107,6 +152,12 @@ class Config:
     PASSWORD_REQUIRE_SPECIAL_CHAR = (
         os.getenv('PASSWORD_REQUIRE_SPECIAL_CHAR', 'True').lower() == 'true'
     )
+    # Hash de contraseñas (bcrypt): costo, hilos por proceso y cola máxima
+    # antes de responder 503 (ver utils/password_hasher)
+    PASSWORD_HASH_ROUNDS = int(os.getenv('PASSWORD_HASH_ROUNDS', 12))
+    PASSWORD_HASH_WORKERS = int(os.getenv('PASSWORD_HASH_WORKERS', 2))
+    PASSWORD_HASH_MAX_QUEUE = int(os.getenv('PASSWORD_HASH_MAX_QUEUE', 16))
+    PASSWORD_HASH_QUEUE_TIMEOUT = float(os.getenv('PASSWORD_HASH_QUEUE_TIMEOUT', 2))
 
 
 class DevelopmentConfig(Config):
@@ -126,6 +177,7 @@ class TestingConfig(Config):
         'db': 'pisos_kermy_test_db',
     }
     REDIS_DB = 1  # Usar diferente DB de Redis para testing
+    PASSWORD_HASH_ROUNDS = 4  # Costo mínimo de bcrypt para pruebas rápidas
 
 
 class ProductionConfig(Config):
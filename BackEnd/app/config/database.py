@@ -7,6 +7,9 @@ from mongoengine import connect, disconnect
 import redis
 from functools import wraps
 from pymongo import MongoClient
+import logging
+
+logger = logging.getLogger(__name__)
 
 
 # ============================================================================
@@ -83,6 +86,23 @@ def init_pymongo(app):
         raise
 
 
+def init_indexes(app):
+    """
+    Aplica el manifiesto de índices (app/config/indexes.py) sobre la database compartida
+    Es idempotente: se ejecuta en cada arranque sin recrear índices existentes
+    """
+    from app.config.indexes import ensure_indexes
+
+    try:
+        results = ensure_indexes(mongo_db)
+        app.logger.info(
+            f"✓ Índices de MongoDB verificados ({results['created']} ok, {results['errors']} con error)"
+        )
+    except Exception as e:
+        # Un fallo creando índices no debe impedir el arranque
+        app.logger.error(f"✗ Error al crear índices de MongoDB: {str(e)}")
+
+
 def init_redis(app):
     """
     Inicializa la conexión a Redis
@@ -124,6 +144,7 @@ def init_db(app):
     """
     init_mongodb(app)
     init_pymongo(app)  # Nuevo: inicializar PyMongo con pooling
+    init_indexes(app)
     init_redis(app)
 
 
@@ -179,6 +200,91 @@ def get_db():
     return mongo_db
 
 
+# ============================================================================
+# TRANSACCIONES - UNIDAD DE TRABAJO SOBRE UN REPLICA SET
+# ============================================================================
+_transactions_supported = None
+
+# id(sesión) -> funciones a ejecutar tras el commit (ver after_commit)
+_after_commit_hooks = {}
+
+
+def transactions_supported():
+    """
+    Verifica (una sola vez) si el servidor admite transacciones multi-documento
+    Requiere un replica set (aunque sea de un solo nodo) o un mongos
+    """
+    global _transactions_supported
+
+    if _transactions_supported is None:
+        get_db()
+        try:
+            hello = mongo_client.admin.command('hello')
+            _transactions_supported = bool(hello.get('setName')) or hello.get('msg') == 'isdbgrid'
+        except Exception as e:
+            logger.error(f"No se pudo determinar soporte de transacciones: {str(e)}")
+            _transactions_supported = False
+
+        if not _transactions_supported:
+            logger.warning(
+                "MongoDB no es un replica set: las operaciones se ejecutarán sin transacción"
+            )
+
+    return _transactions_supported
+
+
+def run_in_transaction(callback):
+    """
+    Ejecuta callback(session) dentro de una transacción multi-documento
+
+    Usa ClientSession.with_transaction, que reintenta el callback completo ante
+    TransientTransactionError (p.ej. conflictos de escritura) y el commit ante
+    UnknownTransactionCommitResult. Por eso el callback debe releer el estado
+    que necesita usando la sesión recibida.
+
+    Si el servidor no es un replica set (entorno de desarrollo standalone), el
+    callback se ejecuta sin transacción con session=None.
+
+    Returns:
+        El valor retornado por callback
+    """
+    if not transactions_supported():
+        return callback(None)
+
+    with mongo_client.start_session() as session:
+        hooks = []
+        _after_commit_hooks[id(session)] = hooks
+
+        def attempt(session):
+            # Un reintento vuelve a registrar lo que necesita
+            hooks.clear()
+            return callback(session)
+
+        try:
+            result = session.with_transaction(attempt)
+        finally:
+            _after_commit_hooks.pop(id(session), None)
+
+    # dict.fromkeys: cada función una sola vez, en orden de registro
+    for hook in dict.fromkeys(hooks):
+        hook()
+    return result
+
+
+def after_commit(session, hook):
+    """
+    Ejecuta hook() cuando la transacción de session confirme, o de inmediato
+    si no hay transacción (session=None o fuera de run_in_transaction).
+    Para efectos fuera de MongoDB, p.ej. invalidar cachés: ejecutados antes
+    del commit, una lectura concurrente podría volver a cachear datos viejos.
+    """
+    hooks = _after_commit_hooks.get(id(session)) if session is not None else None
+    if hooks is None:
+        hook()
+    else:
+        hooks.append(hook)
+
+
 # Decorador para verificar disponibilidad de Redis
 def require_redis(f):
     """
@@ -199,14 +305,20 @@ def require_redis(f):
 class RedisHelper:
     """
     Clase helper con métodos útiles para operaciones con Redis
+
+    Los errores se registran con el logger del módulo (no current_app) porque
+    también se usa desde jobs y hilos sin contexto de aplicación.
     """
 
+    # Prefijo de los contadores de generación de los namespaces versionados
+    GENERATION_PREFIX = "cache_gen"
+
     @staticmethod
     def set_with_expiry(key, value, expiry=None):
         """
         Guarda un valor en Redis con tiempo de expiración
         """
-        if not redis_client:
+        if not redis_client or key is None:
             return False
 
         try:
@@ -216,7 +328,7 @@ class RedisHelper:
                 redis_client.set(key, value)
             return True
         except Exception as e:
-            current_app.logger.error(f"Error al guardar en Redis: {str(e)}")
+            logger.error(f"Error al guardar en Redis: {str(e)}")
             return False
 
     @staticmethod
@@ -224,13 +336,13 @@ class RedisHelper:
         """
         Obtiene un valor de Redis
         """
-        if not redis_client:
+        if not redis_client or key is None:
             return None
 
         try:
             return redis_client.get(key)
         except Exception as e:
-            current_app.logger.error(f"Error al leer de Redis: {str(e)}")
+            logger.error(f"Error al leer de Redis: {str(e)}")
             return None
 
     @staticmethod
@@ -245,25 +357,31 @@ class RedisHelper:
             redis_client.delete(key)
             return True
         except Exception as e:
-            current_app.logger.error(f"Error al eliminar de Redis: {str(e)}")
+            logger.error(f"Error al eliminar de Redis: {str(e)}")
             return False
 
     @staticmethod
-    def delete_pattern(pattern):
+    def delete_pattern(pattern, batch_size=500):
         """
         Elimina todas las claves que coincidan con un patrón
-        Útil para invalidar caché de categorías completas
+        Usa SCAN (incremental, no bloquea Redis como KEYS) y UNLINK por lotes.
+        Para invalidar caché preferir bump_generation: esto es O(keyspace).
         """
         if not redis_client:
             return False
 
         try:
-            keys = redis_client.keys(pattern)
-            if keys:
-                redis_client.delete(*keys)
+            batch = []
+            for key in redis_client.scan_iter(match=pattern, count=batch_size):
+                batch.append(key)
+                if len(batch) >= batch_size:
+                    redis_client.unlink(*batch)
+                    batch = []
+            if batch:
+                redis_client.unlink(*batch)
             return True
         except Exception as e:
-            current_app.logger.error(f"Error al eliminar patrón de Redis: {str(e)}")
+            logger.error(f"Error al eliminar patrón de Redis: {str(e)}")
             return False
 
     @staticmethod
@@ -277,5 +395,66 @@ class RedisHelper:
         try:
             return redis_client.exists(key) > 0
         except Exception as e:
-            current_app.logger.error(f"Error al verificar existencia en Redis: {str(e)}")
+            logger.error(f"Error al verificar existencia en Redis: {str(e)}")
+            return False
+
+    @staticmethod
+    def publish(channel, message):
+        """
+        Publica un mensaje en un canal de Redis (pub/sub)
+        """
+        if not redis_client:
+            return False
+
+        try:
+            redis_client.publish(channel, message)
+            return True
+        except Exception as e:
+            logger.error(f"Error al publicar en Redis: {str(e)}")
+            return False
+
+    # ========================================================================
+    # NAMESPACES VERSIONADOS
+    # Las claves incluyen la generación actual del namespace; invalidar todo
+    # el namespace es un INCR (O(1)) y las claves viejas expiran por su TTL.
+    # ========================================================================
+    @staticmethod
+    def get_generation(namespace):
+        """
+        Obtiene la generación actual de un namespace (0 si nunca se invalidó)
+        Retorna None si Redis no está disponible o falla
+        """
+        if not redis_client:
+            return None
+
+        try:
+            return int(redis_client.get(f"{RedisHelper.GENERATION_PREFIX}:{namespace}") or 0)
+        except Exception as e:
+            logger.error(f"Error al leer generación de caché en Redis: {str(e)}")
+            return None
+
+    @staticmethod
+    def namespaced_key(namespace, key):
+        """
+        Construye la clave versionada <namespace>:v<generación>:<key>
+        Retorna None si no se pudo leer la generación (get/set lo ignoran)
+        """
+        generation = RedisHelper.get_generation(namespace)
+        if generation is None:
+            return None
+        return f"{namespace}:v{generation}:{key}"
+
+    @staticmethod
+    def bump_generation(namespace):
+        """
+        Invalida todas las claves de un namespace incrementando su generación
+        """
+        if not redis_client:
+            return False
+
+        try:
+            redis_client.incr(f"{RedisHelper.GENERATION_PREFIX}:{namespace}")
+            return True
+        except Exception as e:
+            logger.error(f"Error al invalidar namespace de caché en Redis: {str(e)}")
             return False
@@ -0,0 +1,186 @@
+"""
+Registro declarativo de índices de MongoDB
+Define los índices que necesitan las consultas de los repositorios y los
+aplica de forma idempotente al iniciar la aplicación (ver init_db)
+"""
+from pymongo import ASCENDING, DESCENDING, TEXT
+from pymongo.errors import OperationFailure
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+# ============================================================================
+# MANIFIESTO DE ÍNDICES - colección -> lista de índices
+# Cada índice lleva nombre explícito para que create_index sea idempotente
+# ============================================================================
+INDEXES = {
+    'products': [
+        # search_and_filter: filtro por estado y orden (nombre, _id) para el cursor
+        {'keys': [('estado', ASCENDING), ('nombre', ASCENDING), ('_id', ASCENDING)], 'name': 'estado_nombre_id'},
+        {'keys': [('nombre', ASCENDING), ('_id', ASCENDING)], 'name': 'nombre_id'},
+        {'keys': [('created_at', DESCENDING), ('_id', DESCENDING)], 'name': 'created_at_id_desc'},
+        # catalog_sync_job: productos modificados desde la marca de agua
+        {'keys': [('updated_at', ASCENDING)], 'name': 'updated_at'},
+        # Filtros por categoría/tag y lotes por rango de _id de los renombres
+        {'keys': [('categoria', ASCENDING), ('_id', ASCENDING)], 'name': 'categoria_id'},
+        {'keys': [('tags', ASCENDING), ('_id', ASCENDING)], 'name': 'tags_id'},
+        # Autocompletado: prefijo anclado sobre el nombre normalizado
+        {'keys': [('nombre_normalizado', ASCENDING), ('_id', ASCENDING)], 'name': 'nombre_normalizado_id'},
+        # Busqueda de texto completo (solo puede existir un indice text por coleccion)
+        # El analizador 'spanish' aplica stemming y es insensible a acentos
+        {
+            'keys': [
+                ('nombre', TEXT),
+                ('descripcion_embalaje', TEXT),
+                ('categoria', TEXT),
+                ('tags', TEXT),
+            ],
+            'name': 'products_text',
+            'default_language': 'spanish',
+            'language_override': 'idioma_busqueda',
+            'weights': {'nombre': 10, 'tags': 5, 'categoria': 3, 'descripcion_embalaje': 1},
+        },
+    ],
+    'variants': [
+        # VariantRepository.find_by_product_id
+        {'keys': [('product_id', ASCENDING)], 'name': 'product_id'},
+    ],
+    'inventory': [
+        # InventoryRepository.find_by_variant_id y todas las mutaciones de stock
+        {'keys': [('variant_id', ASCENDING)], 'name': 'variant_id'},
+        {'keys': [('actualizado_en', DESCENDING), ('_id', DESCENDING)], 'name': 'actualizado_en_id_desc'},
+        # Alertas de stock bajo: rango sobre el campo mantenido 'disponible'
+        {'keys': [('disponible', ASCENDING)], 'name': 'disponible'},
+    ],
+    'inventory_movements': [
+        # Historial paginado por cursor: orden (creado_en, _id)
+        {'keys': [('creado_en', DESCENDING), ('_id', DESCENDING)], 'name': 'creado_en_id_desc'},
+        {'keys': [('variant_id', ASCENDING), ('creado_en', DESCENDING), ('_id', DESCENDING)], 'name': 'variant_creado_en_id'},
+        {'keys': [('movement_type', ASCENDING), ('creado_en', DESCENDING), ('_id', DESCENDING)], 'name': 'movement_type_creado_en_id'},
+        # Filtro por actor en la pantalla de auditoría
+        {'keys': [('actor_id', ASCENDING), ('creado_en', DESCENDING), ('_id', DESCENDING)], 'name': 'actor_creado_en_id'},
+    ],
+    'reservations': [
+        # find_expired / find_expiring_today / contadores del dashboard
+        {'keys': [('state', ASCENDING), ('expires_at', ASCENDING)], 'name': 'state_expires_at'},
+        # Listados paginados por cursor: orden (created_at, _id)
+        {'keys': [('state', ASCENDING), ('created_at', DESCENDING), ('_id', DESCENDING)], 'name': 'state_created_at_id'},
+        {'keys': [('user_id', ASCENDING), ('created_at', DESCENDING), ('_id', DESCENDING)], 'name': 'user_created_at_id'},
+        {'keys': [('created_at', DESCENDING), ('_id', DESCENDING)], 'name': 'created_at_id_desc'},
+        # Barrido de expiración: lotes reclamados cuyo stock no se liberó
+        {
+            'keys': [('expiry_claimed_at', ASCENDING)],
+            'name': 'expiry_unreleased',
+            'partialFilterExpression': {'stock_released': False},
+        },
+    ],
+    'revoked_tokens': [
+        # token_blocklist: respaldo durable de la consulta de revocación
+        {'keys': [('jti', ASCENDING)], 'name': 'jti'},
+        # TTL: MongoDB elimina los tokens revocados cuando expiran
+        {'keys': [('expires_at', ASCENDING)], 'name': 'expires_at_ttl', 'expireAfterSeconds': 0},
+    ],
+    'in_app_notifications': [
+        {'keys': [('user_id', ASCENDING), ('created_at', DESCENDING), ('_id', DESCENDING)], 'name': 'user_created_at_id'},
+        {'keys': [('user_id', ASCENDING), ('read', ASCENDING), ('created_at', DESCENDING), ('_id', DESCENDING)], 'name': 'user_read_created_at_id'},
+    ],
+    'export_jobs': [
+        # Limpieza de exportaciones expiradas y de jobs interrumpidos
+        {'keys': [('expires_at', ASCENDING)], 'name': 'expires_at'},
+        {'keys': [('state', ASCENDING), ('updated_at', ASCENDING)], 'name': 'state_updated_at'},
+    ],
+    'catalog_renames': [
+        # Reanudación de renombres interrumpidos y bloqueo de borrado en curso
+        {'keys': [('state', ASCENDING), ('updated_at', ASCENDING)], 'name': 'state_updated_at'},
+        {'keys': [('entity_id', ASCENDING), ('state', ASCENDING)], 'name': 'entity_id_state'},
+    ],
+    'wishlists': [
+        {'keys': [('user_id', ASCENDING)], 'name': 'user_id'},
+    ],
+    'users': [
+        # Mismo nombre y opciones que el índice declarado en models/user.py (MongoEngine)
+        {'keys': [('email', ASCENDING)], 'name': 'email_1', 'unique': True},
+        {'keys': [('role', ASCENDING)], 'name': 'role'},
+    ],
+    'categories': [
+        {'keys': [('name', ASCENDING)], 'name': 'name'},
+        # Unicidad sin distinguir mayúsculas ni acentos (reemplaza las regex)
+        {
+            'keys': [('name_normalized', ASCENDING)],
+            'name': 'name_normalized_unique',
+            'unique': True,
+            'partialFilterExpression': {'name_normalized': {'$type': 'string'}},
+        },
+    ],
+    'tags': [
+        {'keys': [('name', ASCENDING)], 'name': 'name'},
+        {
+            'keys': [('name_normalized', ASCENDING)],
+            'name': 'name_normalized_unique',
+            'unique': True,
+            'partialFilterExpression': {'name_normalized': {'$type': 'string'}},
+        },
+    ],
+}
+
+
+def ensure_indexes(db):
+    """
+    Crea todos los índices del manifiesto
+    create_index no hace nada si el índice ya existe con la misma definición;
+    los conflictos (misma clave con otras opciones) se registran y no detienen
+    el arranque
+
+    Returns:
+        dict: {'created': int, 'errors': int}
+    """
+    results = {'created': 0, 'errors': 0}
+
+    for collection_name, indexes in INDEXES.items():
+        collection = db[collection_name]
+
+        for spec in indexes:
+            options = {k: v for k, v in spec.items() if k != 'keys'}
+            try:
+                collection.create_index(spec['keys'], **options)
+                results['created'] += 1
+            except OperationFailure as e:
+                logger.warning(
+                    f"No se pudo crear índice {collection_name}.{spec['name']}: {str(e)}"
+                )
+                results['errors'] += 1
+
+    return results
+
+
+# ============================================================================
+# VERIFICACIÓN DE PLANES DE CONSULTA (explain)
+# ============================================================================
+def get_plan_stages(explain_result):
+    """
+    Retorna la lista de etapas (stage) del plan ganador de un explain()
+    Soporta tanto el formato clásico como el de SBE (queryPlan)
+    """
+    planner = explain_result.get('queryPlanner', explain_result)
+    winning = planner.get('winningPlan', {})
+    winning = winning.get('queryPlan', winning)
+
+    stages = []
+    pending = [winning]
+    while pending:
+        node = pending.pop()
+        if not isinstance(node, dict):
+            continue
+        if 'stage' in node:
+            stages.append(node['stage'])
+        if 'inputStage' in node:
+            pending.append(node['inputStage'])
+        pending.extend(node.get('inputStages', []))
+
+    return stages
+
+
+def is_collscan(explain_result):
+    """Verifica si el plan ganador recurre a un escaneo completo de colección"""
+    return 'COLLSCAN' in get_plan_stages(explain_result)
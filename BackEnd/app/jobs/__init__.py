@@ -12,8 +12,18 @@ def init_scheduler():
     Inicializa el scheduler con todos los jobs configurados
     
     Jobs configurados:
-    - reservation_expiration_job: Expira reservas vencidas (cada 5 min)
+    - reservation_expiration_job: Expira cada reserva en su expires_at
+      (reservation_expiry_scheduler) y reconcilia con un barrido de baja
+      frecuencia (RESERVATION_EXPIRY_CHECK_INTERVAL)
     - notification_job: Notifica reservas por vencer (diario 9 AM)
+    - catalog_sync_job: Da de alta categorías y tags usados por productos
+      modificados desde la última marca de agua (CATALOG_SYNC_INTERVAL)
+    - catalog_rename_recovery_job: Reanuda renombres del catálogo
+      interrumpidos (CATALOG_RENAME_RECOVERY_INTERVAL); la propagación corre
+      en catalog_rename_job.catalog_rename_runner
+    - export_cleanup_job: Elimina exportaciones expiradas
+      (EXPORT_CLEANUP_INTERVAL); los jobs de exportación corren en
+      export_job.export_runner
     """
     logger.info("Inicializando scheduler de jobs...")
     
@@ -30,6 +40,21 @@ def init_scheduler():
         setup_notification_job(scheduler)
         logger.info("Job de notificaciones configurado")
         
+        # Importar y configurar sincronización del catálogo
+        from app.jobs.catalog_sync_job import setup_catalog_sync_job
+        setup_catalog_sync_job(scheduler)
+        logger.info("Job de sincronización del catálogo configurado")
+        
+        # Importar y configurar reanudación de renombres del catálogo
+        from app.jobs.catalog_rename_job import setup_catalog_rename_job
+        setup_catalog_rename_job(scheduler)
+        logger.info("Job de renombres del catálogo configurado")
+        
+        # Importar y configurar limpieza de exportaciones
+        from app.jobs.export_job import setup_export_cleanup_job
+        setup_export_cleanup_job(scheduler)
+        logger.info("Job de limpieza de exportaciones configurado")
+        
         # Iniciar scheduler
         scheduler.start()
         logger.info("Scheduler iniciado exitosamente")
@@ -0,0 +1,84 @@
+"""
+Propagación de renombres del catálogo en segundo plano
+Renombrar una categoría o tag ya no reescribe los productos dentro de la
+petición: el renombre se registra en catalog_renames y un hilo dedicado lo
+propaga por lotes de _id (CATALOG_RENAME_BATCH_SIZE) a un ritmo máximo de
+CATALOG_RENAME_MAX_PER_SECOND productos (ver services/catalog_service).
+
+Un solo hilo por proceso: los renombres se aplican en el orden en que se
+pidieron (A -> B y luego B -> C). Entre workers el orden lo garantiza
+CatalogRenameRepository.claim, que no toma un renombre mientras la misma
+entidad tenga uno anterior sin terminar; al terminar cada renombre se
+encola el siguiente pendiente de la entidad. Un job del scheduler
+(CATALOG_RENAME_RECOVERY_INTERVAL) reanuda desde su último _id los
+renombres interrumpidos o fallidos.
+"""
+from apscheduler.schedulers.background import BackgroundScheduler
+from concurrent.futures import ThreadPoolExecutor
+from app.config.config import get_config
+import threading
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class CatalogRenameRunner:
+    """Hilo único para propagar renombres en orden"""
+
+    def __init__(self):
+        self._executor = None
+        self._lock = threading.Lock()
+
+    def submit(self, rename_id):
+        """Encola el renombre; retorna de inmediato"""
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(
+                    max_workers=1,
+                    thread_name_prefix='catalog-rename'
+                )
+        self._executor.submit(self._run, rename_id)
+
+    def _run(self, rename_id):
+        # Import diferido: catalog_service depende de este módulo
+        from app.services.catalog_service import CatalogService
+
+        try:
+            CatalogService().run_rename(rename_id)
+        except Exception as e:
+            logger.error(f"Error propagando renombre {rename_id}: {str(e)}")
+
+
+# Instancia compartida por el proceso
+catalog_rename_runner = CatalogRenameRunner()
+
+
+def run_catalog_rename_recovery():
+    """Reencola los renombres interrumpidos o fallidos"""
+    from app.services.catalog_service import CatalogService
+
+    try:
+        return CatalogService().resume_renames()
+    except Exception as e:
+        logger.error(f"Error reanudando renombres del catálogo: {str(e)}")
+        return {'resumed': 0, 'error': str(e)}
+
+
+def setup_catalog_rename_job(scheduler=None):
+    """Configura la reanudación periódica de renombres en el scheduler"""
+    if scheduler is None:
+        scheduler = BackgroundScheduler()
+
+    interval = get_config().CATALOG_RENAME_RECOVERY_INTERVAL
+    scheduler.add_job(
+        func=run_catalog_rename_recovery,
+        trigger='interval',
+        seconds=interval,
+        id='catalog_rename_recovery_job',
+        name='Reanudar renombres del catálogo',
+        replace_existing=True
+    )
+
+    logger.info(f"Job de reanudación de renombres configurado (cada {interval} s)")
+
+    return scheduler
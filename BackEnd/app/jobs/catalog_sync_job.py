@@ -0,0 +1,62 @@
+"""
+Sincronización incremental del catálogo
+Da de alta en categories/tags los nombres que usan los productos y que aún
+no existen en el catálogo. Solo revisa productos con updated_at posterior a
+la marca de agua guardada en sync_state, por lo que los GET del catálogo
+no escriben.
+"""
+from apscheduler.schedulers.background import BackgroundScheduler
+from app.repositories.catalog_repository import CatalogRepository
+from app.config.config import get_config
+from datetime import datetime
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class CatalogSyncJob:
+    """Job de sincronización de categorías y tags desde productos"""
+
+    def __init__(self):
+        self.catalog_repo = CatalogRepository()
+
+    def run(self):
+        """Ejecuta una pasada incremental"""
+        try:
+            results = self.catalog_repo.sync_from_products()
+
+            if results['categories'] or results['tags']:
+                logger.info(
+                    f"Catálogo sincronizado: {results['products']} productos revisados, "
+                    f"{results['categories']} categorías y {results['tags']} tags nuevas"
+                )
+
+            return results
+
+        except Exception as e:
+            logger.error(f"Error en sincronización del catálogo: {str(e)}")
+            return {'products': 0, 'categories': 0, 'tags': 0, 'error': str(e)}
+
+
+def setup_catalog_sync_job(scheduler=None):
+    """Configura la sincronización del catálogo en el scheduler"""
+    if scheduler is None:
+        scheduler = BackgroundScheduler()
+
+    job = CatalogSyncJob()
+    interval = get_config().CATALOG_SYNC_INTERVAL
+
+    # Primera pasada al iniciar (sin marca de agua revisa todos los productos)
+    scheduler.add_job(
+        func=job.run,
+        trigger='interval',
+        seconds=interval,
+        next_run_time=datetime.now(),
+        id='catalog_sync_job',
+        name='Sincronizar categorías y tags desde productos',
+        replace_existing=True
+    )
+
+    logger.info(f"Job de sincronización del catálogo configurado (cada {interval} s)")
+
+    return scheduler
@@ -0,0 +1,78 @@
+"""
+Exportaciones en segundo plano
+Las exportaciones de reservas se ejecutan en un pool de hilos acotado
+(EXPORT_MAX_WORKERS), fuera del hilo de la petición HTTP. El estado y el
+progreso se guardan en export_jobs (ver services/export_service).
+
+Un job del scheduler (EXPORT_CLEANUP_INTERVAL) elimina los archivos
+expirados y marca como fallidos los jobs interrumpidos.
+"""
+from apscheduler.schedulers.background import BackgroundScheduler
+from concurrent.futures import ThreadPoolExecutor
+from app.config.config import get_config
+import threading
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class ExportJobRunner:
+    """Pool de hilos para ejecutar jobs de exportación"""
+
+    def __init__(self):
+        self._executor = None
+        self._lock = threading.Lock()
+
+    def submit(self, job_id):
+        """Encola el job; retorna de inmediato"""
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(
+                    max_workers=get_config().EXPORT_MAX_WORKERS,
+                    thread_name_prefix='export-job'
+                )
+        self._executor.submit(self._run, job_id)
+
+    def _run(self, job_id):
+        # Import diferido: export_service depende de este módulo
+        from app.services.export_service import ExportService
+
+        try:
+            ExportService().run_job(job_id)
+        except Exception as e:
+            logger.error(f"Error ejecutando exportación {job_id}: {str(e)}")
+
+
+# Instancia compartida por el proceso
+export_runner = ExportJobRunner()
+
+
+def run_export_cleanup():
+    """Elimina exportaciones expiradas y marca jobs interrumpidos"""
+    from app.services.export_service import ExportService
+
+    try:
+        return ExportService().cleanup()
+    except Exception as e:
+        logger.error(f"Error limpiando exportaciones: {str(e)}")
+        return {'deleted': 0, 'failed_stale': 0, 'error': str(e)}
+
+
+def setup_export_cleanup_job(scheduler=None):
+    """Configura la limpieza periódica de exportaciones en el scheduler"""
+    if scheduler is None:
+        scheduler = BackgroundScheduler()
+
+    interval = get_config().EXPORT_CLEANUP_INTERVAL
+    scheduler.add_job(
+        func=run_export_cleanup,
+        trigger='interval',
+        seconds=interval,
+        id='export_cleanup_job',
+        name='Limpiar exportaciones expiradas',
+        replace_existing=True
+    )
+
+    logger.info(f"Job de limpieza de exportaciones configurado (cada {interval} s)")
+
+    return scheduler
@@ -4,6 +4,8 @@ from app.services.notification_service import NotificationService
 from app.services.user_service import UserService
 from app.repositories.reservation_repository import ReservationRepository
 from app.config.database import get_db
+from app.config.config import get_config
+from app.jobs.reservation_expiry_scheduler import expiry_scheduler
 from bson import ObjectId
 import logging
 
@@ -14,7 +16,9 @@ class ReservationExpirationJob:
     """
     Job para expiracion automatica de reservas
     CU-011: Expiracion automatica de reservas
-    Se ejecuta cada 5 minutos segun configuracion del README
+    La expiracion puntual la dispara expiry_scheduler en el expires_at de cada
+    reserva; este job queda como barrido de reconciliacion de baja frecuencia
+    (RESERVATION_EXPIRY_CHECK_INTERVAL)
     """
     
     def __init__(self):
@@ -24,19 +28,29 @@ class ReservationExpirationJob:
         self.reservation_repo = ReservationRepository()
         self.db = get_db()
         
-    def run(self):
-        """Ejecuta el proceso de expiracion"""
-        logger.info("=== INICIANDO JOB DE EXPIRACION DE RESERVAS ===")
+    def run(self, reservation_ids=None):
+        """
+        Ejecuta el proceso de expiracion
+
+        Args:
+            reservation_ids: opcional, restringe la expiracion a estas reservas
+                (llamado por expiry_scheduler al vencer cada reserva)
+        """
+        if reservation_ids is None:
+            logger.info("=== INICIANDO BARRIDO DE RECONCILIACION DE RESERVAS ===")
         
         try:
             # Expirar reservas vencidas
-            results = self.reservation_service.expire_reservations()
+            results = self.reservation_service.expire_reservations(
+                reservation_ids=reservation_ids
+            )
             
-            logger.info(f"Expiracion completada: {results['processed']} procesadas, {results['errors']} errores")
+            if results['processed'] or results['errors'] or reservation_ids is None:
+                logger.info(f"Expiracion completada: {results['processed']} procesadas, {results['errors']} errores")
             
-            # Enviar notificaciones de reservas expiradas
-            if results['processed'] > 0:
-                self._send_expiration_notifications()
+            # Enviar notificaciones solo de las reservas expiradas en esta ejecucion
+            if results['expired_ids']:
+                self._send_expiration_notifications(results['expired_ids'])
             
             return results
             
@@ -44,16 +58,11 @@ class ReservationExpirationJob:
             logger.error(f"Error en job de expiracion: {str(e)}")
             return {'processed': 0, 'errors': 1, 'error': str(e)}
     
-    def _send_expiration_notifications(self):
-        """Envia notificaciones de reservas expiradas"""
-        from datetime import datetime, timedelta
-        
-        # Buscar reservas que expiraron en la ultima hora
-        one_hour_ago = datetime.utcnow() - timedelta(hours=1)
-        
+    def _send_expiration_notifications(self, reservation_ids):
+        """Envia notificaciones de las reservas expiradas indicadas"""
         expired_recently = self.db.reservations.find({
-            'state': 'Expirada',
-            'expired_at': {'$gte': one_hour_ago}
+            '_id': {'$in': [ObjectId(rid) for rid in reservation_ids]},
+            'state': 'Expirada'
         })
         
         for reservation in expired_recently:
@@ -80,16 +89,24 @@ def setup_expiration_job(scheduler=None):
     
     job = ReservationExpirationJob()
     
-    # Ejecutar cada 5 minutos segun README
+    # Expiracion por eventos: precargar las reservas activas en el min-heap
+    expiry_scheduler.start(
+        on_expire=lambda reservation_ids: job.run(reservation_ids=reservation_ids),
+        initial=job.reservation_repo.find_active_expirations()
+    )
+    
+    # Barrido de reconciliacion: recoge reservas creadas en otros procesos
+    # o que no quedaron programadas (reinicios, errores)
+    interval = get_config().RESERVATION_EXPIRY_CHECK_INTERVAL
     scheduler.add_job(
         func=job.run,
         trigger='interval',
-        minutes=5,
+        seconds=interval,
         id='reservation_expiration_job',
-        name='Expirar reservas vencidas',
+        name='Reconciliar reservas vencidas',
         replace_existing=True
     )
     
-    logger.info("Job de expiracion de reservas configurado (cada 5 minutos)")
+    logger.info(f"Job de expiracion de reservas configurado (reconciliacion cada {interval} segundos)")
     
     return scheduler
\ No newline at end of file
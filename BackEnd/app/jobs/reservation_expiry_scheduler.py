@@ -0,0 +1,124 @@
+"""
+Scheduler de expiracion de reservas por eventos
+Mantiene un min-heap en memoria con los expires_at de las reservas activas
+y dispara la expiracion de cada reserva en su fecha limite, en lugar de
+esperar al siguiente barrido periodico.
+
+Se alimenta desde ReservationRepository.create (nueva reserva) y desde
+ReservationService cuando una reserva sale de los estados activos.
+El barrido de reconciliacion (reservation_expiration_job) sigue activo como
+red de seguridad para reservas creadas en otros procesos o perdidas en reinicios.
+"""
+from datetime import datetime
+import heapq
+import threading
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class ReservationExpiryScheduler:
+    """Min-heap de (expires_at, reservation_id) atendido por un hilo daemon"""
+
+    # Tope de espera entre revisiones: acota el efecto de cambios de reloj
+    MAX_WAIT_SECONDS = 60
+
+    def __init__(self):
+        self._heap = []
+        self._scheduled = {}  # reservation_id -> expires_at vigente (borrado perezoso)
+        self._condition = threading.Condition()
+        self._thread = None
+        self._on_expire = None
+
+    @property
+    def running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self, on_expire, initial=None):
+        """
+        Inicia el hilo del scheduler
+
+        Args:
+            on_expire: callable(list[str]) que expira las reservas indicadas
+            initial: iterable opcional de (reservation_id, expires_at) para precargar
+        """
+        self._on_expire = on_expire
+
+        for reservation_id, expires_at in initial or []:
+            self._push(reservation_id, expires_at)
+
+        if not self.running:
+            self._thread = threading.Thread(
+                target=self._run,
+                name='reservation-expiry-scheduler',
+                daemon=True
+            )
+            self._thread.start()
+
+        logger.info(f"Scheduler de expiracion iniciado ({len(self._scheduled)} reservas programadas)")
+
+    def schedule(self, reservation_id, expires_at):
+        """Programa (o reprograma) la expiracion de una reserva"""
+        if not self.running or expires_at is None:
+            return
+
+        with self._condition:
+            self._push(reservation_id, expires_at)
+            self._condition.notify()
+
+    def discard(self, reservation_id):
+        """Quita una reserva que ya no esta activa (su entrada del heap se ignora al salir)"""
+        with self._condition:
+            self._scheduled.pop(str(reservation_id), None)
+
+    def pending_count(self):
+        with self._condition:
+            return len(self._scheduled)
+
+    def _push(self, reservation_id, expires_at):
+        reservation_id = str(reservation_id)
+        self._scheduled[reservation_id] = expires_at
+        heapq.heappush(self._heap, (expires_at, reservation_id))
+
+    def _pop_due(self):
+        """Espera hasta que haya reservas vencidas y las retira del heap"""
+        with self._condition:
+            while True:
+                # Descartar entradas obsoletas (reserva cerrada o reprogramada)
+                while self._heap and self._scheduled.get(self._heap[0][1]) != self._heap[0][0]:
+                    heapq.heappop(self._heap)
+
+                if not self._heap:
+                    self._condition.wait()
+                    continue
+
+                wait = (self._heap[0][0] - datetime.utcnow()).total_seconds()
+                if wait <= 0:
+                    break
+                self._condition.wait(timeout=min(wait, self.MAX_WAIT_SECONDS))
+
+            now = datetime.utcnow()
+            due = []
+            while self._heap and self._heap[0][0] <= now:
+                expires_at, reservation_id = heapq.heappop(self._heap)
+                if self._scheduled.get(reservation_id) == expires_at:
+                    del self._scheduled[reservation_id]
+                    due.append(reservation_id)
+
+            return due
+
+    def _run(self):
+        while True:
+            due = self._pop_due()
+            if not due:
+                continue
+
+            try:
+                self._on_expire(due)
+            except Exception as e:
+                # El barrido de reconciliacion las recogera
+                logger.error(f"Error expirando reservas programadas {due}: {str(e)}")
+
+
+# Instancia compartida por proceso
+expiry_scheduler = ReservationExpiryScheduler()
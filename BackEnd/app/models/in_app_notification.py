@@ -70,6 +70,22 @@ class InAppNotification:
             'created_at': self.created_at
         }
     
+    def to_json(self):
+        """Representación JSON para la API y el stream SSE"""
+        return {
+            'id': str(self._id),
+            'title': self.title,
+            'message': self.message,
+            'type': self.notification_type,
+            'priority': self.priority,
+            'read': self.read,
+            'read_at': self.read_at.isoformat() if self.read_at else None,
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+            'action_url': self.action_url,
+            'related_entity_id': str(self.related_entity_id) if self.related_entity_id else None,
+            'related_entity_type': self.related_entity_type
+        }
+    
     @staticmethod
     def from_dict(data):
         """Crea una instancia desde un diccionario"""
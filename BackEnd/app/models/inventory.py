@@ -19,6 +19,7 @@ class Inventory:
             'variant_id': self.variant_id,
             'stock_total': self.stock_total,
             'stock_retenido': self.stock_retenido,
+            'disponible': self.get_disponibilidad(),
             'creado_en': self.creado_en,
             'actualizado_en': self.actualizado_en
         }
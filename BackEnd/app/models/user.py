@@ -4,12 +4,12 @@ Define la estructura de datos para usuarios en MongoDB
 """
 from mongoengine import (
     Document, StringField, EmailField, 
-    DateTimeField, BooleanField
+    DateTimeField, BooleanField, IntField
 )
 from datetime import datetime
 from app.constants.roles import UserRole
 from app.constants.states import UserState
-import bcrypt
+from app.utils.password_hasher import password_hasher
 
 
 class User(Document):
@@ -55,6 +55,9 @@ class User(Document):
         default=UserState.ACTIVE
     )
     
+    # Generación de tokens JWT: logout-all la incrementa (utils/token_blocklist)
+    token_generation = IntField(default=0)
+    
     # Timestamps
     creado_en = DateTimeField(default=datetime.utcnow)
     actualizado_en = DateTimeField(default=datetime.utcnow)
@@ -66,11 +69,7 @@ class User(Document):
         Args:
             password: Contraseña en texto plano
         """
-        salt = bcrypt.gensalt()
-        self.password_hash = bcrypt.hashpw(
-            password.encode('utf-8'), 
-            salt
-        ).decode('utf-8')
+        self.password_hash = password_hasher.hash(password)
     
     def check_password(self, password):
         """
@@ -82,10 +81,7 @@ class User(Document):
         Returns:
             bool: True si la contraseña es correcta, False en caso contrario
         """
-        return bcrypt.checkpw(
-            password.encode('utf-8'),
-            self.password_hash.encode('utf-8')
-        )
+        return password_hasher.verify(password, self.password_hash)
     
     def is_active(self):
         """Verifica si el usuario está activo"""
@@ -0,0 +1,173 @@
+"""
+Catalog Rename Repository with proper lazy database loading
+Registro de renombres de categorías/tags que se propagan a los productos en
+segundo plano: estado, progreso y último _id procesado para poder reanudar
+(ver services/catalog_service y jobs/catalog_rename_job)
+"""
+from app.config.database import get_db
+from bson import ObjectId
+from datetime import datetime
+from pymongo import ReturnDocument
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class CatalogRenameState:
+    """Estados de la propagación de un renombre"""
+    PENDING = 'pending'
+    RUNNING = 'running'
+    DONE = 'done'
+    FAILED = 'failed'
+
+
+class CatalogRenameRepository:
+    """Repositorio de renombres del catálogo (colección catalog_renames)"""
+
+    def __init__(self):
+        self._db = None
+
+    # ============================================================================
+    # LAZY LOADING PROPERTIES - Database is only accessed when needed
+    # ============================================================================
+    @property
+    def db(self):
+        """Lazy load database connection - reuses existing connection pool"""
+        if self._db is None:
+            self._db = get_db()  # This now returns the SHARED database instance
+        return self._db
+
+    @property
+    def collection(self):
+        """Lazy load collection"""
+        return self.db.catalog_renames
+
+    # ============================================================================
+    # REPOSITORY METHODS
+    # ============================================================================
+    def create(self, rename_data):
+        now = datetime.utcnow()
+        rename_data.update({
+            'state': CatalogRenameState.PENDING,
+            'progress': {'processed': 0, 'total': None},
+            'last_id': None,
+            'attempts': 0,
+            'created_at': now,
+            'updated_at': now,
+        })
+        result = self.collection.insert_one(rename_data)
+        rename_data['_id'] = result.inserted_id
+        return rename_data
+
+    def find_by_id(self, rename_id):
+        return self.collection.find_one({'_id': ObjectId(rename_id)})
+
+    def has_active(self, entity_id):
+        """Indica si la entidad tiene un renombre sin terminar"""
+        return self.collection.count_documents({
+            'entity_id': ObjectId(entity_id),
+            'state': {'$in': [CatalogRenameState.PENDING, CatalogRenameState.RUNNING]}
+        }, limit=1) > 0
+
+    def claim(self, rename_id, stale_before, max_attempts):
+        """
+        Toma el renombre de forma atómica: pendiente, fallido o en curso sin
+        latido desde stale_before (el proceso que lo ejecutaba terminó)
+        Retorna el documento o None si otro worker lo tiene o si la misma
+        entidad tiene un renombre anterior sin terminar (A -> B antes que
+        B -> C, aunque se hayan encolado en workers distintos)
+        """
+        rename = self.collection.find_one({'_id': ObjectId(rename_id)}, {'entity_id': 1, 'created_at': 1})
+        if not rename or self._has_earlier_active(rename, max_attempts):
+            return None
+
+        now = datetime.utcnow()
+        return self.collection.find_one_and_update(
+            {
+                '_id': ObjectId(rename_id),
+                '$or': [
+                    {'state': {'$in': [CatalogRenameState.PENDING, CatalogRenameState.FAILED]}},
+                    {'state': CatalogRenameState.RUNNING, 'updated_at': {'$lt': stale_before}},
+                ]
+            },
+            {
+                '$set': {'state': CatalogRenameState.RUNNING, 'started_at': now, 'updated_at': now},
+                '$unset': {'error': ''},
+                '$inc': {'attempts': 1},
+            },
+            return_document=ReturnDocument.AFTER
+        )
+
+    def _has_earlier_active(self, rename, max_attempts):
+        """
+        Renombre anterior (orden created_at, _id) de la misma entidad que aún
+        se va a ejecutar: pendiente, en curso o fallido con intentos restantes
+        """
+        return self.collection.count_documents({
+            'entity_id': rename['entity_id'],
+            '$and': [
+                {'$or': [
+                    {'created_at': {'$lt': rename['created_at']}},
+                    {'created_at': rename['created_at'], '_id': {'$lt': rename['_id']}},
+                ]},
+                {'$or': [
+                    {'state': {'$in': [CatalogRenameState.PENDING, CatalogRenameState.RUNNING]}},
+                    {'state': CatalogRenameState.FAILED, 'attempts': {'$lt': max_attempts}},
+                ]},
+            ]
+        }, limit=1) > 0
+
+    def find_next_pending(self, entity_id):
+        """Siguiente renombre pendiente de la entidad (el más antiguo)"""
+        return self.collection.find_one(
+            {'entity_id': ObjectId(entity_id), 'state': CatalogRenameState.PENDING},
+            sort=[('created_at', 1), ('_id', 1)]
+        )
+
+    def update_progress(self, rename_id, processed, last_id=None, total=None):
+        """Actualiza el progreso; updated_at sirve de latido del worker"""
+        update = {'progress.processed': processed, 'updated_at': datetime.utcnow()}
+        if last_id is not None:
+            update['last_id'] = last_id
+        if total is not None:
+            update['progress.total'] = total
+        self.collection.update_one({'_id': ObjectId(rename_id)}, {'$set': update})
+
+    def mark_done(self, rename_id, processed):
+        now = datetime.utcnow()
+        self.collection.update_one(
+            {'_id': ObjectId(rename_id)},
+            {'$set': {
+                'state': CatalogRenameState.DONE,
+                'progress.processed': processed,
+                'finished_at': now,
+                'updated_at': now,
+            }}
+        )
+
+    def mark_failed(self, rename_id, error):
+        now = datetime.utcnow()
+        self.collection.update_one(
+            {'_id': ObjectId(rename_id)},
+            {'$set': {
+                'state': CatalogRenameState.FAILED,
+                'error': error,
+                'finished_at': now,
+                'updated_at': now,
+            }}
+        )
+
+    def find_resumable(self, stale_before, max_attempts):
+        """
+        Renombres a reanudar: pendientes o en curso sin latido desde
+        stale_before, y fallidos con menos de max_attempts intentos
+        """
+        return list(self.collection.find({
+            '$or': [
+                {
+                    'state': {'$in': [CatalogRenameState.PENDING, CatalogRenameState.RUNNING]},
+                    'updated_at': {'$lt': stale_before}
+                },
+                {'state': CatalogRenameState.FAILED, 'attempts': {'$lt': max_attempts}},
+            ]
+        }).sort('created_at', 1))
@@ -3,12 +3,20 @@ Catalog Repository with proper lazy database loading
 This prevents creating new connections on every instantiation
 """
 from bson import ObjectId
+from collections import Counter
 from datetime import datetime
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError, DuplicateKeyError
 from app.config.database import get_db
+from app.utils.text_utils import normalize_text
 import logging
+import time
 
 logger = logging.getLogger(__name__)
 
+# Documento de sync_state con la marca de agua de la sincronización del catálogo
+CATALOG_SYNC_STATE_ID = "catalog_sync"
+
 
 class CatalogRepository:
     def __init__(self):
@@ -39,60 +47,60 @@ class CatalogRepository:
         """Get products collection (lazy loaded)"""
         return self.db.products
 
+    @property
+    def sync_state(self):
+        """Get sync_state collection (lazy loaded)"""
+        return self.db.sync_state
+
     # ============================================================================
     # HELPER METHODS
     # ============================================================================
     def _slugify(self, name: str) -> str:
         return name.strip().lower().replace(" ", "-")
 
+    def _invalidate_products_cache(self):
+        """Los renombres modifican productos: invalidar cachés y autocompletado"""
+        from app.repositories.product_repository import ProductRepository
+        ProductRepository()._invalidate_products_cache()
+
     # ============================================================================
     # CATEGORY OPERATIONS - Now use properties instead of direct access
     # ============================================================================
     def list_categories(self):
-        pipeline = [
-            {
-                "$lookup": {
-                    "from": "products",
-                    "let": {"catName": "$name"},
-                    "pipeline": [
-                        {"$match": {"$expr": {"$eq": ["$categoria", "$$catName"]}}},
-                        {"$count": "count"}
-                    ],
-                    "as": "usage"
-                }
-            },
-            {
-                "$addFields": {
-                    "productCount": {
-                        "$ifNull": [{"$arrayElemAt": ["$usage.count", 0]}, 0]
-                    }
-                }
-            },
-            {"$project": {"usage": 0}},
-            {"$sort": {"name": 1}}
-        ]
-        return list(self.categories.aggregate(pipeline))
+        """Categorías ordenadas por nombre con su contador productCount"""
+        categories = list(self.categories.find({}).sort("name", 1))
+        for c in categories:
+            c.setdefault("productCount", 0)
+        return categories
 
     def create_category(self, name: str):
         name = name.strip()
         slug = self._slugify(name)
 
-        # Unicidad por nombre (case-insensitive)
-        exists = self.categories.find_one({"name": {"$regex": f"^{name}$", "$options": "i"}})
-        if exists:
-            raise ValueError("Ya existe una categoría con ese nombre")
-
         doc = {
             "name": name,
             "slug": slug,
+            # Unicidad por nombre normalizado (índice único name_normalized)
+            "name_normalized": normalize_text(name),
+            # Productos que ya usan el nombre; luego se mantiene por escritura
+            "productCount": self.products.count_documents({"categoria": name}),
             "created_at": datetime.utcnow(),
             "updated_at": datetime.utcnow(),
         }
-        res = self.categories.insert_one(doc)
+        try:
+            res = self.categories.insert_one(doc)
+        except DuplicateKeyError:
+            raise ValueError("Ya existe una categoría con ese nombre")
         doc["_id"] = res.inserted_id
         return doc
 
     def update_category(self, category_id: str, new_name: str):
+        """
+        Renombra la categoría; no toca productos (ver propagate_rename)
+
+        Returns:
+            tuple: (categoría actualizada, nombre anterior)
+        """
         new_name = new_name.strip()
         new_slug = self._slugify(new_name)
 
@@ -100,29 +108,24 @@ class CatalogRepository:
         if not cat:
             raise ValueError("Categoría no encontrada")
 
-        # Unicidad
-        exists = self.categories.find_one({
-            "_id": {"$ne": ObjectId(category_id)},
-            "name": {"$regex": f"^{new_name}$", "$options": "i"}
-        })
-        if exists:
-            raise ValueError("Ya existe una categoría con ese nombre")
-
         old_name = cat["name"]
 
-        self.categories.update_one(
-            {"_id": ObjectId(category_id)},
-            {"$set": {"name": new_name, "slug": new_slug, "updated_at": datetime.utcnow()}}
-        )
-
-        # Propagar a productos (mantener consistencia de filtros)
-        if old_name != new_name:
-            self.products.update_many(
-                {"categoria": old_name},
-                {"$set": {"categoria": new_name, "updated_at": datetime.utcnow()}}
+        try:
+            self.categories.update_one(
+                {"_id": ObjectId(category_id)},
+                {"$set": {
+                    "name": new_name,
+                    "slug": new_slug,
+                    "name_normalized": normalize_text(new_name),
+                    "updated_at": datetime.utcnow()
+                }}
             )
+        except DuplicateKeyError:
+            raise ValueError("Ya existe una categoría con ese nombre")
 
-        return self.categories.find_one({"_id": ObjectId(category_id)})
+        # La propagación a productos corre en segundo plano (propagate_rename)
+        updated = self.categories.find_one({"_id": ObjectId(category_id)})
+        return updated, old_name
 
     def delete_category(self, category_id: str):
         cat = self.categories.find_one({"_id": ObjectId(category_id)})
@@ -144,49 +147,38 @@ class CatalogRepository:
     # TAG OPERATIONS - Now use properties instead of direct access
     # ============================================================================
     def list_tags(self):
-        pipeline = [
-            {
-                "$lookup": {
-                    "from": "products",
-                    "let": {"tagName": "$name"},
-                    "pipeline": [
-                        {"$match": {"$expr": {"$in": ["$$tagName", "$tags"]}}},
-                        {"$count": "count"}
-                    ],
-                    "as": "usage"
-                }
-            },
-            {
-                "$addFields": {
-                    "productCount": {
-                        "$ifNull": [{"$arrayElemAt": ["$usage.count", 0]}, 0]
-                    }
-                }
-            },
-            {"$project": {"usage": 0}},
-            {"$sort": {"name": 1}}
-        ]
-        return list(self.tags.aggregate(pipeline))
+        """Etiquetas ordenadas por nombre con su contador productCount"""
+        tags = list(self.tags.find({}).sort("name", 1))
+        for t in tags:
+            t.setdefault("productCount", 0)
+        return tags
 
     def create_tag(self, name: str):
         name = name.strip()
         slug = self._slugify(name)
 
-        exists = self.tags.find_one({"name": {"$regex": f"^{name}$", "$options": "i"}})
-        if exists:
-            raise ValueError("Ya existe una etiqueta con ese nombre")
-
         doc = {
             "name": name,
             "slug": slug,
+            "name_normalized": normalize_text(name),
+            "productCount": self.products.count_documents({"tags": name}),
             "created_at": datetime.utcnow(),
             "updated_at": datetime.utcnow(),
         }
-        res = self.tags.insert_one(doc)
+        try:
+            res = self.tags.insert_one(doc)
+        except DuplicateKeyError:
+            raise ValueError("Ya existe una etiqueta con ese nombre")
         doc["_id"] = res.inserted_id
         return doc
 
     def update_tag(self, tag_id: str, new_name: str):
+        """
+        Renombra la etiqueta; no toca productos (ver propagate_rename)
+
+        Returns:
+            tuple: (etiqueta actualizada, nombre anterior)
+        """
         new_name = new_name.strip()
         new_slug = self._slugify(new_name)
 
@@ -194,41 +186,24 @@ class CatalogRepository:
         if not t:
             raise ValueError("Etiqueta no encontrada")
 
-        exists = self.tags.find_one({
-            "_id": {"$ne": ObjectId(tag_id)},
-            "name": {"$regex": f"^{new_name}$", "$options": "i"}
-        })
-        if exists:
-            raise ValueError("Ya existe una etiqueta con ese nombre")
-
         old_name = t["name"]
 
-        self.tags.update_one(
-            {"_id": ObjectId(tag_id)},
-            {"$set": {"name": new_name, "slug": new_slug, "updated_at": datetime.utcnow()}}
-        )
-
-        # Propagar a productos: reemplazar string dentro del array tags
-        if old_name != new_name:
-            self.products.update_many(
-                {"tags": old_name},
-                [
-                    {
-                        "$set": {
-                            "tags": {
-                                "$map": {
-                                    "input": "$tags",
-                                    "as": "tg",
-                                    "in": {"$cond": [{"$eq": ["$$tg", old_name]}, new_name, "$$tg"]}
-                                }
-                            },
-                            "updated_at": datetime.utcnow()
-                        }
-                    }
-                ]
+        try:
+            self.tags.update_one(
+                {"_id": ObjectId(tag_id)},
+                {"$set": {
+                    "name": new_name,
+                    "slug": new_slug,
+                    "name_normalized": normalize_text(new_name),
+                    "updated_at": datetime.utcnow()
+                }}
             )
+        except DuplicateKeyError:
+            raise ValueError("Ya existe una etiqueta con ese nombre")
 
-        return self.tags.find_one({"_id": ObjectId(tag_id)})
+        # La propagación a productos corre en segundo plano (propagate_rename)
+        updated = self.tags.find_one({"_id": ObjectId(tag_id)})
+        return updated, old_name
 
     def delete_tag(self, tag_id: str):
         t = self.tags.find_one({"_id": ObjectId(tag_id)})
@@ -244,3 +219,341 @@ class CatalogRepository:
 
     def get_tag_by_id(self, tag_id: str):
         return self.tags.find_one({"_id": ObjectId(tag_id)})
+
+    # ============================================================================
+    # USAGE COUNTERS - productCount materializado en categorías y etiquetas
+    # ============================================================================
+    def apply_product_usage(self, before=None, after=None):
+        """
+        Ajusta productCount según el cambio de un producto
+        before/after: categoria y tags del producto antes y después de la
+        escritura (None al crear o eliminar). Las entradas que aún no existen
+        en el catálogo se cuentan al crearlas (create_category / create_tag)
+        """
+        category_deltas = Counter()
+        tag_deltas = Counter()
+
+        if before:
+            category_deltas[before.get("categoria")] -= 1
+            for tag in set(before.get("tags") or []):
+                tag_deltas[tag] -= 1
+
+        if after:
+            category_deltas[after.get("categoria")] += 1
+            for tag in set(after.get("tags") or []):
+                tag_deltas[tag] += 1
+
+        self._inc_usage(self.categories, category_deltas)
+        self._inc_usage(self.tags, tag_deltas)
+
+    def rebuild_usage_counts(self):
+        """
+        Recalcula productCount de todas las categorías y etiquetas desde
+        products (migración / corrección de desvíos)
+
+        Returns:
+            dict: {'categories': int, 'tags': int} documentos modificados
+        """
+        category_counts = {
+            d["_id"]: d["count"]
+            for d in self.products.aggregate([
+                {"$match": {"categoria": {"$nin": [None, ""]}}},
+                {"$group": {"_id": "$categoria", "count": {"$sum": 1}}},
+            ])
+        }
+        tag_counts = {
+            d["_id"]: d["count"]
+            for d in self.products.aggregate([
+                {"$project": {"tags": {"$setUnion": [{"$ifNull": ["$tags", []]}, []]}}},
+                {"$unwind": "$tags"},
+                {"$match": {"tags": {"$nin": [None, ""]}}},
+                {"$group": {"_id": "$tags", "count": {"$sum": 1}}},
+            ])
+        }
+
+        return {
+            "categories": self._set_usage(self.categories, category_counts),
+            "tags": self._set_usage(self.tags, tag_counts),
+        }
+
+    def _inc_usage(self, collection, deltas):
+        operations = [
+            UpdateOne({"name": name}, {"$inc": {"productCount": delta}})
+            for name, delta in deltas.items()
+            if name and delta
+        ]
+        if operations:
+            collection.bulk_write(operations, ordered=False)
+
+    def _set_usage(self, collection, counts):
+        operations = [
+            UpdateOne({"_id": doc["_id"]}, {"$set": {"productCount": counts.get(doc["name"], 0)}})
+            for doc in collection.find({}, {"name": 1, "productCount": 1})
+            if doc.get("productCount") != counts.get(doc["name"], 0)
+        ]
+        if not operations:
+            return 0
+        return collection.bulk_write(operations, ordered=False).modified_count
+
+    # ============================================================================
+    # RENAME - propagación por lotes de un renombre a los productos
+    # ============================================================================
+    def count_products_with(self, field, name):
+        """Productos que usan el nombre en categoria/tags"""
+        return self.products.count_documents({field: name})
+
+    def recount_usage(self, field, entity_id):
+        """
+        Recalcula productCount de la categoría/etiqueta con un conteo indexado
+        Durante la propagación de un renombre las ediciones de productos con el
+        nombre anterior descuentan de un nombre que ya no existe en el catálogo
+        """
+        collection = self.tags if field == "tags" else self.categories
+        doc = collection.find_one({"_id": ObjectId(entity_id)}, {"name": 1})
+        if doc:
+            collection.update_one(
+                {"_id": doc["_id"]},
+                {"$set": {"productCount": self.count_products_with(field, doc["name"])}}
+            )
+
+    def propagate_rename(self, field, old_name, new_name, after_id=None,
+                         batch_size=500, max_per_second=0, on_batch=None):
+        """
+        Reemplaza old_name por new_name en products.<field> por rangos de _id
+        ascendentes (índice (campo, _id)), limitando el ritmo a max_per_second
+        documentos (0 = sin límite). Invalida las cachés de productos una sola
+        vez al final, también si un lote falla a medias.
+
+        Args:
+            field: 'categoria' o 'tags'
+            after_id: último _id ya procesado (para reanudar)
+            on_batch: callback(procesados, último _id) tras cada lote
+
+        Returns:
+            int: productos modificados
+        """
+        processed = 0
+        try:
+            while True:
+                started = time.monotonic()
+
+                query = {field: old_name}
+                if after_id is not None:
+                    query["_id"] = {"$gt": after_id}
+                ids = [
+                    p["_id"] for p in
+                    self.products.find(query, {"_id": 1}).sort("_id", 1).limit(batch_size)
+                ]
+                if not ids:
+                    break
+
+                result = self.products.update_many(
+                    {"_id": {"$gte": ids[0], "$lte": ids[-1]}, field: old_name},
+                    self._rename_update(field, old_name, new_name)
+                )
+                processed += result.modified_count
+                after_id = ids[-1]
+
+                if on_batch:
+                    on_batch(processed, after_id)
+
+                if max_per_second > 0:
+                    wait = len(ids) / max_per_second - (time.monotonic() - started)
+                    if wait > 0:
+                        time.sleep(wait)
+        finally:
+            if processed:
+                self._invalidate_products_cache()
+
+        return processed
+
+    def _rename_update(self, field, old_name, new_name):
+        now = datetime.utcnow()
+        if field == "tags":
+            # Reemplazar el string dentro del array tags
+            return [
+                {
+                    "$set": {
+                        "tags": {
+                            "$map": {
+                                "input": "$tags",
+                                "as": "tg",
+                                "in": {"$cond": [{"$eq": ["$$tg", old_name]}, new_name, "$$tg"]}
+                            }
+                        },
+                        "updated_at": now
+                    }
+                }
+            ]
+        return {"$set": {field: new_name, "updated_at": now}}
+
+    # ============================================================================
+    # SYNC - alta incremental de categorías/etiquetas usadas por productos
+    # ============================================================================
+    def sync_from_products(self, batch_size=1000):
+        """
+        Crea las categorías y etiquetas que usan los productos modificados
+        desde la última marca de agua (products.updated_at) con un
+        bulk_write de upserts por colección
+
+        Returns:
+            dict: {'products': int, 'categories': int, 'tags': int, 'watermark': datetime}
+        """
+        state = self.sync_state.find_one({"_id": CATALOG_SYNC_STATE_ID}) or {}
+        watermark = state.get("watermark")
+
+        # Los upserts buscan por name_normalized: una entrada sin el campo
+        # se duplicaría y el índice único parcial no lo impediría
+        if not self._ensure_normalized_names():
+            logger.warning(
+                "Sincronización del catálogo omitida: hay nombres duplicados sin "
+                "name_normalized (ejecutar migrations/backfill_catalog_normalized_names.py)"
+            )
+            return {"products": 0, "categories": 0, "tags": 0, "watermark": watermark}
+
+        # $gte: productos con la misma marca se reprocesan (los upserts son idempotentes)
+        query = {"updated_at": {"$gte": watermark}} if watermark else {}
+        cursor = self.products.find(
+            query, {"categoria": 1, "tags": 1, "updated_at": 1}
+        ).sort("updated_at", 1).batch_size(batch_size)
+
+        category_names = {}
+        tag_names = {}
+        processed = 0
+        new_watermark = watermark
+
+        for product in cursor:
+            processed += 1
+            category = product.get("categoria")
+            if category:
+                category_names.setdefault(normalize_text(category), category)
+            for tag in product.get("tags") or []:
+                if tag:
+                    tag_names.setdefault(normalize_text(tag), tag)
+            if product.get("updated_at"):
+                new_watermark = product["updated_at"]
+
+        created_categories = self._upsert_names(self.categories, category_names, "categoria")
+        created_tags = self._upsert_names(self.tags, tag_names, "tags")
+
+        if new_watermark is not None and new_watermark != watermark:
+            self.sync_state.update_one(
+                {"_id": CATALOG_SYNC_STATE_ID},
+                {"$set": {"watermark": new_watermark, "updated_at": datetime.utcnow()}},
+                upsert=True
+            )
+
+        return {
+            "products": processed,
+            "categories": created_categories,
+            "tags": created_tags,
+            "watermark": new_watermark,
+        }
+
+    def backfill_normalized_names(self):
+        """
+        Calcula name_normalized en categorías y etiquetas existentes (migración)
+
+        Returns:
+            dict: {'categories': int, 'tags': int} documentos modificados
+        """
+        result = {}
+        for key, collection in (("categories", self.categories), ("tags", self.tags)):
+            operations = [
+                UpdateOne({"_id": doc["_id"]}, {"$set": {"name_normalized": normalize_text(doc.get("name"))}})
+                for doc in collection.find({}, {"name": 1, "name_normalized": 1})
+                if doc.get("name_normalized") != normalize_text(doc.get("name"))
+            ]
+            result[key] = collection.bulk_write(operations, ordered=False).modified_count if operations else 0
+        return result
+
+    def find_normalized_duplicates(self):
+        """
+        Nombres de categorías y etiquetas que coinciden al normalizar (p. ej.
+        "Pisos" y "pisos"). Se calcula en Python, sin escribir name_normalized,
+        para detectarlos antes de que el índice único rechace el backfill
+
+        Returns:
+            dict: {'categories': [[nombres]], 'tags': [[nombres]]}
+        """
+        result = {}
+        for key, collection in (("categories", self.categories), ("tags", self.tags)):
+            groups = {}
+            for doc in collection.find({}, {"name": 1}):
+                groups.setdefault(normalize_text(doc.get("name")), []).append(doc.get("name"))
+            result[key] = [names for names in groups.values() if len(names) > 1]
+        return result
+
+    def _ensure_normalized_names(self):
+        """
+        Completa name_normalized en las entradas que no lo tienen (creadas
+        antes del campo). Retorna False si alguna no se pudo completar porque
+        su nombre normalizado ya existe (duplicado a resolver a mano)
+        """
+        complete = True
+        for collection in (self.categories, self.tags):
+            operations = [
+                UpdateOne(
+                    {"_id": doc["_id"], "name_normalized": {"$exists": False}},
+                    {"$set": {"name_normalized": normalize_text(doc.get("name"))}}
+                )
+                for doc in collection.find({"name_normalized": {"$exists": False}}, {"name": 1})
+            ]
+            if not operations:
+                continue
+            try:
+                collection.bulk_write(operations, ordered=False)
+            except BulkWriteError as e:
+                logger.warning(
+                    f"{len(e.details.get('writeErrors', []))} nombres duplicados en "
+                    f"{collection.name} sin name_normalized"
+                )
+                complete = False
+        return complete
+
+    def _upsert_names(self, collection, names, product_field):
+        """
+        Upsert por name_normalized de los nombres dados (normalizado -> original)
+        Las entradas nuevas parten con el conteo real de productos
+
+        Returns:
+            int: entradas creadas
+        """
+        if not names:
+            return 0
+
+        now = datetime.utcnow()
+        normalized_names = list(names.keys())
+        operations = [
+            UpdateOne(
+                {"name_normalized": normalized},
+                {"$setOnInsert": {
+                    "name": names[normalized],
+                    "slug": self._slugify(names[normalized]),
+                    "name_normalized": normalized,
+                    "productCount": 0,
+                    "created_at": now,
+                    "updated_at": now,
+                }},
+                upsert=True
+            )
+            for normalized in normalized_names
+        ]
+
+        result = collection.bulk_write(operations, ordered=False)
+        if not result.upserted_ids:
+            return 0
+
+        # Solo las entradas nuevas: un conteo indexado por nombre
+        counts = [
+            UpdateOne(
+                {"_id": upserted_id},
+                {"$set": {"productCount": self.products.count_documents(
+                    {product_field: names[normalized_names[index]]}
+                )}}
+            )
+            for index, upserted_id in result.upserted_ids.items()
+        ]
+        collection.bulk_write(counts, ordered=False)
+
+        return len(result.upserted_ids)
@@ -0,0 +1,168 @@
+"""
+Dashboard Repository with proper lazy database loading
+Calcula los contadores del dashboard de administracion con agregaciones
+$facet y guarda el resultado en Redis con un TTL corto
+"""
+from app.config.database import get_db, RedisHelper
+from app.config.config import get_config
+from app.constants.states import ReservationState
+from datetime import datetime, timedelta
+import json
+import logging
+
+logger = logging.getLogger(__name__)
+
+STATS_CACHE_KEY = "dashboard:stats"
+
+# Umbral de stock disponible para considerar una variante con stock bajo
+LOW_STOCK_THRESHOLD = 10
+
+
+class DashboardRepository:
+    """Repositorio de estadisticas del dashboard"""
+
+    def __init__(self):
+        self._db = None
+        self.redis_helper = RedisHelper()
+
+    # ============================================================================
+    # LAZY LOADING PROPERTIES - Database is only accessed when needed
+    # ============================================================================
+    @property
+    def db(self):
+        """Lazy load database connection - reuses existing connection pool"""
+        if self._db is None:
+            self._db = get_db()  # This now returns the SHARED database instance
+        return self._db
+
+    # ============================================================================
+    # REPOSITORY METHODS
+    # ============================================================================
+    def get_stats(self):
+        """
+        Retorna los contadores del dashboard desde caché o, si no existen,
+        los calcula con una agregacion por coleccion
+
+        Returns:
+            dict: contadores de reservas, productos y usuarios
+        """
+        cached = self.redis_helper.get(STATS_CACHE_KEY)
+        if cached:
+            return json.loads(cached)
+
+        now = datetime.now()
+        stats = {
+            **self._reservation_counts(now),
+            **self._product_counts(),
+            **self._user_counts(now),
+        }
+
+        self.redis_helper.set_with_expiry(
+            STATS_CACHE_KEY,
+            json.dumps(stats),
+            get_config().CACHE_DASHBOARD_TIMEOUT
+        )
+        return stats
+
+    @staticmethod
+    def invalidate_stats():
+        """Invalida el snapshot de estadisticas (escrituras de reservas e inventario)"""
+        RedisHelper.delete(STATS_CACHE_KEY)
+
+    def _reservation_counts(self, now):
+        """Totales, pendientes, creadas hoy y pendientes que vencen en 24 horas"""
+        start_of_day = now.replace(hour=0, minute=0, second=0, microsecond=0)
+
+        pipeline = [
+            {'$facet': {
+                'total': [{'$count': 'n'}],
+                'pending': [
+                    {'$match': {'state': ReservationState.PENDING}},
+                    {'$count': 'n'}
+                ],
+                'today': [
+                    {'$match': {'created_at': {'$gte': start_of_day}}},
+                    {'$count': 'n'}
+                ],
+                'expiring_soon': [
+                    {'$match': {
+                        'state': ReservationState.PENDING,
+                        'expires_at': {'$gte': now, '$lte': now + timedelta(days=1)}
+                    }},
+                    {'$count': 'n'}
+                ],
+            }}
+        ]
+        facets = next(self.db.reservations.aggregate(pipeline))
+
+        return {
+            'total_reservations': self._facet_count(facets, 'total'),
+            'pending_reservations': self._facet_count(facets, 'pending'),
+            'today_reservations': self._facet_count(facets, 'today'),
+            'expiring_soon': self._facet_count(facets, 'expiring_soon'),
+        }
+
+    def _product_counts(self):
+        """
+        Productos activos y productos activos con al menos una variante
+        con stock disponible bajo el umbral
+        """
+        pipeline = [
+            {'$match': {'estado': 'activo'}},
+            {'$facet': {
+                'active': [{'$count': 'n'}],
+                'low_stock': [
+                    {'$lookup': {
+                        'from': 'variants',
+                        'localField': '_id',
+                        'foreignField': 'product_id',
+                        'pipeline': [{'$project': {'_id': 1}}],
+                        'as': 'variants'
+                    }},
+                    {'$lookup': {
+                        'from': 'inventory',
+                        'localField': 'variants._id',
+                        'foreignField': 'variant_id',
+                        'pipeline': [
+                            {'$match': {'disponible': {'$lt': LOW_STOCK_THRESHOLD}}},
+                            {'$limit': 1}
+                        ],
+                        'as': 'low_inventory'
+                    }},
+                    {'$match': {'low_inventory.0': {'$exists': True}}},
+                    {'$count': 'n'}
+                ],
+            }}
+        ]
+        facets = next(self.db.products.aggregate(pipeline))
+
+        return {
+            'active_products': self._facet_count(facets, 'active'),
+            'low_stock_products': self._facet_count(facets, 'low_stock'),
+        }
+
+    def _user_counts(self, now):
+        """Usuarios totales y registrados este mes"""
+        this_month_start = now.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+
+        pipeline = [
+            {'$facet': {
+                'total': [{'$count': 'n'}],
+                'new_this_month': [
+                    {'$match': {'created_at': {'$gte': this_month_start}}},
+                    {'$count': 'n'}
+                ],
+            }}
+        ]
+        facets = next(self.db.users.aggregate(pipeline))
+
+        return {
+            'total_users': self._facet_count(facets, 'total'),
+            'new_users_this_month': self._facet_count(facets, 'new_this_month'),
+        }
+
+    @staticmethod
+    def _facet_count(facets, name):
+        """Extrae el resultado de un $count dentro de un $facet (vacio si es 0)"""
+        result = facets.get(name) or []
+        return result[0]['n'] if result else 0
@@ -0,0 +1,152 @@
+"""
+Export Job Repository with proper lazy database loading
+Registro de exportaciones en segundo plano: estado, progreso y archivo
+generado (ver services/export_service y jobs/export_job)
+"""
+from app.config.database import get_db
+from bson import ObjectId
+from datetime import datetime
+from pymongo import ReturnDocument
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class ExportJobState:
+    """Estados de un job de exportación"""
+    PENDING = 'pending'
+    RUNNING = 'running'
+    DONE = 'done'
+    FAILED = 'failed'
+
+
+class ExportJobRepository:
+    """Repositorio de jobs de exportación (colección export_jobs)"""
+
+    def __init__(self):
+        self._db = None
+
+    # ============================================================================
+    # LAZY LOADING PROPERTIES - Database is only accessed when needed
+    # ============================================================================
+    @property
+    def db(self):
+        """Lazy load database connection - reuses existing connection pool"""
+        if self._db is None:
+            self._db = get_db()  # This now returns the SHARED database instance
+        return self._db
+
+    @property
+    def collection(self):
+        """Lazy load collection"""
+        return self.db.export_jobs
+
+    # ============================================================================
+    # REPOSITORY METHODS
+    # ============================================================================
+    def create(self, job_data):
+        now = datetime.utcnow()
+        job_data.update({
+            'state': ExportJobState.PENDING,
+            'progress': {'rows': 0, 'total_rows': None},
+            'created_at': now,
+            'updated_at': now,
+        })
+        result = self.collection.insert_one(job_data)
+        job_data['_id'] = result.inserted_id
+        return job_data
+
+    def find_by_id(self, job_id):
+        return self.collection.find_one({'_id': ObjectId(job_id)})
+
+    def claim(self, job_id):
+        """
+        Pasa el job de pending a running de forma atómica
+        Retorna el documento o None si otro worker ya lo tomó
+        """
+        now = datetime.utcnow()
+        return self.collection.find_one_and_update(
+            {'_id': ObjectId(job_id), 'state': ExportJobState.PENDING},
+            {'$set': {'state': ExportJobState.RUNNING, 'started_at': now, 'updated_at': now}},
+            return_document=ReturnDocument.AFTER
+        )
+
+    def update_progress(self, job_id, rows, total_rows=None):
+        """Actualiza el progreso; updated_at sirve de latido del worker"""
+        update = {'progress.rows': rows, 'updated_at': datetime.utcnow()}
+        if total_rows is not None:
+            update['progress.total_rows'] = total_rows
+        self.collection.update_one({'_id': ObjectId(job_id)}, {'$set': update})
+
+    def mark_done(self, job_id, file_path, size_bytes, rows, expires_at):
+        """
+        Cierra el job como terminado si sigue en running
+
+        Returns:
+            bool: False si el job ya no estaba en running (p. ej. fail_stale lo cerró)
+        """
+        now = datetime.utcnow()
+        result = self.collection.update_one(
+            {'_id': ObjectId(job_id), 'state': ExportJobState.RUNNING},
+            {'$set': {
+                'state': ExportJobState.DONE,
+                'file_path': file_path,
+                'size_bytes': size_bytes,
+                'progress.rows': rows,
+                'finished_at': now,
+                'updated_at': now,
+                'expires_at': expires_at,
+            }}
+        )
+        return result.modified_count > 0
+
+    def mark_failed(self, job_id, error, expires_at):
+        """
+        Cierra el job como fallido si sigue en running
+
+        Returns:
+            bool: False si el job ya no estaba en running
+        """
+        now = datetime.utcnow()
+        result = self.collection.update_one(
+            {'_id': ObjectId(job_id), 'state': ExportJobState.RUNNING},
+            {'$set': {
+                'state': ExportJobState.FAILED,
+                'error': error,
+                'finished_at': now,
+                'updated_at': now,
+                'expires_at': expires_at,
+            }}
+        )
+        return result.modified_count > 0
+
+    def find_expired(self, now=None):
+        """Jobs terminados cuyo archivo ya expiró"""
+        return list(self.collection.find({'expires_at': {'$lte': now or datetime.utcnow()}}))
+
+    def fail_stale(self, stale_before, expires_at):
+        """
+        Marca como fallidos los jobs en running sin latido desde stale_before
+        (el proceso que los ejecutaba terminó). Los pending no se tocan: no
+        tienen latido mientras esperan turno en el pool de export_runner
+
+        Returns:
+            int: jobs marcados
+        """
+        result = self.collection.update_many(
+            {
+                'state': ExportJobState.RUNNING,
+                'updated_at': {'$lt': stale_before}
+            },
+            {'$set': {
+                'state': ExportJobState.FAILED,
+                'error': 'La exportación se interrumpió',
+                'finished_at': datetime.utcnow(),
+                'expires_at': expires_at,
+            }}
+        )
+        return result.modified_count
+
+    def delete(self, job_id):
+        result = self.collection.delete_one({'_id': ObjectId(job_id)})
+        return result.deleted_count > 0
@@ -4,13 +4,52 @@ Inventory Repository with proper lazy database loading
 This prevents creating new connections on every instantiation
 """
 from bson import ObjectId
-from app.config.database import get_db
+from pymongo import ReturnDocument, UpdateOne
+from app.config.database import get_db, after_commit
 from app.models.inventory import Inventory
+from app.repositories.dashboard_repository import DashboardRepository
+from app.repositories.pagination import keyset_filter, keyset_sort
+from app.repositories.product_repository import PRODUCTS_CACHE_NAMESPACE
+from app.utils.local_cache import get_local_cache, on_invalidation
+from app.utils.text_utils import normalize_text
 from datetime import datetime
+import re
 import logging
 
 logger = logging.getLogger(__name__)
 
+# Etapa de pipeline que recalcula el campo mantenido 'disponible'
+# (stock_total - stock_retenido, sin bajar de 0). Se agrega al final de
+# cada update de stock para que el valor cambie en la misma escritura.
+SET_DISPONIBLE = {
+    '$set': {
+        'disponible': {'$max': [0, {'$subtract': [
+            {'$ifNull': ['$stock_total', 0]},
+            {'$ifNull': ['$stock_retenido', 0]}
+        ]}]}
+    }
+}
+
+# Caché local de nombres (variante, producto, actor) del historial de
+# movimientos; se limpia junto con la de productos (renombres)
+MOVEMENT_NAMES_CACHE_NAMESPACE = "movement_names"
+on_invalidation(
+    PRODUCTS_CACHE_NAMESPACE,
+    lambda: get_local_cache(MOVEMENT_NAMES_CACHE_NAMESPACE).clear()
+)
+
+MOVEMENT_PROJECTION = {
+    "_id": 1,
+    "variant_id": 1,
+    "movement_type": 1,
+    "quantity": 1,
+    "reason": 1,
+    "actor_id": 1,
+    "creado_en": 1,
+    "stock_before": 1,
+    "stock_after": 1,
+}
+
 
 class InventoryRepository:
     def __init__(self):
@@ -39,18 +78,50 @@ class InventoryRepository:
     # ============================================================================
     # REPOSITORY METHODS - Now use properties instead of direct access
     # ============================================================================
-    def find_by_variant_id(self, variant_id):
-        return self.collection.find_one({'variant_id': ObjectId(variant_id)})
+    def find_by_variant_id(self, variant_id, session=None):
+        return self.collection.find_one({'variant_id': ObjectId(variant_id)}, session=session)
 
     def find_by_id(self, inventory_id):
         return self.collection.find_one({'_id': ObjectId(inventory_id)})
 
-    def get_all(self, skip=0, limit=20):
-        cursor = self.collection.find({}).sort('actualizado_en', -1).skip(skip).limit(limit)
-        return list(cursor)
-
-    def get_movements_detailed(self, skip=0, limit=50, filters=None):
-        filters = filters or {}
+    def get_all(self, skip=0, limit=20, cursor=None):
+        query = keyset_filter({}, 'actualizado_en', cursor)
+        results = self.collection.find(query).sort(keyset_sort('actualizado_en')).skip(skip).limit(limit)
+        return list(results)
+
+    def get_movements_detailed(self, skip=0, limit=50, filters=None, cursor=None):
+        """
+        Historial de movimientos para la pantalla de auditoría
+
+        Filtra, ordena y pagina solo sobre inventory_movements (índices
+        (variant_id|movement_type|actor_id, creado_en, _id)) y luego resuelve
+        nombres de variante, producto y actor desde una caché en memoria, en
+        lugar de tres $lookup por fila.
+
+        Args:
+            filters: variant_id, movement_type, actor_id, product_id,
+                product (prefijo del nombre), date_from, date_to
+            cursor: token de continuación (ver repositories/pagination)
+        """
+        match = self._movements_match(filters or {})
+        if match is None:
+            return []
+
+        results = self.movements_collection.find(
+            keyset_filter(match, 'creado_en', cursor),
+            MOVEMENT_PROJECTION
+        ).sort(keyset_sort('creado_en')).skip(int(skip)).limit(int(limit))
+
+        movements = list(results)
+        self._attach_movement_names(movements)
+        return movements
+
+    def _movements_match(self, filters):
+        """
+        Construye el filtro de movimientos; los filtros por producto se
+        traducen a variant_id $in. Retorna None si ningún movimiento puede
+        coincidir (producto sin variantes).
+        """
         match = {}
 
         if filters.get("variant_id"):
@@ -59,70 +130,117 @@ class InventoryRepository:
         if filters.get("movement_type"):
             match["movement_type"] = filters["movement_type"]
 
-        pipeline = [
-            {"$match": match},
-            {"$sort": {"creado_en": -1}},
-            {"$skip": int(skip)},
-            {"$limit": int(limit)},
-
-            # Variant
-            {"$lookup": {
-                "from": "variants",
-                "localField": "variant_id",
-                "foreignField": "_id",
-                "as": "variant"
-            }},
-            {"$unwind": {"path": "$variant", "preserveNullAndEmptyArrays": True}},
-
-            # Product
-            {"$lookup": {
-                "from": "products",
-                "localField": "variant.product_id",
-                "foreignField": "_id",
-                "as": "product"
-            }},
-            {"$unwind": {"path": "$product", "preserveNullAndEmptyArrays": True}},
-
-            # Actor (ajusta "users" si tu colección se llama distinto)
-            {"$lookup": {
-                "from": "users",
-                "localField": "actor_id",
-                "foreignField": "_id",
-                "as": "actor"
-            }},
-            {"$unwind": {"path": "$actor", "preserveNullAndEmptyArrays": True}},
-
-            {"$project": {
-                "_id": 1,
-                "variant_id": 1,
-                "movement_type": 1,
-                "quantity": 1,
-                "reason": 1,
-                "actor_id": 1,
-                "creado_en": 1,
-
-                "stock_before": 1,
-                "stock_after": 1,
-
-                # Nombres
-                "product_name": "$product.nombre",
-                "variant_name": {"$ifNull": ["$variant.tamano_pieza", "$variant.nombre"]},
-
-                # Actor: intenta varios campos típicos
-                "actor_name": {
-                    "$ifNull": [
-                        "$actor.nombre",
-                        {"$ifNull": ["$actor.name", "$actor.email"]}
-                    ]
-                },
-            }},
-        ]
-
-        return list(self.movements_collection.aggregate(pipeline))
-
+        if filters.get("actor_id"):
+            match["actor_id"] = ObjectId(filters["actor_id"])
+
+        date_range = {}
+        if filters.get("date_from"):
+            date_range["$gte"] = filters["date_from"]
+        if filters.get("date_to"):
+            date_range["$lte"] = filters["date_to"]
+        if date_range:
+            match["creado_en"] = date_range
+
+        product_query = None
+        if filters.get("product_id"):
+            product_query = {"product_id": ObjectId(filters["product_id"])}
+        elif filters.get("product"):
+            normalized = normalize_text(filters["product"])
+            if normalized:
+                product_ids = [
+                    p["_id"] for p in self.db.products.find(
+                        {"nombre_normalizado": {"$regex": f"^{re.escape(normalized)}"}},
+                        {"_id": 1}
+                    )
+                ]
+                product_query = {"product_id": {"$in": product_ids}}
+
+        if product_query is not None:
+            variant_ids = [v["_id"] for v in self.db.variants.find(product_query, {"_id": 1})]
+            if not variant_ids:
+                return None
+            if "variant_id" in match:
+                if match["variant_id"] not in variant_ids:
+                    return None
+            else:
+                match["variant_id"] = {"$in": variant_ids}
+
+        return match
+
+    def _attach_movement_names(self, movements):
+        """Agrega product_name, variant_name y actor_name a cada movimiento"""
+        variants = self._cached_names(
+            'variant',
+            {m.get("variant_id") for m in movements},
+            lambda ids: {
+                v["_id"]: {
+                    "product_id": v.get("product_id"),
+                    "name": v.get("tamano_pieza") or v.get("nombre")
+                }
+                for v in self.db.variants.find(
+                    {"_id": {"$in": ids}}, {"product_id": 1, "tamano_pieza": 1, "nombre": 1}
+                )
+            }
+        )
+        products = self._cached_names(
+            'product',
+            {v["product_id"] for v in variants.values() if v and v.get("product_id")},
+            lambda ids: {
+                p["_id"]: p.get("nombre")
+                for p in self.db.products.find({"_id": {"$in": ids}}, {"nombre": 1})
+            }
+        )
+        actors = self._cached_names(
+            'actor',
+            {m.get("actor_id") for m in movements},
+            lambda ids: {
+                u["_id"]: u.get("nombre") or u.get("name") or u.get("email")
+                for u in self.db.users.find({"_id": {"$in": ids}}, {"nombre": 1, "name": 1, "email": 1})
+            }
+        )
 
-    def get_all_with_details(self, skip=0, limit=20):
+        for movement in movements:
+            variant = variants.get(movement.get("variant_id")) or {}
+            movement["variant_name"] = variant.get("name")
+            movement["product_name"] = products.get(variant.get("product_id"))
+            movement["actor_name"] = actors.get(movement.get("actor_id"))
+
+    def _cached_names(self, kind, ids, loader):
+        """
+        Resuelve ids -> valor desde la caché local de nombres; los faltantes
+        se cargan en una sola consulta $in (loader) y se guardan
+        """
+        cache = get_local_cache(MOVEMENT_NAMES_CACHE_NAMESPACE)
+        found = {}
+        missing = []
+
+        for _id in ids:
+            if _id is None:
+                continue
+            value = cache.get(f"{kind}:{_id}")
+            if value is None:
+                missing.append(_id)
+            else:
+                found[_id] = value
+
+        if missing:
+            epoch = cache.epoch
+            loaded = loader(missing)
+            for _id, value in loaded.items():
+                if value is not None:
+                    cache.set(f"{kind}:{_id}", value, epoch=epoch)
+            found.update(loaded)
+
+        return found
+
+    def get_all_with_details(self, skip=0, limit=20, cursor=None):
         pipeline = [
+            # Paginar primero (indice actualizado_en, _id) y unir solo la pagina;
+            # los unwind conservan la fila para no acortar la pagina si falta la variante
+            {'$match': keyset_filter({}, 'actualizado_en', cursor)},
+            {'$sort': dict(keyset_sort('actualizado_en'))},
+            {'$skip': skip},
+            {'$limit': limit},
             {
                 '$lookup': {
                     'from': 'variants',
@@ -131,7 +249,7 @@ class InventoryRepository:
                     'as': 'variant_details'
                 }
             },
-            {'$unwind': '$variant_details'},
+            {'$unwind': {'path': '$variant_details', 'preserveNullAndEmptyArrays': True}},
             {
                 '$lookup': {
                     'from': 'products',
@@ -140,7 +258,7 @@ class InventoryRepository:
                     'as': 'product_details'
                 }
             },
-            {'$unwind': '$product_details'},
+            {'$unwind': {'path': '$product_details', 'preserveNullAndEmptyArrays': True}},
             {
                 '$project': {
                     '_id': 1,
@@ -154,10 +272,7 @@ class InventoryRepository:
                     'variant_size': '$variant_details.tamano_pieza',
                     'variant_price': '$variant_details.precio'
                 }
-            },
-            {'$sort': {'actualizado_en': -1}},
-            {'$skip': skip},
-            {'$limit': limit}
+            }
         ]
 
         return list(self.collection.aggregate(pipeline))
@@ -191,6 +306,7 @@ class InventoryRepository:
                 actor_id=actor_id
             )
         
+        self._invalidate_dashboard_cache()
         return self.collection.find_one({'_id': result.inserted_id})
 
     def create(self, inventory):
@@ -208,19 +324,23 @@ class InventoryRepository:
             after=after
         )
 
+        self._invalidate_dashboard_cache()
         return self.collection.find_one({"_id": result.inserted_id})
 
     def update_stock_total(self, variant_id, new_stock_total):
         result = self.collection.update_one(
             {'variant_id': ObjectId(variant_id)},
-            {
-                '$set': {
+            [
+                {'$set': {
                     'stock_total': new_stock_total,
                     'actualizado_en': datetime.utcnow()
-                }
-            }
+                }},
+                SET_DISPONIBLE
+            ]
         )
 
+        if result.modified_count:
+            self._invalidate_dashboard_cache()
         return result.modified_count > 0
 
     def get_available_stock(self, variant_id):
@@ -233,68 +353,222 @@ class InventoryRepository:
         retained_stock = inventory.get('stock_retenido', 0)
         return max(0, total_stock - retained_stock)
 
-    def increase_retained_stock(self, variant_id, quantity, reason='reservation_created'):
-        before = self._snapshot(variant_id)
+    def increase_retained_stock(self, variant_id, quantity, reason='reservation_created', actor_id=None, session=None):
+        """
+        Retiene stock de forma atomica: un solo find_one_and_update que solo
+        aplica el $inc si stock_total - stock_retenido >= quantity.
+        Dos reservas concurrentes no pueden sobre-vender la misma variante.
+        """
+        updated = self._conditional_retain(variant_id, quantity, session=session)
+        if not updated:
+            return False
 
-        result = self.collection.update_one(
-            {'variant_id': ObjectId(variant_id)},
+        self._log_movement(**self._retain_movement(updated, quantity, reason, actor_id), session=session)
+        self._invalidate_dashboard_cache(session)
+        return True
+
+    def retain_stock_items(self, items, reason='reservation_created', actor_id=None, session=None):
+        """
+        Retiene stock para varios items en modo todo-o-nada
+        Cada item es un find_one_and_update condicional; si alguno no tiene
+        disponibilidad suficiente se revierten los ya retenidos.
+
+        Returns:
+            tuple: (True, None) si todo se retuvo, (False, variant_id) con la
+                   primera variante sin stock suficiente en caso contrario
+        """
+        retained = []
+
+        for item in items:
+            updated = self._conditional_retain(item['variant_id'], item['quantity'], session=session)
+            if not updated:
+                self._revert_retained_items([item for item, _ in retained], session=session)
+                return False, item['variant_id']
+            retained.append((item, updated))
+
+        movements = [
+            self._build_movement(**self._retain_movement(updated, item['quantity'], reason, actor_id))
+            for item, updated in retained
+        ]
+        if movements:
+            self.movements_collection.insert_many(movements, session=session)
+
+        self._invalidate_dashboard_cache(session)
+        return True, None
+
+    def _revert_retained_items(self, items, session=None):
+        """
+        Compensa las retenciones parciales de retain_stock_items
+        (sin movimiento: esas retenciones tampoco llegaron a registrarse)
+        """
+        for item in items:
+            self.collection.update_one(
+                {'variant_id': ObjectId(item['variant_id'])},
+                [
+                    {'$set': {
+                        'stock_retenido': {'$subtract': ['$stock_retenido', item['quantity']]},
+                        'actualizado_en': datetime.utcnow()
+                    }},
+                    SET_DISPONIBLE
+                ],
+                session=session
+            )
+
+    def _conditional_retain(self, variant_id, quantity, session=None):
+        """find_one_and_update filtrado por disponibilidad; retorna el documento actualizado o None"""
+        return self.collection.find_one_and_update(
             {
-                '$inc': {'stock_retenido': quantity},
-                '$set': {'actualizado_en': datetime.utcnow()}
-            }
+                'variant_id': ObjectId(variant_id),
+                '$expr': {
+                    '$gte': [{'$subtract': ['$stock_total', '$stock_retenido']}, quantity]
+                }
+            },
+            [
+                {'$set': {
+                    'stock_retenido': {'$add': ['$stock_retenido', quantity]},
+                    'actualizado_en': datetime.utcnow()
+                }},
+                SET_DISPONIBLE
+            ],
+            return_document=ReturnDocument.AFTER,
+            session=session
         )
 
-        if result.modified_count > 0:
-            after = self._snapshot(variant_id)
-            self._log_movement(
-                variant_id=variant_id,
-                quantity=quantity,
-                movement_type='retain',
-                reason=reason,
-                actor_id=None,
-                before=before,
-                after=after
-            )
-
-        return result.modified_count > 0
+    def _retain_movement(self, updated, quantity, reason, actor_id):
+        """Argumentos de movimiento 'retain' a partir del documento ya actualizado"""
+        total = int(updated.get('stock_total', 0) or 0)
+        retained = int(updated.get('stock_retenido', 0) or 0)
+
+        return {
+            'variant_id': updated['variant_id'],
+            'quantity': quantity,
+            'movement_type': 'retain',
+            'reason': reason,
+            'actor_id': actor_id,
+            'before': {'total': total, 'retained': retained - quantity,
+                       'available': max(0, total - retained + quantity)},
+            'after': {'total': total, 'retained': retained,
+                      'available': max(0, total - retained)},
+        }
 
+    def decrease_retained_stock(self, variant_id, quantity, reason='reservation_released', actor_id=None,
+                                session=None):
+        """
+        Libera stock retenido en una sola escritura (sin bajar de 0)
+        El snapshot 'before' sale del documento previo que retorna find_one_and_update
+        """
+        previous = self.collection.find_one_and_update(
+            {'variant_id': ObjectId(variant_id)},
+            [
+                {'$set': {
+                    'stock_retenido': {'$max': [0, {'$subtract': ['$stock_retenido', quantity]}]},
+                    'actualizado_en': datetime.utcnow()
+                }},
+                SET_DISPONIBLE
+            ],
+            return_document=ReturnDocument.BEFORE,
+            session=session
+        )
 
+        if not previous:
+            return False
 
-    def decrease_retained_stock(self, variant_id, quantity, reason='reservation_released'):
-        before = self._snapshot(variant_id)
+        total = int(previous.get('stock_total', 0) or 0)
+        retained_before = int(previous.get('stock_retenido', 0) or 0)
+        retained_after = max(0, retained_before - quantity)
 
-        inventory = self.find_by_variant_id(variant_id)
-        if not inventory:
+        if retained_after == retained_before:
             return False
 
-        current_retained = inventory.get('stock_retenido', 0)
-        new_retained = max(0, current_retained - quantity)
-
-        result = self.collection.update_one(
-            {'variant_id': ObjectId(variant_id)},
-            {
-                '$set': {
-                    'stock_retenido': new_retained,
-                    'actualizado_en': datetime.utcnow()
-                }
-            }
+        self._log_movement(
+            variant_id=variant_id,
+            quantity=-quantity,
+            movement_type='release',
+            reason=reason,
+            actor_id=actor_id,
+            before={'total': total, 'retained': retained_before,
+                    'available': max(0, total - retained_before)},
+            after={'total': total, 'retained': retained_after,
+                   'available': max(0, total - retained_after)},
+            session=session
         )
 
-        if result.modified_count > 0:
-            after = self._snapshot(variant_id)
-            self._log_movement(
-                variant_id=variant_id,
-                quantity=-quantity,
-                movement_type='release',
-                reason=reason,
-                actor_id=None, 
-                before=before,
-                after=after
+        self._invalidate_dashboard_cache(session)
+        return True
+
+    def release_retained_bulk(self, releases, session=None):
+        """
+        Libera stock retenido de muchos items a la vez
+        Agrega los deltas por variante, los aplica con un solo bulk_write e
+        inserta todos los movimientos con insert_many.
+
+        Args:
+            releases: lista de dicts {'variant_id', 'quantity', 'reason'}
+
+        Returns:
+            int: numero de variantes actualizadas
+        """
+        deltas = {}
+        for release in releases:
+            variant_id = ObjectId(str(release['variant_id']))
+            deltas[variant_id] = deltas.get(variant_id, 0) + int(release['quantity'])
+
+        if not deltas:
+            return 0
+
+        # Estado previo de todas las variantes afectadas (para los snapshots)
+        current = {
+            inv['variant_id']: inv for inv in
+            self.collection.find({'variant_id': {'$in': list(deltas)}}, session=session)
+        }
+
+        now = datetime.utcnow()
+        operations = [
+            UpdateOne(
+                {'variant_id': variant_id},
+                [
+                    {'$set': {
+                        'stock_retenido': {'$max': [0, {'$subtract': ['$stock_retenido', delta]}]},
+                        'actualizado_en': now
+                    }},
+                    SET_DISPONIBLE
+                ]
             )
+            for variant_id, delta in deltas.items()
+            if variant_id in current
+        ]
+        if not operations:
+            return 0
 
-        return result.modified_count > 0
+        result = self.collection.bulk_write(operations, ordered=False, session=session)
+
+        # Un movimiento por item, encadenando snapshots dentro de cada variante
+        retained = {vid: int(inv.get('stock_retenido', 0) or 0) for vid, inv in current.items()}
+        movements = []
+        for release in releases:
+            variant_id = ObjectId(str(release['variant_id']))
+            if variant_id not in current:
+                continue
+
+            total = int(current[variant_id].get('stock_total', 0) or 0)
+            before = retained[variant_id]
+            after = max(0, before - int(release['quantity']))
+            retained[variant_id] = after
+
+            movements.append(self._build_movement(
+                variant_id=variant_id,
+                quantity=-int(release['quantity']),
+                movement_type='release',
+                reason=release['reason'],
+                before={'total': total, 'retained': before, 'available': max(0, total - before)},
+                after={'total': total, 'retained': after, 'available': max(0, total - after)}
+            ))
 
+        if movements:
+            self.movements_collection.insert_many(movements, session=session)
 
+        self._invalidate_dashboard_cache(session)
+        return result.modified_count
 
     def adjust_stock(self, variant_id, delta, reason, actor_id=None):
         before = self._snapshot(variant_id)
@@ -312,12 +586,13 @@ class InventoryRepository:
 
         result = self.collection.update_one(
             {'variant_id': ObjectId(variant_id)},
-            {
-                '$set': {
+            [
+                {'$set': {
                     'stock_total': new_stock,
                     'actualizado_en': datetime.utcnow()
-                }
-            }
+                }},
+                SET_DISPONIBLE
+            ]
         )
 
         if result.modified_count > 0:
@@ -331,6 +606,7 @@ class InventoryRepository:
                 before=before,
                 after=after
             )
+            self._invalidate_dashboard_cache()
 
         return result.modified_count > 0
     
@@ -345,9 +621,9 @@ class InventoryRepository:
         except Exception:
             return None
 
-    def _snapshot(self, variant_id):
+    def _snapshot(self, variant_id, session=None):
         """Snapshot del inventario para logs (total, retenido, disponible)."""
-        inv = self.find_by_variant_id(str(variant_id))
+        inv = self.find_by_variant_id(str(variant_id), session=session)
         if not inv:
             return {"total": 0, "retained": 0, "available": 0}
 
@@ -358,12 +634,20 @@ class InventoryRepository:
         return {"total": total, "retained": retained, "available": available}
 
 
-    def _log_movement(self, variant_id, quantity, movement_type, reason, actor_id=None, before=None, after=None):
+    def _log_movement(self, variant_id, quantity, movement_type, reason, actor_id=None, before=None, after=None,
+                      session=None):
         """Registra un movimiento de inventario en la bitácora, incluyendo snapshot."""
-        before = before or self._snapshot(variant_id)
-        after = after or self._snapshot(variant_id)
+        movement = self._build_movement(variant_id, quantity, movement_type, reason, actor_id, before, after,
+                                        session=session)
+        self.movements_collection.insert_one(movement, session=session)
 
-        movement = {
+    def _build_movement(self, variant_id, quantity, movement_type, reason, actor_id=None, before=None, after=None,
+                        session=None):
+        """Construye el documento de movimiento (snapshot incluido) sin insertarlo."""
+        before = before or self._snapshot(variant_id, session=session)
+        after = after or self._snapshot(variant_id, session=session)
+
+        return {
             "variant_id": ObjectId(str(variant_id)),
             "quantity": int(quantity),
             "movement_type": movement_type,
@@ -382,27 +666,94 @@ class InventoryRepository:
             "stock_retenido_after": after.get("retained", 0),
         }
 
-        self.movements_collection.insert_one(movement)
-
 
-    def get_movements(self, variant_id=None, movement_type=None, skip=0, limit=50):
-        """Obtiene el historial de movimientos"""
+    def get_movements(self, variant_id=None, movement_type=None, skip=0, limit=50, cursor=None):
+        """Obtiene el historial de movimientos (cursor: token de continuación)"""
         query = {}
         if variant_id:
             query['variant_id'] = ObjectId(variant_id)
         if movement_type:
             query['movement_type'] = movement_type
+        query = keyset_filter(query, 'creado_en', cursor)
 
-        cursor = self.movements_collection.find(query).sort('creado_en', -1).skip(skip).limit(limit)
-        return list(cursor)
+        results = self.movements_collection.find(query).sort(keyset_sort('creado_en')).skip(skip).limit(limit)
+        return list(results)
 
     def validate_availability(self, variant_id, quantity):
         """Valida si hay suficiente stock disponible"""
         available = self.get_available_stock(variant_id)
         return available >= quantity
 
+    def find_low_stock(self, threshold=10, limit=50, only_active=False):
+        """
+        Variantes con stock disponible menor al umbral, de menor a mayor
+        Consulta de rango sobre el indice de 'disponible' con datos de producto
+
+        Args:
+            threshold: umbral de stock disponible
+            limit: maximo de variantes a retornar
+            only_active: si es True, solo variantes de productos activos
+        """
+        pipeline = [
+            {'$match': {'disponible': {'$lt': threshold}}},
+            {'$sort': {'disponible': 1}},
+            {'$lookup': {
+                'from': 'variants',
+                'localField': 'variant_id',
+                'foreignField': '_id',
+                'as': 'variant_details'
+            }},
+            {'$unwind': '$variant_details'},
+            {'$lookup': {
+                'from': 'products',
+                'localField': 'variant_details.product_id',
+                'foreignField': '_id',
+                'as': 'product_details'
+            }},
+            {'$unwind': '$product_details'},
+        ]
+        if only_active:
+            pipeline.append({'$match': {'product_details.estado': 'activo'}})
+
+        pipeline += [
+            {'$limit': limit},
+            {'$project': {
+                '_id': 1,
+                'variant_id': 1,
+                'stock_total': 1,
+                'stock_retenido': 1,
+                'disponible': 1,
+                'actualizado_en': 1,
+                'creado_en': 1,
+                'product_id': '$product_details._id',
+                'product_name': '$product_details.nombre',
+                'product_category': '$product_details.categoria',
+                'product_estado': '$product_details.estado',
+                'variant_size': '$variant_details.tamano_pieza',
+                'variant_price': '$variant_details.precio'
+            }}
+        ]
+
+        return list(self.collection.aggregate(pipeline))
+
+    def backfill_disponible(self):
+        """
+        Calcula 'disponible' en los documentos existentes (migracion)
+        Es idempotente: recalcula el campo a partir del stock actual
+
+        Returns:
+            int: documentos modificados
+        """
+        result = self.collection.update_many({}, [SET_DISPONIBLE])
+        self._invalidate_dashboard_cache()
+        return result.modified_count
+
     def count(self):
         """Cuenta el total de registros de inventario"""
         return self.collection.count_documents({})
+
+    def _invalidate_dashboard_cache(self, session=None):
+        """Invalida el snapshot de estadisticas del dashboard (tras el commit si hay transacción)"""
+        after_commit(session, DashboardRepository.invalidate_stats)
     
     
\ No newline at end of file
@@ -4,6 +4,8 @@ This prevents creating new connections on every instantiation
 """
 from app.config.database import get_db
 from app.models.in_app_notification import InAppNotification
+from app.repositories.pagination import keyset_filter, keyset_sort
+from app.utils.notification_stream import notification_stream
 from bson import ObjectId
 from datetime import datetime
 import logging
@@ -38,6 +40,11 @@ class NotificationRepository:
             result = self.collection.insert_one(notification.to_dict())
             notification._id = result.inserted_id
             logger.info(f"Notificación creada: {notification._id}")
+            notification_stream.publish(notification.user_id, {
+                'type': 'notification',
+                'notification': notification.to_json(),
+                'unread_delta': 0 if notification.read else 1
+            })
             return notification
         except Exception as e:
             logger.error(f"Error creando notificación: {str(e)}")
@@ -52,7 +59,7 @@ class NotificationRepository:
             logger.error(f"Error obteniendo notificación {notification_id}: {str(e)}")
             return None
     
-    def get_user_notifications(self, user_id, unread_only=False, limit=50, skip=0):
+    def get_user_notifications(self, user_id, unread_only=False, limit=50, skip=0, cursor=None):
         """
         Obtiene notificaciones de un usuario
         Args:
@@ -60,14 +67,19 @@ class NotificationRepository:
             unread_only: Si True, solo notificaciones no leídas
             limit: Límite de resultados
             skip: Número de resultados a saltar
+            cursor: Token de continuación (ver repositories/pagination)
+
+        Raises:
+            ValueError: si el cursor no es válido
         """
+        query = {'user_id': ObjectId(user_id)}
+        if unread_only:
+            query['read'] = False
+        page_query = keyset_filter(query, 'created_at', cursor)
+
         try:
-            query = {'user_id': ObjectId(user_id)}
-            if unread_only:
-                query['read'] = False
-            
-            cursor = self.collection.find(query).sort('created_at', -1).skip(skip).limit(limit)
-            notifications = [InAppNotification.from_dict(data) for data in cursor]
+            results = self.collection.find(page_query).sort(keyset_sort('created_at')).skip(skip).limit(limit)
+            notifications = [InAppNotification.from_dict(data) for data in results]
             
             # Obtener total de no leídas
             unread_count = self.collection.count_documents({
@@ -96,6 +108,8 @@ class NotificationRepository:
                     }
                 }
             )
+            if result.modified_count:
+                self._publish_unread_delta(user_id, -1)
             return result.modified_count > 0
         except Exception as e:
             logger.error(f"Error marcando notificación {notification_id} como leída: {str(e)}")
@@ -113,6 +127,8 @@ class NotificationRepository:
                     }
                 }
             )
+            if result.modified_count:
+                self._publish_unread_delta(user_id, -result.modified_count)
             return result.modified_count
         except Exception as e:
             logger.error(f"Error marcando todas las notificaciones como leídas para usuario {user_id}: {str(e)}")
@@ -121,11 +137,13 @@ class NotificationRepository:
     def delete_notification(self, notification_id, user_id):
         """Elimina una notificación"""
         try:
-            result = self.collection.delete_one({
-                '_id': ObjectId(notification_id),
-                'user_id': ObjectId(user_id)
-            })
-            return result.deleted_count > 0
+            deleted = self.collection.find_one_and_delete(
+                {'_id': ObjectId(notification_id), 'user_id': ObjectId(user_id)},
+                projection={'read': 1}
+            )
+            if deleted and not deleted.get('read'):
+                self._publish_unread_delta(user_id, -1)
+            return deleted is not None
         except Exception as e:
             logger.error(f"Error eliminando notificación {notification_id}: {str(e)}")
             return False
@@ -141,6 +159,10 @@ class NotificationRepository:
             logger.error(f"Error obteniendo conteo de no leídas para usuario {user_id}: {str(e)}")
             return 0
     
+    def _publish_unread_delta(self, user_id, delta):
+        """Avisa a las conexiones SSE del usuario (ver utils/notification_stream)"""
+        notification_stream.publish(user_id, {'type': 'unread_delta', 'delta': delta})
+    
     def create_notification_for_admins(self, notification_data):
         """Crea notificaciones para todos los administradores"""
         try:
@@ -0,0 +1,100 @@
+"""
+Paginación por cursor (keyset) compartida por los repositorios
+En lugar de .skip(n), cada página continúa desde la última fila de la
+anterior: el token opaco codifica (valor de la clave de orden, _id) y la
+consulta filtra "después de" ese par usando el índice (clave, _id). Una
+página profunda cuesta lo mismo que la primera.
+"""
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from datetime import datetime
+from bson import ObjectId
+from bson.errors import InvalidId
+import json
+
+
+def encode_cursor(sort_value, doc_id):
+    """Codifica (valor de orden, _id) de la última fila como token opaco"""
+    if isinstance(sort_value, datetime):
+        payload = {'v': sort_value.isoformat(), 't': 'dt'}
+    elif isinstance(sort_value, ObjectId):
+        payload = {'v': str(sort_value), 't': 'oid'}
+    else:
+        payload = {'v': sort_value}
+    payload['id'] = str(doc_id)
+
+    raw = json.dumps(payload, separators=(',', ':')).encode('utf-8')
+    return urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+
+def decode_cursor(token):
+    """
+    Decodifica un token de encode_cursor
+
+    Returns:
+        tuple: (valor de orden, ObjectId)
+
+    Raises:
+        ValueError: si el token no es válido
+    """
+    try:
+        padded = token + '=' * (-len(token) % 4)
+        payload = json.loads(urlsafe_b64decode(padded.encode('ascii')))
+
+        value = payload.get('v')
+        if payload.get('t') == 'dt':
+            value = datetime.fromisoformat(value)
+        elif payload.get('t') == 'oid':
+            value = ObjectId(value)
+
+        return value, ObjectId(payload['id'])
+    except (ValueError, KeyError, TypeError, InvalidId):
+        raise ValueError("Cursor de paginación inválido")
+
+
+def keyset_filter(query, sort_field, cursor, direction=-1):
+    """
+    Agrega a query la condición "después del cursor" para el orden
+    (sort_field, _id) en la dirección indicada (-1 descendente, 1 ascendente)
+    """
+    if not cursor:
+        return query
+
+    value, last_id = decode_cursor(cursor)
+    op = '$lt' if direction == -1 else '$gt'
+
+    if value is None:
+        # Los nulos van al final en orden descendente y al inicio en ascendente
+        after = [{sort_field: None, '_id': {op: last_id}}]
+        if direction == 1:
+            after.append({sort_field: {'$ne': None}})
+    else:
+        after = [
+            {sort_field: {op: value}},
+            {sort_field: value, '_id': {op: last_id}},
+        ]
+        if direction == -1:
+            # Los nulos/ausentes aún no se recorrieron y nunca cumplen $lt
+            after.append({sort_field: None})
+
+    if query:
+        return {'$and': [query, {'$or': after}]}
+    return {'$or': after}
+
+
+def keyset_sort(sort_field, direction=-1):
+    """Orden estable para keyset: la clave y _id como desempate"""
+    return [(sort_field, direction), ('_id', direction)]
+
+
+def page_cursor(items, limit, sort_field):
+    """
+    Token para la página siguiente a partir del último elemento
+    Acepta dicts o modelos (atributos); retorna None si no hay más páginas
+    """
+    if not items or len(items) < limit:
+        return None
+
+    last = items[-1]
+    if isinstance(last, dict):
+        return encode_cursor(last.get(sort_field), last.get('_id'))
+    return encode_cursor(getattr(last, sort_field, None), getattr(last, '_id', None))
@@ -3,18 +3,31 @@ Product Repository with proper lazy database loading
 This prevents creating new connections on every instantiation
 """
 from bson import ObjectId
+from pymongo import ReturnDocument, UpdateOne
 from app.config.database import get_db, RedisHelper
+from app.repositories.catalog_repository import CatalogRepository
+from app.utils.local_cache import get_local_cache, publish_invalidation
+from app.utils.text_utils import normalize_text
+from app.repositories.pagination import keyset_filter, keyset_sort
 from datetime import datetime
 import json
+import re
 import logging
 
 logger = logging.getLogger(__name__)
 
+# Namespace versionado de la caché de productos (detalle y búsquedas)
+PRODUCTS_CACHE_NAMESPACE = "products"
+
+# Campos que alimentan los contadores productCount del catálogo
+CATALOG_USAGE_FIELDS = {'categoria': 1, 'tags': 1}
+
 
 class ProductRepository:
     def __init__(self):
         self._db = None
         self.redis_helper = RedisHelper()
+        self.local_cache = get_local_cache(PRODUCTS_CACHE_NAMESPACE)
 
     # ============================================================================
     # LAZY LOADING PROPERTIES - Database is only accessed when needed
@@ -41,43 +54,81 @@ class ProductRepository:
     # ============================================================================
 
     def find_by_id(self, product_id):
-        cache_key = f"product:{product_id}"
+        local_key = f"product:{product_id}"
+        # Copia superficial: los servicios agregan claves (p.ej. variantes) al dict
+        product = self.local_cache.get(local_key)
+        if product is not None:
+            return dict(product)
+
+        epoch = self.local_cache.epoch
+        cache_key = self.redis_helper.namespaced_key(PRODUCTS_CACHE_NAMESPACE, local_key)
         cached = self.redis_helper.get(cache_key)
 
         if cached:
             logger.info(f"Product {product_id} obtenido de caché")
-            return json.loads(cached)
+            product = json.loads(cached)
+            self.local_cache.set(local_key, product, epoch=epoch)
+            return dict(product)
 
         # Use property - this will lazy-load DB connection if needed
         product = self.products_collection.find_one({'_id': ObjectId(product_id)})
 
         if product:
             product['_id'] = str(product['_id'])
-            self.redis_helper.set_with_expiry(cache_key, json.dumps(product, default=str), 600)
+            payload = json.dumps(product, default=str)
+            self.redis_helper.set_with_expiry(cache_key, payload, 600)
+            # Guardar localmente la misma forma que se lee de Redis
+            self.local_cache.set(local_key, json.loads(payload), epoch=epoch)
 
         return product
 
-    def find_all(self, filters=None, skip=0, limit=20):
-        """Busca todos los productos con filtros opcionales"""
-        query = filters or {}
+    def find_all(self, filters=None, skip=0, limit=20, cursor=None):
+        """
+        Busca todos los productos con filtros opcionales
+        cursor: token de continuación (ver repositories/pagination)
+        """
+        query = keyset_filter(filters or {}, 'created_at', cursor)
 
-        cursor = self.products_collection.find(query).sort('created_at', -1).skip(skip).limit(limit)
+        results = self.products_collection.find(query).sort(keyset_sort('created_at')).skip(skip).limit(limit)
         products = []
-        for product in cursor:
+        for product in results:
             product['_id'] = str(product['_id'])
             products.append(product)
 
         return products
 
-    def search_and_filter(self, search_text=None, categoria=None, tags=None, disponibilidad=True, skip=0, limit=20):
-        """Busca y filtra productos"""
+    def search_and_filter(self, search_text=None, categoria=None, tags=None, disponibilidad=True, skip=0, limit=20,
+                          prefix=None, cursor=None):
+        """
+        Busca y filtra productos
+
+        Args:
+            search_text: busqueda de texto completo sobre el indice 'products_text'
+                (nombre, descripcion_embalaje, categoria, tags; español, sin
+                acentos); los resultados se ordenan por relevancia
+            prefix: busqueda por prefijo del nombre (autocompletado), anclada
+                sobre el indice de 'nombre_normalizado'
+            cursor: token de continuación; no aplica a search_text (orden por relevancia)
+        """
         query = {}
+        sort_field = 'nombre'
+        projection = None
+
+        if cursor and search_text:
+            raise ValueError("La paginación por cursor no está disponible con search_text")
 
         if disponibilidad:
             query['estado'] = 'activo'
 
         if search_text:
-            query['nombre'] = {'$regex': search_text, '$options': 'i'}
+            query['$text'] = {'$search': search_text}
+            projection = {'score': {'$meta': 'textScore'}}
+        elif prefix:
+            normalized = normalize_text(prefix)
+            if normalized:
+                # re.escape: el texto del usuario nunca se interpreta como regex
+                query['nombre_normalizado'] = {'$regex': f'^{re.escape(normalized)}'}
+                sort_field = 'nombre_normalizado'
 
         if categoria:
             query['categoria'] = categoria
@@ -88,33 +139,75 @@ class ProductRepository:
             else:
                 query['tags'] = tags
 
-        cache_key = f"products_search:{json.dumps(query, sort_keys=True)}:{skip}:{limit}"
+        if search_text:
+            sort = [('score', {'$meta': 'textScore'}), ('nombre', 1), ('_id', 1)]
+        else:
+            sort = keyset_sort(sort_field, 1)
+            query = keyset_filter(query, sort_field, cursor, direction=1)
+
+        local_key = f"products_search:{json.dumps(query, sort_keys=True, default=str)}:{skip}:{limit}"
+        products = self.local_cache.get(local_key)
+        if products is not None:
+            return [dict(product) for product in products]
+
+        epoch = self.local_cache.epoch
+        cache_key = self.redis_helper.namespaced_key(PRODUCTS_CACHE_NAMESPACE, local_key)
         cached = self.redis_helper.get(cache_key)
 
         if cached:
             logger.info("Resultados de búsqueda obtenidos de caché")
-            return json.loads(cached)
+            products = json.loads(cached)
+            self.local_cache.set(local_key, products, epoch=epoch)
+            return [dict(product) for product in products]
 
-        cursor = self.products_collection.find(query).sort('nombre', 1).skip(skip).limit(limit)
+        results = self.products_collection.find(query, projection).sort(sort).skip(skip).limit(limit)
         products = []
-        for product in cursor:
+        for product in results:
             product['_id'] = str(product['_id'])
+            product.pop('score', None)
             products.append(product)
 
-        self.redis_helper.set_with_expiry(cache_key, json.dumps(products, default=str), 300)
+        payload = json.dumps(products, default=str)
+        self.redis_helper.set_with_expiry(cache_key, payload, 300)
+        self.local_cache.set(local_key, json.loads(payload), epoch=epoch)
 
         return products
 
     def create(self, product_data):
+        if 'nombre' in product_data:
+            product_data['nombre_normalizado'] = normalize_text(product_data['nombre'])
+
         result = self.products_collection.insert_one(product_data)
         product_data['_id'] = str(result.inserted_id)
 
+        CatalogRepository().apply_product_usage(after=product_data)
         self._invalidate_products_cache()
 
         return product_data
 
     def update(self, product_id, update_data):
         update_data['updated_at'] = datetime.utcnow()
+        if 'nombre' in update_data:
+            update_data['nombre_normalizado'] = normalize_text(update_data['nombre'])
+
+        if 'categoria' in update_data or 'tags' in update_data:
+            # Leer categoria/tags previos en la misma operación para ajustar productCount
+            before = self.products_collection.find_one_and_update(
+                {'_id': ObjectId(product_id)},
+                {'$set': update_data},
+                projection=CATALOG_USAGE_FIELDS,
+                return_document=ReturnDocument.BEFORE
+            )
+            if before is None:
+                return False
+
+            after = {
+                'categoria': update_data.get('categoria', before.get('categoria')),
+                'tags': update_data.get('tags', before.get('tags')),
+            }
+            CatalogRepository().apply_product_usage(before=before, after=after)
+            self._invalidate_products_cache()
+            return True
 
         result = self.products_collection.update_one(
             {'_id': ObjectId(product_id)},
@@ -122,19 +215,21 @@ class ProductRepository:
         )
 
         if result.modified_count > 0:
-            self._invalidate_product_cache(product_id)
             self._invalidate_products_cache()
 
         return result.modified_count > 0
 
     def delete(self, product_id):
-        result = self.products_collection.delete_one({'_id': ObjectId(product_id)})
+        deleted = self.products_collection.find_one_and_delete(
+            {'_id': ObjectId(product_id)},
+            projection=CATALOG_USAGE_FIELDS
+        )
 
-        if result.deleted_count > 0:
-            self._invalidate_product_cache(product_id)
+        if deleted is not None:
+            CatalogRepository().apply_product_usage(before=deleted)
             self._invalidate_products_cache()
 
-        return result.deleted_count > 0
+        return deleted is not None
 
     def update_state(self, product_id, new_state):
         return self.update(product_id, {'estado': new_state})
@@ -144,6 +239,11 @@ class ProductRepository:
         query = filters or {}
         return self.products_collection.count_documents(query)
 
+    def get_active_names(self):
+        """Nombres de los productos activos (índice de autocompletado)"""
+        cursor = self.products_collection.find({'estado': 'activo'}, {'nombre': 1, '_id': 0})
+        return [p['nombre'] for p in cursor if p.get('nombre')]
+
     def get_categories(self):
         pipeline = [
             {
@@ -206,15 +306,46 @@ class ProductRepository:
 
         return self.products_collection.count_documents(query)
 
-    def _invalidate_product_cache(self, product_id):
-        """Invalida el caché de un producto específico"""
-        cache_key = f"product:{product_id}"
-        self.redis_helper.delete(cache_key)
+    def backfill_normalized_names(self, batch_size=500):
+        """
+        Calcula 'nombre_normalizado' en los productos existentes (migracion)
+        Es idempotente; escribe por lotes con bulk_write
+
+        Returns:
+            int: productos modificados
+        """
+        modified = 0
+        operations = []
+
+        for product in self.products_collection.find({}, {'nombre': 1, 'nombre_normalizado': 1}):
+            normalized = normalize_text(product.get('nombre'))
+            if product.get('nombre_normalizado') == normalized:
+                continue
+
+            operations.append(UpdateOne(
+                {'_id': product['_id']},
+                {'$set': {'nombre_normalizado': normalized}}
+            ))
+            if len(operations) >= batch_size:
+                modified += self.products_collection.bulk_write(operations, ordered=False).modified_count
+                operations = []
+
+        if operations:
+            modified += self.products_collection.bulk_write(operations, ordered=False).modified_count
+
+        if modified:
+            self._invalidate_products_cache()
+
+        return modified
 
     def _invalidate_products_cache(self):
-        """Invalida todo el caché de productos y búsquedas"""
-        self.redis_helper.delete_pattern("products_search:*")
-        self.redis_helper.delete_pattern("product:*")
+        """
+        Invalida todo el caché de productos y búsquedas
+        Un INCR de la generación del namespace (las claves viejas expiran por TTL)
+        y un mensaje pub/sub para que cada worker limpie su caché local
+        """
+        self.redis_helper.bump_generation(PRODUCTS_CACHE_NAMESPACE)
+        publish_invalidation(PRODUCTS_CACHE_NAMESPACE)
 
 
 class VariantRepository:
@@ -248,6 +379,43 @@ class VariantRepository:
             variants.append(variant)
         return variants
 
+    def find_with_availability_by_product_ids(self, product_ids):
+        """
+        Carga en una sola agregacion las variantes de varios productos junto con
+        su disponibilidad (stock_total - stock_retenido) desde inventory.
+        Retorna un dict product_id (str) -> lista de variantes
+        """
+        object_ids = [ObjectId(pid) for pid in product_ids]
+        if not object_ids:
+            return {}
+
+        pipeline = [
+            {'$match': {'product_id': {'$in': object_ids}}},
+            {'$lookup': {
+                'from': 'inventory',
+                'localField': '_id',
+                'foreignField': 'variant_id',
+                'as': 'inventory'
+            }},
+            {'$addFields': {
+                'disponibilidad': {
+                    '$max': [0, {'$subtract': [
+                        {'$ifNull': [{'$arrayElemAt': ['$inventory.stock_total', 0]}, 0]},
+                        {'$ifNull': [{'$arrayElemAt': ['$inventory.stock_retenido', 0]}, 0]}
+                    ]}]
+                }
+            }},
+            {'$project': {'inventory': 0}},
+        ]
+
+        variants_by_product = {str(pid): [] for pid in object_ids}
+        for variant in self.variants_collection.aggregate(pipeline):
+            variant['_id'] = str(variant['_id'])
+            variant['product_id'] = str(variant['product_id'])
+            variants_by_product[variant['product_id']].append(variant)
+
+        return variants_by_product
+
     def create(self, variant_data):
         result = self.variants_collection.insert_one(variant_data)
         variant_data['_id'] = str(result.inserted_id)
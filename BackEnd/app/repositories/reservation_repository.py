@@ -4,9 +4,11 @@ This prevents creating new connections on every instantiation
 """
 from datetime import datetime, time
 from bson import ObjectId
-from app.config.database import get_db
+from app.config.database import get_db, after_commit
 from app.models.reservation import Reservation
 from app.constants.states import ReservationState
+from app.repositories.dashboard_repository import DashboardRepository
+from app.repositories.pagination import keyset_filter, keyset_sort
 import logging
 
 logger = logging.getLogger(__name__)
@@ -36,10 +38,16 @@ class ReservationRepository:
     # ============================================================================
     # REPOSITORY METHODS - Now use properties instead of direct access
     # ============================================================================
-    def create(self, reservation):
+    def create(self, reservation, session=None):
         """Crea una nueva reserva"""
-        result = self.collection.insert_one(reservation.to_dict())
+        result = self.collection.insert_one(reservation.to_dict(), session=session)
         reservation._id = result.inserted_id
+        self._invalidate_dashboard_cache(session)
+
+        # Programar la expiracion en el scheduler por eventos de este proceso
+        from app.jobs.reservation_expiry_scheduler import expiry_scheduler
+        expiry_scheduler.schedule(reservation._id, reservation.expires_at)
+
         return reservation
 
     def count_by_user_id(self, user_id, state=None):
@@ -61,26 +69,27 @@ class ReservationRepository:
 
         return self.collection.count_documents(query)
 
-    def find_by_id(self, reservation_id):
+    def find_by_id(self, reservation_id, session=None):
         """Busca una reserva por ID"""
-        data = self.collection.find_one({'_id': ObjectId(reservation_id)})
+        data = self.collection.find_one({'_id': ObjectId(reservation_id)}, session=session)
         return Reservation.from_dict(data) if data else None
 
-    def find_by_user_id(self, user_id, state=None, skip=0, limit=20):
-        """Busca reservas de un usuario especifico"""
+    def find_by_user_id(self, user_id, state=None, skip=0, limit=20, cursor=None):
+        """Busca reservas de un usuario especifico (cursor: token de continuación)"""
         query = {'user_id': ObjectId(user_id)}
         if state:
             query['state'] = state
+        query = keyset_filter(query, 'created_at', cursor)
 
-        cursor = self.collection.find(query).sort('created_at', -1).skip(skip).limit(limit)
-        return [Reservation.from_dict(data) for data in cursor]
+        results = self.collection.find(query).sort(keyset_sort('created_at')).skip(skip).limit(limit)
+        return [Reservation.from_dict(data) for data in results]
 
-    def find_all(self, filters=None, skip=0, limit=20):
-        """Busca todas las reservas con filtros opcionales"""
-        query = filters or {}
+    def find_all(self, filters=None, skip=0, limit=20, cursor=None):
+        """Busca todas las reservas con filtros opcionales (cursor: token de continuación)"""
+        query = keyset_filter(filters or {}, 'created_at', cursor)
 
-        cursor = self.collection.find(query).sort('created_at', -1).skip(skip).limit(limit)
-        return [Reservation.from_dict(data) for data in cursor]
+        results = self.collection.find(query).sort(keyset_sort('created_at')).skip(skip).limit(limit)
+        return [Reservation.from_dict(data) for data in results]
 
     def find_expired(self):
         """Busca reservas vencidas que aun no han sido procesadas"""
@@ -92,6 +101,113 @@ class ReservationRepository:
         cursor = self.collection.find(query)
         return [Reservation.from_dict(data) for data in cursor]
 
+    def find_active_expirations(self):
+        """
+        Retorna (reservation_id, expires_at) de todas las reservas activas
+        Usado para precargar el scheduler de expiracion al iniciar
+        """
+        cursor = self.collection.find(
+            {'state': {'$in': ReservationState.active_states()}},
+            {'_id': 1, 'expires_at': 1}
+        )
+        return [
+            (str(doc['_id']), doc['expires_at'])
+            for doc in cursor if doc.get('expires_at')
+        ]
+
+    def claim_expired_batch(self, claim_token, limit=500, reservation_ids=None, session=None):
+        """
+        Reclama un lote de reservas vencidas y las marca como Expiradas
+        con un update_many etiquetado con claim_token. Solo se devuelven las
+        reservas que este proceso cambio de estado, por lo que dos barridos
+        concurrentes (o un barrido y una cancelacion) nunca liberan el mismo stock.
+        Quedan con stock_released=False hasta mark_stock_released: sin
+        transaccion (standalone) un fallo entre el reclamo y la liberacion se
+        recupera con reclaim_unreleased_batch.
+
+        Args:
+            claim_token: identificador unico del lote
+            limit: maximo de reservas por lote
+            reservation_ids: opcional, restringe el lote a estas reservas
+
+        Returns:
+            list: documentos reclamados (solo _id e items)
+        """
+        now = datetime.utcnow()
+        query = {
+            'state': {'$in': ReservationState.active_states()},
+            'expires_at': {'$lte': now}
+        }
+        if reservation_ids is not None:
+            query['_id'] = {'$in': [ObjectId(rid) for rid in reservation_ids]}
+
+        candidate_ids = [
+            doc['_id'] for doc in
+            self.collection.find(query, {'_id': 1}, session=session).limit(limit)
+        ]
+        if not candidate_ids:
+            return []
+
+        query['_id'] = {'$in': candidate_ids}
+        self.collection.update_many(
+            query,
+            {'$set': {
+                'state': ReservationState.EXPIRED,
+                'expired_at': now,
+                'expiry_claim': claim_token,
+                'expiry_claimed_at': now,
+                'stock_released': False
+            }},
+            session=session
+        )
+        self._invalidate_dashboard_cache(session)
+
+        return self._find_claimed(candidate_ids, claim_token, session)
+
+    def reclaim_unreleased_batch(self, claim_token, stale_before, limit=500, session=None):
+        """
+        Vuelve a reclamar reservas expiradas cuyo stock no se libero: el
+        reclamo anterior es de antes de stale_before (el proceso termino entre
+        el reclamo y la liberacion). Mismo contrato que claim_expired_batch
+
+        Returns:
+            list: documentos reclamados (solo _id e items)
+        """
+        query = {
+            'stock_released': False,
+            'expiry_claimed_at': {'$lte': stale_before}
+        }
+        candidate_ids = [
+            doc['_id'] for doc in
+            self.collection.find(query, {'_id': 1}, session=session).limit(limit)
+        ]
+        if not candidate_ids:
+            return []
+
+        query['_id'] = {'$in': candidate_ids}
+        self.collection.update_many(
+            query,
+            {'$set': {'expiry_claim': claim_token, 'expiry_claimed_at': datetime.utcnow()}},
+            session=session
+        )
+
+        return self._find_claimed(candidate_ids, claim_token, session)
+
+    def mark_stock_released(self, claim_token, session=None):
+        """Marca como liberado el stock de las reservas del lote"""
+        self.collection.update_many(
+            {'expiry_claim': claim_token, 'stock_released': False},
+            {'$set': {'stock_released': True}},
+            session=session
+        )
+
+    def _find_claimed(self, candidate_ids, claim_token, session):
+        return list(self.collection.find(
+            {'_id': {'$in': candidate_ids}, 'expiry_claim': claim_token},
+            {'_id': 1, 'items': 1},
+            session=session
+        ))
+
     def find_expiring_today(self):
         """Busca reservas que vencen el mismo dia"""
         now = datetime.utcnow()
@@ -108,12 +224,30 @@ class ReservationRepository:
         cursor = self.collection.find(query)
         return [Reservation.from_dict(data) for data in cursor]
 
-    def update(self, reservation_id, update_data):
+    def update(self, reservation_id, update_data, session=None):
         """Actualiza una reserva"""
         result = self.collection.update_one(
             {'_id': ObjectId(reservation_id)},
-            {'$set': update_data}
+            {'$set': update_data},
+            session=session
+        )
+        if result.modified_count:
+            self._invalidate_dashboard_cache(session)
+        return result.modified_count > 0
+
+    def transition_state(self, reservation_id, from_states, update_data, session=None):
+        """
+        Actualiza una reserva solo si sigue en uno de from_states
+        Evita que dos transiciones concurrentes (p.ej. cancelar y expirar)
+        liberen el mismo inventario dos veces
+        """
+        result = self.collection.update_one(
+            {'_id': ObjectId(reservation_id), 'state': {'$in': list(from_states)}},
+            {'$set': update_data},
+            session=session
         )
+        if result.modified_count:
+            self._invalidate_dashboard_cache(session)
         return result.modified_count > 0
 
     def update_state(self, reservation_id, new_state, timestamp_field=None):
@@ -130,6 +264,7 @@ class ReservationRepository:
     def delete(self, reservation_id):
         """Elimina una reserva (no recomendado, mejor usar estados)"""
         result = self.collection.delete_one({'_id': ObjectId(reservation_id)})
+        self._invalidate_dashboard_cache()
         return result.deleted_count > 0
 
     def count(self, filters=None):
@@ -174,69 +309,72 @@ class ReservationRepository:
     def get_export_rows(self, filters=None):
         """
         Retorna filas planas para export (una fila por item de reserva)
+        Carga todo en memoria; para exportaciones grandes usar iter_export_rows
+        """
+        return list(self.iter_export_rows(filters=filters))
+
+    def count_export_rows(self, filters=None):
+        """Cuenta las filas (items) que produciría iter_export_rows"""
+        pipeline = [
+            {"$match": self._export_match(filters or {})},
+            {"$group": {"_id": None, "total": {"$sum": {"$size": {"$ifNull": ["$items", []]}}}}},
+        ]
+        result = list(self.collection.aggregate(pipeline))
+        return result[0]["total"] if result else 0
+
+    def iter_export_rows(self, filters=None, batch_size=1000):
+        """
+        Cursor de filas planas para export (una fila por item de reserva)
+        Las filas llegan en lotes de batch_size ordenadas por (created_at, _id)
+        descendente, con los items de cada reserva contiguos
         filters:
           - state: str | None
           - date_from: datetime | None
           - date_to: datetime | None
         """
-        filters = filters or {}
-        match = {}
-
-        state = filters.get("state")
-        date_from = filters.get("date_from")  # datetime | None
-        date_to = filters.get("date_to")      # datetime | None
-
-        if state:
-            match["state"] = state
-
-        if date_from or date_to:
-            created_filter = {}
-            if date_from:
-                created_filter["$gte"] = date_from
-            if date_to:
-                created_filter["$lte"] = date_to
-            match["created_at"] = created_filter
-
         pipeline = [
-            {"$match": match},
+            {"$match": self._export_match(filters or {})},
 
-            # Un item por fila
-            {"$unwind": {"path": "$items", "preserveNullAndEmptyArrays": False}},
+            # Ordenar reservas antes del unwind (usa el índice y evita un
+            # $sort en memoria sobre todas las filas)
+            {"$sort": {"created_at": -1, "_id": -1}},
 
-            # Normalizar user_id a string para lookup robusto (user_id puede ser ObjectId o string)
+            # Normalizar ids a ObjectId una sola vez (datos legados pueden
+            # tenerlos como string, ver migrations/fix_reservation_object_ids.py)
+            # para que los $lookup usen el índice de _id. El usuario se
+            # resuelve por reserva, antes de expandir los items
             {"$addFields": {
-                "user_id_str": {"$toString": "$user_id"},
-                "variant_id_str": {"$toString": "$items.variant_id"},
-                "reservation_id_str": {"$toString": "$_id"},
+                "user_oid": {"$convert": {"input": "$user_id", "to": "objectId", "onError": None, "onNull": None}},
             }},
-
-            # Lookup user por comparación string($_id) == user_id_str
             {"$lookup": {
                 "from": "users",
-                "let": {"uid": "$user_id_str"},
-                "pipeline": [
-                    {"$match": {"$expr": {"$eq": [{"$toString": "$_id"}, "$$uid"]}}}
-                ],
+                "localField": "user_oid",
+                "foreignField": "_id",
+                "pipeline": [{"$project": {"nombre": 1, "name": 1, "email": 1}}],
                 "as": "user"
             }},
             {"$unwind": {"path": "$user", "preserveNullAndEmptyArrays": True}},
 
-            # Lookup variant por comparación string($_id) == variant_id_str
+            # Un item por fila
+            {"$unwind": {"path": "$items", "preserveNullAndEmptyArrays": False}},
+            {"$addFields": {
+                "variant_oid": {"$convert": {"input": "$items.variant_id", "to": "objectId", "onError": None, "onNull": None}},
+            }},
+
             {"$lookup": {
                 "from": "variants",
-                "let": {"vid": "$variant_id_str"},
-                "pipeline": [
-                    {"$match": {"$expr": {"$eq": [{"$toString": "$_id"}, "$$vid"]}}}
-                ],
+                "localField": "variant_oid",
+                "foreignField": "_id",
+                "pipeline": [{"$project": {"product_id": 1, "tamano_pieza": 1, "nombre": 1, "name": 1}}],
                 "as": "variant"
             }},
             {"$unwind": {"path": "$variant", "preserveNullAndEmptyArrays": True}},
 
-            # Lookup product desde variant.product_id (puede ser ObjectId normalmente)
             {"$lookup": {
                 "from": "products",
                 "localField": "variant.product_id",
                 "foreignField": "_id",
+                "pipeline": [{"$project": {"nombre": 1}}],
                 "as": "product"
             }},
             {"$unwind": {"path": "$product", "preserveNullAndEmptyArrays": True}},
@@ -244,7 +382,7 @@ class ReservationRepository:
             # Proyección final (campos export)
             {"$project": {
                 "_id": 0,
-                "reservation_id": "$reservation_id_str",
+                "reservation_id": {"$toString": "$_id"},
                 "state": 1,
                 "created_at": 1,
 
@@ -263,8 +401,65 @@ class ReservationRepository:
 
                 "quantity": {"$ifNull": ["$items.quantity", 0]},
             }},
-
-            {"$sort": {"created_at": -1}},
         ]
 
-        return list(self.collection.aggregate(pipeline))
+        return self.collection.aggregate(pipeline, batchSize=batch_size, allowDiskUse=True)
+
+    def _export_match(self, filters):
+        match = {}
+
+        state = filters.get("state")
+        date_from = filters.get("date_from")  # datetime | None
+        date_to = filters.get("date_to")      # datetime | None
+
+        if state:
+            match["state"] = state
+
+        if date_from or date_to:
+            created_filter = {}
+            if date_from:
+                created_filter["$gte"] = date_from
+            if date_to:
+                created_filter["$lte"] = date_to
+            match["created_at"] = created_filter
+
+        return match
+
+    def normalize_legacy_ids(self):
+        """
+        Convierte a ObjectId los user_id e items.variant_id guardados como
+        string por versiones anteriores (migracion). Es idempotente.
+
+        Returns:
+            int: reservas modificadas
+        """
+        def to_oid(expr):
+            # Los valores que no son un ObjectId válido se dejan como están
+            return {"$convert": {"input": expr, "to": "objectId", "onError": expr, "onNull": expr}}
+
+        result = self.collection.update_many(
+            {"$or": [
+                {"user_id": {"$type": "string"}},
+                {"items.variant_id": {"$type": "string"}},
+            ]},
+            [{"$set": {
+                "user_id": to_oid("$user_id"),
+                "items": {"$map": {
+                    "input": {"$ifNull": ["$items", []]},
+                    "as": "item",
+                    "in": {"$mergeObjects": ["$$item", {"variant_id": to_oid("$$item.variant_id")}]}
+                }}
+            }}]
+        )
+        return result.modified_count
+
+    def count_legacy_ids(self):
+        """Cuenta reservas con user_id o items.variant_id como string"""
+        return self.collection.count_documents({"$or": [
+            {"user_id": {"$type": "string"}},
+            {"items.variant_id": {"$type": "string"}},
+        ]})
+
+    def _invalidate_dashboard_cache(self, session=None):
+        """Invalida el snapshot de estadisticas del dashboard (tras el commit si hay transacción)"""
+        after_commit(session, DashboardRepository.invalidate_stats)
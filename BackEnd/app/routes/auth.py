@@ -7,6 +7,8 @@ from flask_jwt_extended import (
     create_refresh_token
 )
 from app.services.auth_service import AuthService
+from app.utils.token_blocklist import token_blocklist
+from app.utils.password_hasher import PasswordHasherBusy
 from app.schemas.auth_schema import LoginSchema, ForgotPasswordSchema, RegisterSchema
 from marshmallow import ValidationError
 import logging
@@ -40,6 +42,8 @@ def login():
         return jsonify({'error': 'Datos invalidos', 'details': e.messages}), 400
     except ValueError as e:
         return jsonify({'error': str(e)}), 401
+    except PasswordHasherBusy as e:
+        return jsonify({'error': str(e)}), 503
     except Exception as e:
         logger.error(f"Error en login: {str(e)}")
         return jsonify({'error': 'Error interno del servidor'}), 500
@@ -79,7 +83,7 @@ def logout():
         token_type = get_jwt()['type']
         
         # Revocar token
-        auth_service.logout(jti, token_type)
+        auth_service.logout(jti, token_type, get_jwt().get('exp'))
         
         return jsonify({'message': 'Sesion cerrada exitosamente'}), 200
         
@@ -93,26 +97,16 @@ def logout():
 def logout_all():
     """
     Cierra todas las sesiones
-    Revoca tanto access token como refresh token si estan disponibles
+    Invalida todos los access y refresh tokens emitidos al usuario
+    (generación de tokens, ver utils/token_blocklist)
     """
     try:
-        # Revocar access token
-        access_jti = get_jwt()['jti']
-        auth_service.logout(access_jti, 'access')
-        
-        # Si se proporciono refresh token, tambien revocarlo
-        refresh_token_header = request.headers.get('X-Refresh-Token')
-        if refresh_token_header:
-            from flask_jwt_extended import decode_token
-            try:
-                decoded = decode_token(refresh_token_header)
-                refresh_jti = decoded['jti']
-                auth_service.logout(refresh_jti, 'refresh')
-            except Exception as e:
-                logger.warning(f"No se pudo revocar refresh token: {str(e)}")
+        auth_service.logout_all(get_jwt_identity())
         
         return jsonify({'message': 'Todas las sesiones cerradas exitosamente'}), 200
         
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 404
     except Exception as e:
         logger.error(f"Error en logout-all: {str(e)}")
         return jsonify({'error': 'Error interno del servidor'}), 500
@@ -127,10 +121,9 @@ def verify_token():
     """
     try:
         current_user = get_jwt_identity()
-        jti = get_jwt()['jti']
         
         # Verificar si el token esta revocado
-        if auth_service.is_token_revoked(jti):
+        if token_blocklist.is_token_revoked(get_jwt()):
             return jsonify({'valid': False, 'reason': 'Token revocado'}), 401
         
         return jsonify({
@@ -172,6 +165,8 @@ def forgot_password():
         return jsonify({
             'message': 'Si el email existe, se ha generado una contraseña temporal. Revisa los logs del servidor.'
         }), 200
+    except PasswordHasherBusy as e:
+        return jsonify({'error': str(e)}), 503
     except Exception as e:
         logger.error(f"Error en forgot-password: {str(e)}")
         return jsonify({'error': 'Error interno del servidor'}), 500
@@ -220,6 +215,8 @@ def register():
         return jsonify({'error': 'Datos inválidos', 'details': e.messages}), 400
     except ValueError as e:
         return jsonify({'error': str(e)}), 400
+    except PasswordHasherBusy as e:
+        return jsonify({'error': str(e)}), 503
     except Exception as e:
         logger.error(f"Error en registro: {str(e)}")
         return jsonify({'error': 'Error interno del servidor'}), 500
\ No newline at end of file
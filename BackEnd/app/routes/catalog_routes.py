@@ -1,6 +1,7 @@
 from flask import Blueprint, request, jsonify
 from flask_jwt_extended import jwt_required, get_jwt_identity, get_jwt
 from marshmallow import ValidationError
+from bson.errors import InvalidId
 from app.schemas.catalog_schema import CreateCatalogItemSchema, UpdateCatalogItemSchema
 from app.services.catalog_service import CatalogService
 from app.constants.roles import UserRole
@@ -156,6 +157,23 @@ def delete_tag(tag_id):
         logger.error(f"Error eliminando tag: {str(e)}")
         return jsonify({"error": "Error interno del servidor"}), 500
 
+# ----------- Renames -----------
+@catalog_bp.route("/renames/<rename_id>", methods=["GET"])
+@jwt_required()
+@require_admin
+def get_rename_status(rename_id):
+    """Progreso de la propagación de un renombre de categoría/tag a los productos"""
+    try:
+        status = catalog_service.get_rename_status(rename_id)
+        if not status:
+            return jsonify({"error": "Renombre no encontrado"}), 404
+        return jsonify({"rename": status}), 200
+    except InvalidId:
+        return jsonify({"error": "Renombre no encontrado"}), 404
+    except Exception as e:
+        logger.error(f"Error obteniendo renombre: {str(e)}")
+        return jsonify({"error": "Error interno del servidor"}), 500
+
 @catalog_bp.route("/", methods=["GET"])
 def public_catalog():
     """
@@ -3,6 +3,7 @@ from flask_jwt_extended import jwt_required, get_jwt
 from app.repositories.reservation_repository import ReservationRepository
 from app.repositories.product_repository import ProductRepository
 from app.repositories.inventory_repository import InventoryRepository
+from app.repositories.dashboard_repository import DashboardRepository
 from app.config.database import get_db
 from app.constants.roles import UserRole
 from app.constants.states import ReservationState
@@ -15,6 +16,7 @@ dashboard_bp = Blueprint('dashboard', __name__)
 reservation_repo = ReservationRepository()
 product_repo = ProductRepository()
 inventory_repo = InventoryRepository()
+dashboard_repo = DashboardRepository()
 
 
 def require_admin(f):
@@ -39,73 +41,25 @@ def get_dashboard_stats():
     Obtiene estadisticas generales para el dashboard de administracion
     """
     try:
-        db = get_db()
-        
-        # Estadisticas de reservas
-        total_reservations = db.reservations.count_documents({})
-        pending_reservations = db.reservations.count_documents({'state': ReservationState.PENDING})
-        today_reservations = db.reservations.count_documents({
-            'created_at': {
-                '$gte': datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
-            }
-        })
-        
-        # Estadisticas de productos - CORREGIDO: usar 'estado' en vez de 'state'
-        total_products = db.products.count_documents({'estado': 'activo'})
-        
-        # Productos con stock bajo (menos de 10 unidades disponibles)
-        low_stock_count = 0
-        products = list(db.products.find({'estado': 'activo'}))
-        
-        for product in products:
-            # Buscar variantes en la coleccion variants (no dentro del producto)
-            variants = list(db.variants.find({'product_id': product['_id']}))
-            
-            for variant in variants:
-                # CORREGIDO: usar 'stock_total' y calcular disponible
-                inventory = db.inventory.find_one({'variant_id': variant['_id']})
-                if inventory:
-                    stock_total = inventory.get('stock_total', 0)
-                    stock_retenido = inventory.get('stock_retenido', 0)
-                    stock_disponible = stock_total - stock_retenido
-                    
-                    if stock_disponible < 10:
-                        low_stock_count += 1
-                        break
-        
-        # Estadisticas de usuarios
-        total_users = db.users.count_documents({})
-        this_month_start = datetime.now().replace(day=1, hour=0, minute=0, second=0, microsecond=0)
-        new_users_this_month = db.users.count_documents({
-            'created_at': {'$gte': this_month_start}
-        })
-        
-        # Alertas activas (reservas por expirar en las proximas 24 horas)
-        tomorrow = datetime.now() + timedelta(days=1)
-        expiring_soon = db.reservations.count_documents({
-            'state': ReservationState.PENDING,
-            'expires_at': {
-                '$gte': datetime.now(),
-                '$lte': tomorrow
-            }
-        })
+        # Contadores calculados con $facet y cacheados en Redis (TTL corto)
+        stats = dashboard_repo.get_stats()
         
         return jsonify({
             'stats': {
                 'pending_reservations': {
-                    'value': pending_reservations,
-                    'change': f'+{today_reservations} hoy'
+                    'value': stats['pending_reservations'],
+                    'change': f"+{stats['today_reservations']} hoy"
                 },
                 'active_products': {
-                    'value': total_products,
-                    'low_stock': low_stock_count
+                    'value': stats['active_products'],
+                    'low_stock': stats['low_stock_products']
                 },
                 'total_users': {
-                    'value': total_users,
-                    'new_this_month': new_users_this_month
+                    'value': stats['total_users'],
+                    'new_this_month': stats['new_users_this_month']
                 },
                 'alerts': {
-                    'value': expiring_soon + low_stock_count
+                    'value': stats['expiring_soon'] + stats['low_stock_products']
                 }
             }
         }), 200
@@ -223,40 +177,18 @@ def get_low_stock_products():
     Obtiene productos con stock bajo (menos de 10 unidades disponibles)
     """
     try:
-        db = get_db()
-        products = list(db.products.find({'estado': 'activo'}))
-        
-        low_stock_items = []
-        
-        for product in products:
-            # Buscar variantes en la coleccion variants
-            variants = list(db.variants.find({'product_id': product['_id']}))
-            
-            for variant in variants:
-                # CORREGIDO: usar 'stock_total' y calcular disponible
-                inventory = db.inventory.find_one({'variant_id': variant['_id']})
-                
-                if inventory:
-                    stock_total = inventory.get('stock_total', 0)
-                    stock_retenido = inventory.get('stock_retenido', 0)
-                    stock_disponible = stock_total - stock_retenido
-                else:
-                    stock_disponible = 0
-                
-                if stock_disponible < 10:
-                    low_stock_items.append({
-                        '_id': str(product['_id']),
-                        'name': product.get('nombre', 'Producto'),
-                        'variant_name': variant.get('tamano_pieza', 'Variante'),
-                        'stock': stock_disponible
-                    })
-                    
-                    # Limitar a 5 productos
-                    if len(low_stock_items) >= 5:
-                        break
-            
-            if len(low_stock_items) >= 5:
-                break
+        # Consulta de rango sobre el indice de 'disponible' (5 variantes, menor stock primero)
+        low_inventory = inventory_repo.find_low_stock(threshold=10, limit=5, only_active=True)
+        
+        low_stock_items = [
+            {
+                '_id': str(inv['product_id']),
+                'name': inv.get('product_name') or 'Producto',
+                'variant_name': inv.get('variant_size') or 'Variante',
+                'stock': inv.get('disponible', 0)
+            }
+            for inv in low_inventory
+        ]
         
         return jsonify({'products': low_stock_items}), 200
         
@@ -1,6 +1,7 @@
 from flask import Blueprint, request, jsonify
 from flask_jwt_extended import jwt_required, get_jwt_identity, get_jwt
 from app.repositories.inventory_repository import InventoryRepository
+from app.repositories.pagination import page_cursor
 from app.services.inventory_service import InventoryService
 from app.schemas.inventory_schema import (
     InventoryQuerySchema,
@@ -12,6 +13,7 @@ from app.schemas.inventory_schema import (
     InventoryMovementQuerySchema
 )
 from marshmallow import ValidationError
+from bson.errors import InvalidId
 from app.constants.roles import UserRole
 import logging
 
@@ -43,7 +45,7 @@ def require_role(required_role):
 def get_all_inventory():
     """
     Obtiene todo el inventario con detalles (ADMIN)
-    Query params: skip, limit
+    Query params: skip, limit, cursor (next_cursor de la página anterior)
     """
     try:
         # Validar parámetros
@@ -53,16 +55,20 @@ def get_all_inventory():
         # Obtener inventario
         inventory = inventory_service.get_all_inventory(
             skip=params.get('skip', 0),
-            limit=params.get('limit', 20)
+            limit=params.get('limit', 20),
+            cursor=params.get('cursor')
         )
 
         return jsonify({
             'inventory': inventory,
-            'count': len(inventory)
+            'count': len(inventory),
+            'next_cursor': page_cursor(inventory, params.get('limit', 20), 'actualizado_en')
         }), 200
 
     except ValidationError as e:
         return jsonify({'error': 'Parámetros inválidos', 'details': e.messages}), 400
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         logger.error(f"Error obteniendo inventario: {str(e)}")
         return jsonify({'error': 'Error interno del servidor'}), 500
@@ -268,32 +274,48 @@ def release_stock(variant_id):
         return jsonify({'error': 'Error interno del servidor'}), 500
 
 
-@inventory_bp.route("/movements", methods=["GET"])
+@inventory_bp.route('/movements', methods=['GET'])
 def movements():
-    skip = int(request.args.get("skip", 0))
-    limit = int(request.args.get("limit", 50))
-    variant_id = request.args.get("variant_id")
-    movement_type = request.args.get("movement_type")
-
-    filters = {}
-    if variant_id:
-        filters["variant_id"] = variant_id
-    if movement_type:
-        filters["movement_type"] = movement_type
+    """
+    Historial de movimientos de inventario (auditoría)
+    Query params: skip, limit, cursor, variant_id, movement_type, actor_id,
+    product_id, product (prefijo del nombre), date_from, date_to (ISO 8601)
+    """
+    try:
+        schema = InventoryMovementQuerySchema()
+        params = schema.load(request.args)
 
-    repo = InventoryRepository()
-    data = repo.get_movements_detailed(skip=skip, limit=limit, filters=filters)
+        filters = {
+            key: params.get(key)
+            for key in ('variant_id', 'movement_type', 'actor_id', 'product_id', 'product', 'date_from', 'date_to')
+            if params.get(key)
+        }
+        limit = params.get('limit', 50)
 
-    # Convertir ObjectId a string
-    for m in data:
-        m["_id"] = str(m["_id"])
-        m["variant_id"] = str(m["variant_id"])
-        if m.get("actor_id"):
-            m["actor_id"] = str(m["actor_id"])
+        data = inventory_service.get_inventory_movements_detailed(
+            skip=params.get('skip', 0),
+            limit=limit,
+            filters=filters,
+            cursor=params.get('cursor')
+        )
+        next_cursor = page_cursor(data, limit, 'creado_en')
 
-    return jsonify({"movements": data}), 200
+        # Convertir ObjectId a string
+        for m in data:
+            m['_id'] = str(m['_id'])
+            m['variant_id'] = str(m['variant_id'])
+            if m.get('actor_id'):
+                m['actor_id'] = str(m['actor_id'])
 
+        return jsonify({'movements': data, 'next_cursor': next_cursor}), 200
 
+    except ValidationError as e:
+        return jsonify({'error': 'Parámetros inválidos', 'details': e.messages}), 400
+    except (ValueError, InvalidId) as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        logger.error(f"Error obteniendo movimientos de inventario: {str(e)}")
+        return jsonify({'error': 'Error interno del servidor'}), 500
 
 
 @inventory_bp.route('/low-stock', methods=['GET'])
@@ -302,12 +324,13 @@ def movements():
 def get_low_stock_alerts():
     """
     Obtiene alertas de stock bajo (ADMIN)
-    Query param: threshold (default: 10)
+    Query params: threshold (default: 10), limit (default: 100)
     """
     try:
         threshold = int(request.args.get('threshold', 10))
+        limit = min(int(request.args.get('limit', 100)), 500)
 
-        low_stock = inventory_service.get_low_stock_alerts(threshold=threshold)
+        low_stock = inventory_service.get_low_stock_alerts(threshold=threshold, limit=limit)
 
         return jsonify({
             'low_stock_items': low_stock,
@@ -316,7 +339,7 @@ def get_low_stock_alerts():
         }), 200
 
     except ValueError:
-        return jsonify({'error': 'Threshold debe ser un número entero'}), 400
+        return jsonify({'error': 'Threshold y limit deben ser números enteros'}), 400
     except Exception as e:
         logger.error(f"Error obteniendo alertas de stock bajo: {str(e)}")
         return jsonify({'error': 'Error interno del servidor'}), 500
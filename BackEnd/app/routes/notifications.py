@@ -1,5 +1,5 @@
-from flask import Blueprint, request, jsonify
-from flask_jwt_extended import jwt_required, get_jwt_identity
+from flask import Blueprint, request, jsonify, Response
+from flask_jwt_extended import jwt_required, get_jwt_identity, get_jwt
 from app.services.notification_service import NotificationService
 import logging
 
@@ -26,6 +26,7 @@ def get_notifications():
         unread_only = request.args.get('unread_only', 'false').lower() == 'true'
         limit = int(request.args.get('limit', 50))
         skip = int(request.args.get('skip', 0))
+        cursor = request.args.get('cursor')
         
         # Validar límites
         if limit > 100:
@@ -39,7 +40,8 @@ def get_notifications():
             user_id=user_id,
             unread_only=unread_only,
             limit=limit,
-            skip=skip
+            skip=skip,
+            cursor=cursor
         )
         
         return jsonify(result), 200
@@ -67,6 +69,32 @@ def get_unread_count():
         return jsonify({'error': 'Error obteniendo conteo'}), 500
 
 
+@notifications_bp.route('/stream', methods=['GET'])
+@jwt_required()
+def stream_notifications():
+    """
+    Stream SSE de notificaciones del usuario actual
+    Eventos: unread_count (al conectar y tras resincronizar), notification
+    (nueva notificación) y unread_delta (cambio del contador). La conexión
+    se cierra al expirar el token.
+    """
+    try:
+        user_id = get_jwt_identity()
+        events = notification_service.stream_events(user_id, get_jwt())
+        return Response(
+            events,
+            mimetype='text/event-stream',
+            headers={
+                'Cache-Control': 'no-cache',
+                # Evita que nginx acumule la respuesta
+                'X-Accel-Buffering': 'no'
+            }
+        )
+    except Exception as e:
+        logger.error(f"Error abriendo stream de notificaciones: {str(e)}")
+        return jsonify({'error': 'Error abriendo stream de notificaciones'}), 500
+
+
 @notifications_bp.route('/<notification_id>/read', methods=['PUT'])
 @jwt_required()
 def mark_notification_as_read(notification_id):
@@ -1,6 +1,7 @@
 from flask import Blueprint, request, jsonify
 from flask_jwt_extended import jwt_required, get_jwt_identity, get_jwt
 from app.services.product_service import ProductService
+from app.services.suggest_service import SuggestService
 from app.schemas.product_schema import (
     ProductSearchSchema,
     CreateProductSchema,
@@ -15,6 +16,7 @@ logger = logging.getLogger(__name__)
 
 products_bp = Blueprint('products', __name__)
 product_service = ProductService()
+suggest_service = SuggestService()
 
 
 def require_role(required_role):
@@ -51,21 +53,57 @@ def search_catalog():
             tags=params.get('tags'),
             disponibilidad=params.get('disponibilidad', True),
             skip=params.get('skip', 0),
-            limit=params.get('limit', 20)
+            limit=params.get('limit', 20),
+            prefix=params.get('prefix'),
+            cursor=params.get('cursor')
         )
 
         return jsonify({
             'products': products,
-            'count': len(products)
+            'count': len(products),
+            'next_cursor': product_service.catalog_next_cursor(
+                products,
+                params.get('limit', 20),
+                search_text=params.get('search_text'),
+                prefix=params.get('prefix')
+            )
         }), 200
 
     except ValidationError as e:
         return jsonify({'error': 'Parámetros inválidos', 'details': e.messages}), 400
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         logger.error(f"Error buscando productos: {str(e)}")
         return jsonify({'error': 'Error interno del servidor'}), 500
 
 
+@products_bp.route('/suggest', methods=['GET'])
+def suggest_catalog():
+    """
+    Autocompletado del buscador: nombres de productos, categorías y tags
+    Se resuelve en memoria (sin consultar la base de datos)
+    Query params: q (prefijo), limit (default: 10, max: 20)
+    Disponible para todos (no requiere autenticación)
+    """
+    try:
+        prefix = (request.args.get('q') or '')[:100]
+        limit = min(max(int(request.args.get('limit', 10)), 1), 20)
+
+        suggestions = suggest_service.suggest(prefix, limit=limit)
+
+        return jsonify({
+            'suggestions': suggestions,
+            'count': len(suggestions)
+        }), 200
+
+    except ValueError:
+        return jsonify({'error': 'Limit debe ser un número entero'}), 400
+    except Exception as e:
+        logger.error(f"Error obteniendo sugerencias: {str(e)}")
+        return jsonify({'error': 'Error interno del servidor'}), 500
+
+
 @products_bp.route('/', methods=['GET'])
 def get_products():
     """
@@ -75,18 +113,24 @@ def get_products():
     try:
         skip = int(request.args.get('skip', 0))
         limit = int(request.args.get('limit', 20))
+        cursor = request.args.get('cursor')
 
         products = product_service.search_and_filter_catalog(
             disponibilidad=None,
             skip=skip,
-            limit=limit
+            limit=limit,
+            cursor=cursor
         )
 
         return jsonify({
             'products': products,
-            'count': len(products)
+            'count': len(products),
+            'next_cursor': product_service.catalog_next_cursor(products, limit)
         }), 200
 
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
     except Exception as e:
         logger.error(f"Error obteniendo productos: {str(e)}")
         return jsonify({'error': 'Error interno del servidor'}), 500
@@ -1,9 +1,9 @@
-from io import BytesIO
-from flask import Blueprint, request, jsonify, send_file
+from flask import Blueprint, request, jsonify, send_file, Response, stream_with_context
 from flask_jwt_extended import jwt_required, get_jwt_identity, get_jwt
 from app.services.reservation_service import ReservationService
 from app.services.notification_service import NotificationService
 from app.services.user_service import UserService
+from app.services.export_service import ExportService
 from app.schemas.reservation_schema import (
     CreateReservationSchema,
     UpdateReservationStateSchema,
@@ -11,6 +11,7 @@ from app.schemas.reservation_schema import (
 )
 from marshmallow import ValidationError
 from app.constants.roles import UserRole
+from app.repositories.pagination import page_cursor
 from bson import ObjectId
 import logging
 import csv
@@ -22,6 +23,7 @@ reservations_bp = Blueprint('reservations', __name__)
 reservation_service = ReservationService()
 notification_service = NotificationService()
 user_service = UserService()
+export_service = ExportService()
 
 
 def require_role(required_role):
@@ -114,7 +116,8 @@ def get_reservations():
                 user_id=user_id,
                 state=filters.get('state'),
                 skip=filters.get('skip', 0),
-                limit=filters.get('limit', 20)
+                limit=filters.get('limit', 20),
+                cursor=filters.get('cursor')
             )
         else:
             # Admin ve todas las reservas
@@ -127,7 +130,8 @@ def get_reservations():
             reservations = reservation_service.get_all_reservations(
                 filters=query_filters,
                 skip=filters.get('skip', 0),
-                limit=filters.get('limit', 20)
+                limit=filters.get('limit', 20),
+                cursor=filters.get('cursor')
             )
 
         # Convertir a dict
@@ -140,11 +144,14 @@ def get_reservations():
 
         return jsonify({
             'reservations': result,
-            'count': len(result)
+            'count': len(result),
+            'next_cursor': page_cursor(reservations, filters.get('limit', 20), 'created_at')
         }), 200
 
     except ValidationError as e:
         return jsonify({'error': 'Datos invalidos', 'details': e.messages}), 400
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         logger.error(f"Error obteniendo reservas: {str(e)}")
         return jsonify({'error': 'Error interno del servidor'}), 500
@@ -169,7 +176,8 @@ def get_my_reservations():
             user_id=user_id,
             state=filters.get('state'),
             skip=filters.get('skip', 0),
-            limit=filters.get('limit', 20)
+            limit=filters.get('limit', 20),
+            cursor=filters.get('cursor')
         )
 
         # Convertir a dict
@@ -182,11 +190,14 @@ def get_my_reservations():
 
         return jsonify({
             'reservations': result,
-            'count': len(result)
+            'count': len(result),
+            'next_cursor': page_cursor(reservations, filters.get('limit', 20), 'created_at')
         }), 200
 
     except ValidationError as e:
         return jsonify({'error': 'Datos invalidos', 'details': e.messages}), 400
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         logger.error(f"Error obteniendo reservas del usuario: {str(e)}")
         return jsonify({'error': 'Error interno del servidor'}), 500
@@ -363,6 +374,8 @@ def cancel_reservation(reservation_id):
 def export_reservations():
     """
     Exporta reservas en CSV o XLSX.
+    Genera el archivo dentro de la petición; para rangos grandes usar
+    POST /export/jobs (exportación en segundo plano).
     Query params:
       - format: csv | xlsx
       - state: opcional
@@ -376,16 +389,100 @@ def export_reservations():
 
     service = ReservationService()
 
-    file_bytes, mimetype, filename = service.export_reservations(
+    content, mimetype, filename = service.export_reservations(
         fmt=fmt,
         state=state,
         date_from=date_from,
         date_to=date_to,
     )
 
-    return send_file(
-        BytesIO(file_bytes),
+    if fmt == "xlsx":
+        # Archivo temporal: send_file lo cierra al terminar la respuesta
+        return send_file(
+            content,
+            mimetype=mimetype,
+            as_attachment=True,
+            download_name=filename
+        )
+
+    # CSV en streaming: las filas se escriben a medida que llegan del cursor
+    return Response(
+        stream_with_context(content),
         mimetype=mimetype,
-        as_attachment=True,
-        download_name=filename
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'}
     )
+
+
+@reservations_bp.route('/export/jobs', methods=['POST'])
+@jwt_required()
+@require_role(UserRole.ADMIN)
+def create_export_job():
+    """
+    Encola una exportación de reservas en segundo plano (ADMIN)
+    Body: format (csv | xlsx), state, date_from, date_to (YYYY-MM-DD)
+    Responde 202 con el id del job; consultar GET /export/jobs/<id>
+    """
+    try:
+        data = request.get_json(silent=True) or {}
+        admin_id = get_jwt_identity()
+
+        job = export_service.request_reservation_export(
+            admin_id=admin_id,
+            fmt=data.get('format'),
+            state=data.get('state') or None,
+            date_from=data.get('date_from') or None,
+            date_to=data.get('date_to') or None,
+        )
+
+        return jsonify({'message': 'Exportación en proceso', 'job': job}), 202
+
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        logger.error(f"Error encolando exportación: {str(e)}")
+        return jsonify({'error': 'Error interno del servidor'}), 500
+
+
+@reservations_bp.route('/export/jobs/<job_id>', methods=['GET'])
+@jwt_required()
+@require_role(UserRole.ADMIN)
+def get_export_job(job_id):
+    """Estado y progreso de una exportación (ADMIN)"""
+    try:
+        if not ObjectId.is_valid(job_id):
+            return jsonify({'error': 'ID de exportación inválido'}), 400
+
+        job = export_service.get_status(job_id)
+        if not job:
+            return jsonify({'error': 'Exportación no encontrada'}), 404
+
+        return jsonify({'job': job}), 200
+
+    except Exception as e:
+        logger.error(f"Error obteniendo exportación: {str(e)}")
+        return jsonify({'error': 'Error interno del servidor'}), 500
+
+
+@reservations_bp.route('/export/jobs/<job_id>/download', methods=['GET'])
+@jwt_required()
+@require_role(UserRole.ADMIN)
+def download_export_job(job_id):
+    """Descarga el archivo de una exportación terminada (ADMIN)"""
+    try:
+        if not ObjectId.is_valid(job_id):
+            return jsonify({'error': 'ID de exportación inválido'}), 400
+
+        path, mimetype, filename = export_service.get_artifact(job_id)
+
+        return send_file(
+            path,
+            mimetype=mimetype,
+            as_attachment=True,
+            download_name=filename
+        )
+
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 404
+    except Exception as e:
+        logger.error(f"Error descargando exportación: {str(e)}")
+        return jsonify({'error': 'Error interno del servidor'}), 500
@@ -10,6 +10,7 @@ from app.schemas.user_schema import (
 )
 from marshmallow import ValidationError
 from app.constants.roles import UserRole
+from app.utils.password_hasher import PasswordHasherBusy
 import logging
 
 logger = logging.getLogger(__name__)
@@ -126,6 +127,8 @@ def change_password():
         return jsonify({'error': 'Datos inválidos', 'details': e.messages}), 400
     except ValueError as e:
         return jsonify({'error': str(e)}), 400
+    except PasswordHasherBusy as e:
+        return jsonify({'error': str(e)}), 503
     except Exception as e:
         logger.error(f"Error cambiando contraseña: {str(e)}")
         return jsonify({'error': 'Error interno del servidor'}), 500
@@ -213,6 +216,8 @@ def create_user():
         return jsonify({'error': 'Datos invalidos', 'details': e.messages}), 400
     except ValueError as e:
         return jsonify({'error': str(e)}), 400
+    except PasswordHasherBusy as e:
+        return jsonify({'error': str(e)}), 503
     except Exception as e:
         logger.error(f"Error creando usuario: {str(e)}")
         return jsonify({'error': 'Error interno del servidor'}), 500
@@ -244,6 +249,8 @@ def update_user(user_id):
         return jsonify({'error': 'Datos invalidos', 'details': e.messages}), 400
     except ValueError as e:
         return jsonify({'error': str(e)}), 400
+    except PasswordHasherBusy as e:
+        return jsonify({'error': str(e)}), 503
     except Exception as e:
         logger.error(f"Error actualizando usuario: {str(e)}")
         return jsonify({'error': 'Error interno del servidor'}), 500
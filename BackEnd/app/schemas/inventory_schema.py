@@ -1,10 +1,12 @@
-from marshmallow import Schema, fields, validate
+from datetime import timezone
+from marshmallow import Schema, fields, validate, validates_schema, ValidationError
 
 
 class InventoryQuerySchema(Schema):
     variant_id = fields.Str(required=False, allow_none=True)
     skip = fields.Int(required=False, missing=0, validate=validate.Range(min=0))
     limit = fields.Int(required=False, missing=20, validate=validate.Range(min=1, max=100))
+    cursor = fields.Str(required=False, allow_none=True)
 
 
 class CreateInventorySchema(Schema):
@@ -39,5 +41,18 @@ class InventoryMovementQuerySchema(Schema):
         allow_none=True,
         validate=validate.OneOf(['retain', 'release', 'adjustment', 'initial'])
     )
+    actor_id = fields.Str(required=False, allow_none=True)
+    product_id = fields.Str(required=False, allow_none=True)
+    product = fields.Str(required=False, allow_none=True, validate=validate.Length(max=100))
+    # UTC sin zona horaria, como creado_en: '...Z' y fechas sin zona se
+    # pueden comparar entre sí y con los datos guardados
+    date_from = fields.NaiveDateTime(required=False, allow_none=True, timezone=timezone.utc)
+    date_to = fields.NaiveDateTime(required=False, allow_none=True, timezone=timezone.utc)
     skip = fields.Int(required=False, missing=0, validate=validate.Range(min=0))
     limit = fields.Int(required=False, missing=50, validate=validate.Range(min=1, max=100))
+    cursor = fields.Str(required=False, allow_none=True)
+
+    @validates_schema
+    def validate_date_range(self, data, **kwargs):
+        if data.get('date_from') and data.get('date_to') and data['date_from'] > data['date_to']:
+            raise ValidationError('date_from debe ser anterior a date_to', 'date_from')
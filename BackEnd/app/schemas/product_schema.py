@@ -2,12 +2,14 @@ from marshmallow import Schema, fields, validate, pre_load
 
 
 class ProductSearchSchema(Schema):
-    search_text = fields.Str(required=False, allow_none=True)
+    search_text = fields.Str(required=False, allow_none=True, validate=validate.Length(max=200))
+    prefix = fields.Str(required=False, allow_none=True, validate=validate.Length(max=100))
     categoria = fields.Str(required=False, allow_none=True)
     tags = fields.List(fields.Str(), required=False, allow_none=True)
     disponibilidad = fields.Bool(required=False, missing=True)
     skip = fields.Int(required=False, missing=0, validate=validate.Range(min=0))
     limit = fields.Int(required=False, missing=20, validate=validate.Range(min=1, max=100))
+    cursor = fields.Str(required=False, allow_none=True)
 
     @pre_load
     def process_tags(self, data, **kwargs):
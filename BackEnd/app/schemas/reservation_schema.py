@@ -35,6 +35,7 @@ class ReservationFilterSchema(Schema):
     user_id = fields.Str(required=False)
     skip = fields.Int(required=False, missing=0, validate=validate.Range(min=0))
     limit = fields.Int(required=False, missing=20, validate=validate.Range(min=1, max=100))
+    cursor = fields.Str(required=False, allow_none=True)
 
 
 class ReservationResponseSchema(Schema):
@@ -1,6 +1,9 @@
 from datetime import datetime, timedelta
 from flask_jwt_extended import create_access_token, create_refresh_token, get_jwt_identity, get_jwt
 from app.config.database import get_db
+from app.config.config import get_config
+from app.utils.token_blocklist import token_blocklist, TOKEN_GENERATION_CLAIM
+from app.utils.password_hasher import password_hasher
 from bson import ObjectId
 import logging
 
@@ -30,8 +33,6 @@ class AuthService:
         
     def login(self, email, password):
         """Autentica usuario y genera tokens (CU-001)"""
-        from werkzeug.security import check_password_hash
-        
         # Buscar usuario
         user = self.users_collection.find_one({'email': email})
         
@@ -43,16 +44,22 @@ class AuthService:
             raise ValueError("Cuenta inactiva")
         
         # Verificar contraseña
-        if not check_password_hash(user['password'], password):
+        if not password_hasher.verify(password, user['password']):
             raise ValueError("Credenciales invalidas")
         
+        # Actualizar hashes legados o con otro costo
+        if password_hasher.needs_rehash(user['password']):
+            self._rehash_password(user, password)
+        
         # Generar tokens
         user_id = str(user['_id'])
 
         # Datos adicionales en el token
         additional_claims = {
             'email': user['email'],
-            'role': user['role']
+            'role': user['role'],
+            # Generación vigente: logout_all invalida las anteriores
+            TOKEN_GENERATION_CLAIM: user.get('token_generation', 0)
         }
 
         access_token = create_access_token(
@@ -96,15 +103,16 @@ class AuthService:
             raise ValueError("Cuenta inactiva")
         
         # Verificar que el refresh token no este revocado
-        jti = get_jwt().get('jti')
-        if self.is_token_revoked(jti):
+        if token_blocklist.is_token_revoked(get_jwt()):
             raise ValueError("Token revocado")
         
         # Generar nuevo access token
         user_id = str(user['_id'])
         additional_claims = {
             'email': user['email'],
-            'role': user['role']
+            'role': user['role'],
+            # Generación vigente: logout_all invalida las anteriores
+            TOKEN_GENERATION_CLAIM: user.get('token_generation', 0)
         }
         
         new_access_token = create_access_token(
@@ -123,38 +131,66 @@ class AuthService:
             'refresh_token': new_refresh_token
         }
     
-    def logout(self, jti, token_type='access'):
-        """Cierra sesion revocando el token (CU-013)"""
-        
-        # Calcular tiempo de expiracion del token
-        if token_type == 'access':
-            # Access token expira en 1 hora
-            expires_at = datetime.utcnow() + timedelta(hours=1)
+    def _rehash_password(self, user, password):
+        """
+        Reemplaza el hash del usuario por uno con el algoritmo y costo vigentes
+        Un fallo no impide el login: se reintenta en el siguiente
+        """
+        try:
+            new_hash = password_hasher.hash(password)
+            # Solo si nadie cambió la contraseña mientras tanto
+            self.users_collection.update_one(
+                {'_id': user['_id'], 'password': user['password']},
+                {'$set': {'password': new_hash}}
+            )
+        except Exception as e:
+            logger.warning(f"No se pudo actualizar el hash del usuario {user['_id']}: {str(e)}")
+    
+    def logout(self, jti, token_type='access', exp=None):
+        """
+        Cierra sesion revocando el token (CU-013)
+
+        Args:
+            exp: claim 'exp' del token (timestamp); el JTI queda en la
+                 blocklist solo durante la vida restante del token
+        """
+        if exp is not None:
+            expires_at = datetime.utcfromtimestamp(exp)
         else:
-            # Refresh token expira en 30 dias
-            expires_at = datetime.utcnow() + timedelta(days=30)
-        
-        # Guardar token revocado
-        revoked_token = {
-            'jti': jti,
-            'token_type': token_type,
-            'revoked_at': datetime.utcnow(),
-            'expires_at': expires_at
-        }
+            config = get_config()
+            if token_type == 'access':
+                expires_at = datetime.utcnow() + config.JWT_ACCESS_TOKEN_EXPIRES
+            else:
+                expires_at = datetime.utcnow() + config.JWT_REFRESH_TOKEN_EXPIRES
         
-        self.revoked_tokens_collection.insert_one(revoked_token)
+        token_blocklist.revoke(jti, token_type, expires_at)
         
         logger.info(f"Token {jti} revocado exitosamente")
         
         return True
     
+    def logout_all(self, user_id):
+        """
+        Cierra todas las sesiones del usuario en O(1): incrementa su
+        generación de tokens en lugar de registrar cada JTI
+        """
+        generation = token_blocklist.revoke_all(user_id)
+        
+        logger.info(f"Sesiones del usuario {user_id} revocadas (generación {generation})")
+        
+        return True
+    
     def is_token_revoked(self, jti):
-        """Verifica si un token ha sido revocado"""
-        token = self.revoked_tokens_collection.find_one({'jti': jti})
-        return token is not None
+        """Verifica si un token ha sido revocado (ver utils/token_blocklist)"""
+        return token_blocklist.is_revoked(jti)
     
     def cleanup_expired_tokens(self):
-        """Limpia tokens revocados que ya expiraron"""
+        """
+        Limpia tokens revocados que ya expiraron
+        Normalmente no es necesario: el índice TTL sobre revoked_tokens.expires_at
+        (app/config/indexes.py) los elimina automáticamente. Se conserva como
+        limpieza manual para bases sin el índice.
+        """
         result = self.revoked_tokens_collection.delete_many({
             'expires_at': {'$lt': datetime.utcnow()}
         })
@@ -169,9 +205,8 @@ class AuthService:
         
         try:
             decoded = decode_token(token)
-            jti = decoded.get('jti')
             
-            if self.is_token_revoked(jti):
+            if token_blocklist.is_token_revoked(decoded):
                 return {'valid': False, 'reason': 'Token revocado'}
             
             return {'valid': True, 'data': decoded}
@@ -186,7 +221,6 @@ class AuthService:
         """
         import secrets
         import string
-        from werkzeug.security import generate_password_hash
         
         # Buscar usuario por email
         user = self.users_collection.find_one({'email': email})
@@ -205,7 +239,7 @@ class AuthService:
         temp_password += secrets.choice('!@#$%^&*')
         
         # Hash de la contraseña temporal
-        hashed_password = generate_password_hash(temp_password)
+        hashed_password = password_hasher.hash(temp_password)
         
         # Actualizar contraseña en la base de datos
         self.users_collection.update_one(
@@ -246,7 +280,6 @@ class AuthService:
         Registra un nuevo usuario en el sistema
         Por defecto con rol CLIENT y estado activo
         """
-        from werkzeug.security import generate_password_hash
         
         # Verificar que el email no exista
         existing_user = self.users_collection.find_one({'email': email})
@@ -256,7 +289,7 @@ class AuthService:
         # Crear usuario
         new_user = {
             'email': email,
-            'password': generate_password_hash(password),
+            'password': password_hasher.hash(password),
             'name': name,
             'phone': phone,
             'role': 'CLIENT',
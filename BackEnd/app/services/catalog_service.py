@@ -1,50 +1,30 @@
 import logging
 from app.repositories.catalog_repository import CatalogRepository
+from app.repositories.catalog_rename_repository import CatalogRenameRepository, CatalogRenameState
 from app.repositories.product_repository import ProductRepository
+from app.jobs.catalog_rename_job import catalog_rename_runner
+from app.config.config import get_config
+from bson import ObjectId
+from datetime import datetime, timedelta
 
 logger = logging.getLogger(__name__)
 
 class CatalogService:
     def __init__(self):
         self.repo = CatalogRepository()
+        self.rename_repo = CatalogRenameRepository()
         self.product_repo = ProductRepository()
 
     # ------------------------
     # LIST
     # ------------------------
     def list_categories(self):
-        # 1) Importar/sincronizar desde productos
-        product_categories = self.product_repo.get_categories() or []
-        existing = {c["name"] for c in self.repo.list_categories()}
-
-        for name in product_categories:
-            if name not in existing:
-                try:
-                    self.repo.create_category(name)
-                except Exception:
-                    pass
-
-        # 2) Listar catálogo y contar productos por el valor real guardado en productos (categoria=name)
-        categories = self.repo.list_categories()
-        for c in categories:
-            c["productCount"] = self.product_repo.count_by_category_value(c["name"])
-        return categories
+        # Solo lectura: las categorías usadas por productos se dan de alta en
+        # catalog_sync_job y productCount se mantiene en cada escritura
+        return self.repo.list_categories()
 
     def list_tags(self):
-        product_tags = self.product_repo.get_tags() or []
-        existing = {t["name"] for t in self.repo.list_tags()}
-
-        for name in product_tags:
-            if name not in existing:
-                try:
-                    self.repo.create_tag(name)
-                except Exception:
-                    pass
-
-        tags = self.repo.list_tags()
-        for t in tags:
-            t["productCount"] = self.product_repo.count_by_tag_value(t["name"])
-        return tags
+        return self.repo.list_tags()
 
     # ------------------------
     # CREATE / UPDATE
@@ -55,8 +35,9 @@ class CatalogService:
         return cat
 
     def update_category(self, category_id: str, name: str, admin_id: str):
-        cat = self.repo.update_category(category_id, name)
-        self._audit(admin_id, "update_category", cat["_id"], {"name": cat["name"]})
+        cat, old_name = self.repo.update_category(category_id, name)
+        self._audit(admin_id, "update_category", cat["_id"], {"name": cat["name"], "old_name": old_name})
+        cat["rename"] = self._queue_rename("category", "categoria", cat, old_name, admin_id)
         return cat
 
     def create_tag(self, name: str, admin_id: str):
@@ -65,10 +46,125 @@ class CatalogService:
         return t
 
     def update_tag(self, tag_id: str, name: str, admin_id: str):
-        t = self.repo.update_tag(tag_id, name)
-        self._audit(admin_id, "update_tag", t["_id"], {"name": t["name"]})
+        t, old_name = self.repo.update_tag(tag_id, name)
+        self._audit(admin_id, "update_tag", t["_id"], {"name": t["name"], "old_name": old_name})
+        t["rename"] = self._queue_rename("tag", "tags", t, old_name, admin_id)
         return t
 
+    # ------------------------
+    # RENAME (propagación en segundo plano)
+    # ------------------------
+    def _queue_rename(self, kind, field, item, old_name, admin_id):
+        """Registra y encola la propagación del renombre; None si el nombre no cambió"""
+        if old_name == item["name"]:
+            return None
+
+        rename = self.rename_repo.create({
+            "kind": kind,
+            "field": field,
+            "entity_id": item["_id"],
+            "old_name": old_name,
+            "new_name": item["name"],
+            "requested_by": ObjectId(admin_id) if admin_id else None,
+        })
+        catalog_rename_runner.submit(str(rename["_id"]))
+        logger.info(f"Renombre {rename['_id']} encolado: {kind} '{old_name}' -> '{item['name']}'")
+
+        return self.rename_to_status(rename)
+
+    def get_rename_status(self, rename_id):
+        """Estado y progreso del renombre, o None si no existe"""
+        rename = self.rename_repo.find_by_id(rename_id)
+        return self.rename_to_status(rename) if rename else None
+
+    def run_rename(self, rename_id):
+        """Propaga el renombre a los productos (se ejecuta en catalog_rename_runner)"""
+        config = get_config()
+        rename = self.rename_repo.claim(
+            rename_id,
+            stale_before=datetime.utcnow() - timedelta(seconds=config.CATALOG_RENAME_STALE_SECONDS),
+            max_attempts=config.CATALOG_RENAME_MAX_ATTEMPTS
+        )
+        if not rename:
+            return
+
+        # Al reanudar se continúa desde el último _id con el conteo acumulado
+        done_before = rename["progress"]["processed"]
+
+        try:
+            if rename.get("last_id") is None:
+                total = self.repo.count_products_with(rename["field"], rename["old_name"])
+                self.rename_repo.update_progress(rename_id, 0, total=total)
+
+            processed = self.repo.propagate_rename(
+                rename["field"],
+                rename["old_name"],
+                rename["new_name"],
+                after_id=rename.get("last_id"),
+                batch_size=config.CATALOG_RENAME_BATCH_SIZE,
+                max_per_second=config.CATALOG_RENAME_MAX_PER_SECOND,
+                on_batch=lambda done, last_id: self.rename_repo.update_progress(
+                    rename_id, done_before + done, last_id=last_id
+                )
+            )
+
+            # Corrige lo que se descontó al nombre anterior durante la propagación
+            self.repo.recount_usage(rename["field"], rename["entity_id"])
+            self.rename_repo.mark_done(rename_id, done_before + processed)
+            logger.info(f"Renombre {rename_id} propagado a {done_before + processed} productos")
+
+        except Exception as e:
+            logger.error(f"Renombre {rename_id} fallido: {str(e)}")
+            self.rename_repo.mark_failed(rename_id, error=str(e))
+
+        # Un renombre posterior de la misma entidad pudo quedar en espera en claim
+        next_rename = self.rename_repo.find_next_pending(rename["entity_id"])
+        if next_rename:
+            catalog_rename_runner.submit(str(next_rename["_id"]))
+
+    def resume_renames(self):
+        """Reencola renombres interrumpidos o fallidos (hasta CATALOG_RENAME_MAX_ATTEMPTS)"""
+        config = get_config()
+        renames = self.rename_repo.find_resumable(
+            stale_before=datetime.utcnow() - timedelta(seconds=config.CATALOG_RENAME_STALE_SECONDS),
+            max_attempts=config.CATALOG_RENAME_MAX_ATTEMPTS
+        )
+
+        for rename in renames:
+            catalog_rename_runner.submit(str(rename["_id"]))
+
+        if renames:
+            logger.info(f"Renombres del catálogo reencolados: {len(renames)}")
+
+        return {"resumed": len(renames)}
+
+    def rename_to_status(self, rename):
+        """Representación JSON del renombre"""
+        progress = rename.get("progress") or {}
+        processed = progress.get("processed", 0)
+        total = progress.get("total")
+
+        if rename["state"] == CatalogRenameState.DONE:
+            percent = 100
+        elif total:
+            percent = min(99, int(processed * 100 / total))
+        else:
+            percent = 0
+
+        return {
+            "id": str(rename["_id"]),
+            "kind": rename["kind"],
+            "entity_id": str(rename["entity_id"]),
+            "old_name": rename["old_name"],
+            "new_name": rename["new_name"],
+            "state": rename["state"],
+            "progress": {"processed": processed, "total": total, "percent": percent},
+            "attempts": rename.get("attempts", 0),
+            "error": rename.get("error"),
+            "created_at": rename["created_at"].isoformat() if rename.get("created_at") else None,
+            "finished_at": rename["finished_at"].isoformat() if rename.get("finished_at") else None,
+        }
+
     # ------------------------
     # DELETE (por ID)
     # ------------------------
@@ -77,6 +173,10 @@ class CatalogService:
         if not cat:
             raise ValueError("Categoría no encontrada")
 
+        # Mientras se propaga un renombre los productos aún usan el nombre anterior
+        if self.rename_repo.has_active(category_id):
+            raise ValueError("Categoría en uso")
+
         count = self.product_repo.count_by_category_value(slug=cat.get("slug"), name=cat.get("name"))
         if count > 0:
             raise ValueError("Categoría en uso")
@@ -90,6 +190,9 @@ class CatalogService:
         if not tag:
             raise ValueError("Etiqueta no encontrada")
 
+        if self.rename_repo.has_active(tag_id):
+            raise ValueError("Etiqueta en uso")
+
         count = self.product_repo.count_by_tag_value(slug=tag.get("slug"), name=tag.get("name"))
         if count > 0:
             raise ValueError("Etiqueta en uso")
@@ -0,0 +1,190 @@
+"""
+Servicio de exportaciones en segundo plano
+La petición solo registra el job y lo encola (jobs/export_job); el archivo
+se genera fuera del worker HTTP, el progreso se consulta por su id y el
+archivo terminado queda en EXPORT_FOLDER hasta EXPORT_TTL_SECONDS.
+"""
+from app.repositories.export_job_repository import ExportJobRepository, ExportJobState
+from app.services.reservation_service import ReservationService
+from app.jobs.export_job import export_runner
+from app.config.config import get_config
+from bson import ObjectId
+from datetime import datetime, timedelta
+import os
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class ExportService:
+    def __init__(self):
+        self.job_repo = ExportJobRepository()
+        self.reservation_service = ReservationService()
+
+    def request_reservation_export(self, admin_id, fmt="csv", state=None, date_from=None, date_to=None):
+        """
+        Registra y encola una exportación de reservas
+
+        Raises:
+            ValueError: si las fechas no son válidas (YYYY-MM-DD)
+        """
+        fmt = self.reservation_service.normalize_export_format(fmt)
+        # Validar filtros antes de encolar
+        self.reservation_service.build_export_filters(state, date_from, date_to)
+
+        mimetype, filename = self.reservation_service.export_file_info(fmt)
+        job = self.job_repo.create({
+            'kind': 'reservations',
+            'format': fmt,
+            'mimetype': mimetype,
+            'filename': filename,
+            'params': {'state': state, 'date_from': date_from, 'date_to': date_to},
+            'requested_by': ObjectId(admin_id) if admin_id else None,
+        })
+
+        export_runner.submit(str(job['_id']))
+        logger.info(f"Exportación {job['_id']} encolada ({fmt})")
+
+        return self.to_status(job)
+
+    def get_status(self, job_id):
+        """Estado y progreso del job, o None si no existe"""
+        job = self.job_repo.find_by_id(job_id)
+        return self.to_status(job) if job else None
+
+    def get_artifact(self, job_id):
+        """
+        Archivo de un job terminado
+
+        Returns:
+            tuple: (ruta, mimetype, filename)
+
+        Raises:
+            ValueError: si el job no existe, no terminó o el archivo expiró
+        """
+        job = self.job_repo.find_by_id(job_id)
+        if not job:
+            raise ValueError("Exportación no encontrada")
+
+        if job['state'] != ExportJobState.DONE:
+            raise ValueError("La exportación aún no está lista")
+
+        path = job.get('file_path')
+        if not path or not os.path.exists(path) or job['expires_at'] <= datetime.utcnow():
+            raise ValueError("El archivo de la exportación expiró")
+
+        return path, job['mimetype'], job['filename']
+
+    def run_job(self, job_id):
+        """Genera el archivo del job (se ejecuta en export_runner)"""
+        job = self.job_repo.claim(job_id)
+        if not job:
+            return
+
+        config = get_config()
+        fmt = job['format']
+        params = job.get('params') or {}
+        folder = os.path.abspath(config.EXPORT_FOLDER)
+        path = os.path.join(folder, f"{job_id}.{fmt}")
+        partial = f"{path}.part"
+
+        try:
+            filters = self.reservation_service.build_export_filters(
+                params.get('state'), params.get('date_from'), params.get('date_to')
+            )
+            total = self.reservation_service.count_export_rows(filters)
+            self.job_repo.update_progress(job_id, 0, total_rows=total)
+
+            os.makedirs(folder, exist_ok=True)
+            with open(partial, 'wb') as fileobj:
+                rows = self.reservation_service.write_export(
+                    fileobj,
+                    fmt,
+                    filters,
+                    on_progress=lambda done: self.job_repo.update_progress(job_id, done)
+                )
+            os.replace(partial, path)
+
+            done = self.job_repo.mark_done(
+                job_id,
+                file_path=path,
+                size_bytes=os.path.getsize(path),
+                rows=rows,
+                expires_at=datetime.utcnow() + timedelta(seconds=config.EXPORT_TTL_SECONDS)
+            )
+            if not done:
+                # fail_stale lo dio por interrumpido: el archivo no se servirá
+                self._remove_file(path)
+                logger.warning(f"Exportación {job_id} terminada tras marcarse como interrumpida")
+                return
+            logger.info(f"Exportación {job_id} terminada: {rows} filas")
+
+        except Exception as e:
+            logger.error(f"Exportación {job_id} fallida: {str(e)}")
+            self._remove_file(partial)
+            self.job_repo.mark_failed(
+                job_id,
+                error=str(e),
+                expires_at=datetime.utcnow() + timedelta(seconds=config.EXPORT_TTL_SECONDS)
+            )
+
+    def cleanup(self):
+        """
+        Elimina archivos y registros expirados y marca como fallidos los jobs
+        en ejecución interrumpidos (sin progreso en EXPORT_STALE_SECONDS)
+        """
+        config = get_config()
+        now = datetime.utcnow()
+
+        failed_stale = self.job_repo.fail_stale(
+            stale_before=now - timedelta(seconds=config.EXPORT_STALE_SECONDS),
+            expires_at=now + timedelta(seconds=config.EXPORT_TTL_SECONDS)
+        )
+
+        deleted = 0
+        for job in self.job_repo.find_expired(now):
+            self._remove_file(job.get('file_path'))
+            if self.job_repo.delete(job['_id']):
+                deleted += 1
+
+        if deleted or failed_stale:
+            logger.info(f"Exportaciones: {deleted} eliminadas, {failed_stale} interrumpidas")
+
+        return {'deleted': deleted, 'failed_stale': failed_stale}
+
+    def to_status(self, job):
+        """Representación JSON del job"""
+        progress = job.get('progress') or {}
+        rows = progress.get('rows', 0)
+        total = progress.get('total_rows')
+
+        if job['state'] == ExportJobState.DONE:
+            percent = 100
+        elif total:
+            percent = min(99, int(rows * 100 / total))
+        else:
+            percent = 0
+
+        return {
+            'id': str(job['_id']),
+            'state': job['state'],
+            'format': job['format'],
+            'params': job.get('params'),
+            'progress': {'rows': rows, 'total_rows': total, 'percent': percent},
+            'filename': job.get('filename'),
+            'size_bytes': job.get('size_bytes'),
+            'error': job.get('error'),
+            'created_at': job['created_at'].isoformat() if job.get('created_at') else None,
+            'finished_at': job['finished_at'].isoformat() if job.get('finished_at') else None,
+            'expires_at': job['expires_at'].isoformat() if job.get('expires_at') else None,
+        }
+
+    def _remove_file(self, path):
+        if not path:
+            return
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+        except OSError as e:
+            logger.warning(f"No se pudo eliminar {path}: {str(e)}")
@@ -42,11 +42,11 @@ class InventoryService:
             'exists': True
         }
 
-    def get_all_inventory(self, skip=0, limit=20):
+    def get_all_inventory(self, skip=0, limit=20, cursor=None):
         """
         Obtiene todo el inventario con información de variantes
         """
-        inventories = self.inventory_repo.get_all_with_details(skip=skip, limit=limit)
+        inventories = self.inventory_repo.get_all_with_details(skip=skip, limit=limit, cursor=cursor)
 
         result = []
         categories = set()
@@ -207,14 +207,7 @@ class InventoryService:
         """
         Retiene stock (usado internamente por el sistema de reservas)
         """
-        # Validar disponibilidad
-        if not self.inventory_repo.validate_availability(variant_id, quantity):
-            available = self.inventory_repo.get_available_stock(variant_id)
-            raise ValueError(
-                f"Stock insuficiente. Disponible: {available}, Solicitado: {quantity}"
-            )
-
-        # Retener stock
+        # Retener stock (atomico: solo aplica si hay disponibilidad suficiente)
         success = self.inventory_repo.increase_retained_stock(
             variant_id=variant_id,
             quantity=quantity,
@@ -223,7 +216,10 @@ class InventoryService:
         )
 
         if not success:
-            raise ValueError("No se pudo retener el stock")
+            available = self.inventory_repo.get_available_stock(variant_id)
+            raise ValueError(
+                f"Stock insuficiente. Disponible: {available}, Solicitado: {quantity}"
+            )
 
         return self.get_inventory_by_variant(variant_id)
 
@@ -258,7 +254,7 @@ class InventoryService:
 
         return self.get_inventory_by_variant(variant_id)
 
-    def get_inventory_movements(self, variant_id=None, movement_type=None, skip=0, limit=50):
+    def get_inventory_movements(self, variant_id=None, movement_type=None, skip=0, limit=50, cursor=None):
         """
         Obtiene el historial de movimientos de inventario
         """
@@ -266,7 +262,8 @@ class InventoryService:
             variant_id=variant_id,
             movement_type=movement_type,
             skip=skip,
-            limit=limit
+            limit=limit,
+            cursor=cursor
         )
 
         result = []
@@ -283,20 +280,31 @@ class InventoryService:
 
         return result
 
-    def get_low_stock_alerts(self, threshold=10):
+    def get_low_stock_alerts(self, threshold=10, limit=100):
         """
         Obtiene variantes con stock disponible bajo (menor al umbral)
         Ãštil para alertas administrativas
+        Ordenadas de menor a mayor disponibilidad (consulta indexada sobre 'disponible')
         """
-        all_inventory = self.get_all_inventory(skip=0, limit=1000)
+        low_stock = self.inventory_repo.find_low_stock(threshold=threshold, limit=limit)
 
-        low_stock = [
-            inv for inv in all_inventory
-            if inv['disponibilidad'] < threshold
+        return [
+            {
+                '_id': str(inv['_id']),
+                'variant_id': str(inv['variant_id']),
+                'stock_total': inv['stock_total'],
+                'stock_retenido': inv['stock_retenido'],
+                'disponibilidad': inv.get('disponible', 0),
+                'product_name': inv.get('product_name'),
+                'product_category': inv.get('product_category'),
+                'variant_size': inv.get('variant_size'),
+                'variant_price': inv.get('variant_price'),
+                'actualizado_en': inv.get('actualizado_en'),
+                'creado_en': inv.get('creado_en')
+            }
+            for inv in low_stock
         ]
 
-        return sorted(low_stock, key=lambda x: x['disponibilidad'])
-
     def _log_audit(self, actor_id, action, entity_id, details=None):
         """Registra una acciÃ³n en auditorÃ­a"""
         from app.config.database import get_db
@@ -315,7 +323,7 @@ class InventoryService:
 
         db.audit_logs.insert_one(audit_log)
     
-    def get_inventory_movements_detailed(self, skip=0, limit=50, filters=None):
-        return self.inventory_repo.get_movements_detailed(skip=skip, limit=limit, filters=filters)
+    def get_inventory_movements_detailed(self, skip=0, limit=50, filters=None, cursor=None):
+        return self.inventory_repo.get_movements_detailed(skip=skip, limit=limit, filters=filters, cursor=cursor)
  
 
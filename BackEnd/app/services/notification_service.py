@@ -1,7 +1,13 @@
 from app.repositories.notification_repository import NotificationRepository
 from app.models.in_app_notification import InAppNotification
+from app.repositories.pagination import page_cursor
 from app.services.email_service import EmailService
+from app.utils.notification_stream import notification_stream
+from app.config.config import get_config
 from datetime import datetime
+import json
+import queue
+import time
 import logging
 
 logger = logging.getLogger(__name__)
@@ -10,36 +16,25 @@ logger = logging.getLogger(__name__)
 class NotificationService:
     """Servicio para gestionar notificaciones"""
     
+    # Lecturas del contador al conectar mientras sigan llegando eventos
+    SNAPSHOT_ATTEMPTS = 3
+    
     def __init__(self):
         self.repository = NotificationRepository()
         self.email_service = EmailService()
     
-    def get_user_notifications(self, user_id, unread_only=False, limit=50, skip=0):
+    def get_user_notifications(self, user_id, unread_only=False, limit=50, skip=0, cursor=None):
         """Obtiene notificaciones de un usuario"""
-        result = self.repository.get_user_notifications(user_id, unread_only, limit, skip)
+        result = self.repository.get_user_notifications(user_id, unread_only, limit, skip, cursor=cursor)
         
         # Convertir notificaciones a formato JSON serializable
-        notifications_dict = []
-        for notification in result['notifications']:
-            notif_dict = {
-                'id': str(notification._id),
-                'title': notification.title,
-                'message': notification.message,
-                'type': notification.notification_type,
-                'priority': notification.priority,
-                'read': notification.read,
-                'read_at': notification.read_at.isoformat() if notification.read_at else None,
-                'created_at': notification.created_at.isoformat() if notification.created_at else None,
-                'action_url': notification.action_url,
-                'related_entity_id': str(notification.related_entity_id) if notification.related_entity_id else None,
-                'related_entity_type': notification.related_entity_type
-            }
-            notifications_dict.append(notif_dict)
+        notifications_dict = [notification.to_json() for notification in result['notifications']]
         
         return {
             'notifications': notifications_dict,
             'unread_count': result['unread_count'],
-            'total': result['total']
+            'total': result['total'],
+            'next_cursor': page_cursor(result['notifications'], limit, 'created_at')
         }
     
     def mark_as_read(self, notification_id, user_id):
@@ -60,6 +55,69 @@ class NotificationService:
         count = self.repository.get_unread_count(user_id)
         return {'unread_count': count}
     
+    def stream_events(self, user_id, jwt_claims):
+        """
+        Generador SSE de notificaciones nuevas y cambios del contador
+        Solo consulta MongoDB al conectar y ante un 'resync'; el resto de
+        eventos llega por utils/notification_stream. Termina al expirar o
+        revocarse el token (el cliente reconecta con uno nuevo).
+        """
+        from app.utils.token_cache import token_cache
+        
+        config = get_config()
+        events = notification_stream.subscribe(user_id)
+        try:
+            yield from self._unread_snapshot(user_id, events)
+            
+            while jwt_claims['exp'] > time.time():
+                try:
+                    event = events.get(timeout=config.NOTIFICATION_STREAM_HEARTBEAT)
+                except queue.Empty:
+                    if token_cache.is_token_revoked(jwt_claims):
+                        break
+                    # Comentario SSE: mantiene viva la conexión en proxies
+                    yield ": keepalive\n\n"
+                    continue
+                
+                if event['type'] == 'resync':
+                    yield from self._unread_snapshot(user_id, events)
+                else:
+                    yield self._sse(event['type'], event)
+        finally:
+            notification_stream.unsubscribe(user_id, events)
+    
+    def _unread_snapshot(self, user_id, events):
+        """
+        Emite el contador completo y las notificaciones que llegaron mientras
+        se contaba. Sus cambios pueden estar ya incluidos en el conteo: se
+        descartan los deltas encolados hasta leerlo (las notificaciones se
+        reenvían con unread_delta 0) y se vuelve a contar si hubo alguno.
+        """
+        received = []
+        for _ in range(self.SNAPSHOT_ATTEMPTS):
+            unread = self.get_unread_count(user_id)
+            drained = self._drain(events)
+            received.extend(event for event in drained if event['type'] == 'notification')
+            if not drained:
+                break
+        
+        yield self._sse('unread_count', unread)
+        for event in received:
+            yield self._sse('notification', dict(event, unread_delta=0))
+    
+    @staticmethod
+    def _drain(events):
+        drained = []
+        try:
+            while True:
+                drained.append(events.get_nowait())
+        except queue.Empty:
+            return drained
+    
+    @staticmethod
+    def _sse(event_type, data):
+        return f"event: {event_type}\ndata: {json.dumps(data)}\n\n"
+    
     # Metodos para crear notificaciones basadas en eventos
     
     def notify_new_reservation(self, reservation_id, customer_name, customer_email):
@@ -1,7 +1,9 @@
 from app.repositories.product_repository import ProductRepository, VariantRepository
 from app.repositories.inventory_repository import InventoryRepository
 from app.repositories.catalog_repository import CatalogRepository
+from app.repositories.pagination import page_cursor
 from app.constants.states import ProductState
+from app.utils.text_utils import normalize_text
 import logging
 
 logger = logging.getLogger(__name__)
@@ -14,9 +16,13 @@ class ProductService:
         self.inventory_repo = InventoryRepository()
         self.catalog_repo = CatalogRepository()
 
-    def search_and_filter_catalog(self, search_text=None, categoria=None, tags=None, disponibilidad=True, skip=0, limit=20):
+    def search_and_filter_catalog(self, search_text=None, categoria=None, tags=None, disponibilidad=True, skip=0, limit=20,
+                                  prefix=None, cursor=None):
         """
         Busca y filtra productos en el catalogo (CU-005)
+        search_text usa el indice de texto (orden por relevancia); prefix
+        busca por inicio del nombre (autocompletado)
+        cursor continua desde la pagina anterior (ver catalog_next_cursor)
         Calcula disponibilidad en tiempo real considerando reservas activas
         """
         # Obtener productos segun filtros
@@ -26,24 +32,13 @@ class ProductService:
             tags=tags,
             disponibilidad=disponibilidad,
             skip=skip,
-            limit=limit
+            limit=limit,
+            prefix=prefix,
+            cursor=cursor
         )
 
-        # Enriquecer con variantes y disponibilidad
-        enriched_products = []
-        for product in products:
-            # Obtener variantes del producto
-            variants = self.variant_repo.find_by_product_id(product['_id'])
-
-            # Calcular disponibilidad para cada variante
-            for variant in variants:
-                available = self.inventory_repo.get_available_stock(variant['_id'])
-                variant['disponibilidad'] = available
-
-            product['variantes'] = variants
-            enriched_products.append(product)
-
-        return enriched_products
+        # Enriquecer con variantes y disponibilidad (una sola consulta para toda la pagina)
+        return self._attach_variants(products)
 
     def get_product_detail(self, product_id):
         """
@@ -54,17 +49,33 @@ class ProductService:
         if not product:
             raise ValueError("Producto no encontrado")
 
-        # Obtener variantes
-        variants = self.variant_repo.find_by_product_id(product_id)
+        return self._attach_variants([product])[0]
+
+    @staticmethod
+    def catalog_next_cursor(products, limit, search_text=None, prefix=None):
+        """
+        Token de la pagina siguiente de search_and_filter_catalog
+        None con search_text: el orden por relevancia no admite cursor
+        """
+        if search_text:
+            return None
+        sort_field = 'nombre_normalizado' if normalize_text(prefix) else 'nombre'
+        return page_cursor(products, limit, sort_field)
 
-        # Calcular disponibilidad para cada variante
-        for variant in variants:
-            available = self.inventory_repo.get_available_stock(variant['_id'])
-            variant['disponibilidad'] = available
+    def _attach_variants(self, products):
+        """
+        Agrega a cada producto sus variantes con disponibilidad calculada
+        Usa un cargador por lotes ($in + $lookup a inventory) en lugar de
+        consultar variantes e inventario producto por producto
+        """
+        variants_by_product = self.variant_repo.find_with_availability_by_product_ids(
+            [product['_id'] for product in products]
+        )
 
-        product['variantes'] = variants
+        for product in products:
+            product['variantes'] = variants_by_product.get(str(product['_id']), [])
 
-        return product
+        return products
 
     def create_product(self, product_data, admin_id):
         # Validaciones
@@ -4,16 +4,25 @@ from app.repositories.notification_repository import NotificationRepository
 from app.services.notification_service import NotificationService
 from app.constants.states import ReservationState
 from app.models.reservation import Reservation
-from app.config.database import get_db
+from app.config.database import get_db, run_in_transaction
+from app.jobs.reservation_expiry_scheduler import expiry_scheduler
 from bson import ObjectId
+from app.config.config import get_config
 from datetime import datetime, timedelta
-from io import BytesIO
+from io import StringIO
+from tempfile import SpooledTemporaryFile
 import csv
 from openpyxl import Workbook
 import logging
 
 logger = logging.getLogger(__name__)
 
+CSV_EXPORT_HEADER = [
+    "reservation_id", "state", "created_at",
+    "user_name", "user_email",
+    "product_name", "variant_name", "quantity"
+]
+
 
 class ReservationService:
     """Servicio para logica de negocio de reservas"""
@@ -24,17 +33,11 @@ class ReservationService:
         self.notification_service = NotificationService()
 
     def create_reservation(self, user_id, items, notes=None):
-        """Crea una nueva reserva y retiene inventario"""
-
-        # Validar disponibilidad para todos los items
-        for item in items:
-            variant_id = item['variant_id']
-            quantity = item['quantity']
-
-            if not self.inventory_repo.validate_availability(variant_id, quantity):
-                raise ValueError(f"Stock insuficiente para variante {variant_id}")
-
-        # Crear reserva
+        """
+        Crea una nueva reserva y retiene inventario
+        La retencion es atomica por item (find_one_and_update condicionado a la
+        disponibilidad) y todo-o-nada para la reserva completa
+        """
         reservation = Reservation(
             user_id=user_id,
             items=items,
@@ -42,155 +45,195 @@ class ReservationService:
             notes=notes
         )
 
-        reservation = self.reservation_repo.create(reservation)
-
-        # Retener inventario
-        for item in items:
-            self.inventory_repo.increase_retained_stock(
-                variant_id=item['variant_id'],
-                quantity=item['quantity'],
-                reason=f'reservation_{str(reservation._id)}_created'
-            )
+        # Retener inventario (sin ventana entre validar y retener)
+        retained, failed_variant_id = self.inventory_repo.retain_stock_items(
+            items,
+            reason=f'reservation_{str(reservation._id)}_created'
+        )
+        if not retained:
+            raise ValueError(f"Stock insuficiente para variante {failed_variant_id}")
+
+        # Crear reserva; si falla, liberar lo retenido
+        try:
+            reservation = self.reservation_repo.create(reservation)
+        except Exception:
+            for item in items:
+                self.inventory_repo.decrease_retained_stock(
+                    variant_id=item['variant_id'],
+                    quantity=item['quantity'],
+                    reason=f'reservation_{str(reservation._id)}_failed'
+                )
+            raise
 
         return reservation
 
     def approve_reservation(self, reservation_id, admin_id, admin_notes=None):
         """Aprueba una reserva (CU-010)"""
-        reservation = self.reservation_repo.find_by_id(reservation_id)
+        def transition(session):
+            reservation = self.reservation_repo.find_by_id(reservation_id, session=session)
 
-        if not reservation:
-            raise ValueError("Reserva no encontrada")
+            if not reservation:
+                raise ValueError("Reserva no encontrada")
 
-        if reservation.state != ReservationState.PENDING:
-            raise ValueError(f"No se puede aprobar una reserva en estado {reservation.state}")
+            if reservation.state != ReservationState.PENDING:
+                raise ValueError(f"No se puede aprobar una reserva en estado {reservation.state}")
 
-        if not ReservationState.can_transition(reservation.state, ReservationState.APPROVED):
-            raise ValueError("Transicion de estado invalida")
+            if not ReservationState.can_transition(reservation.state, ReservationState.APPROVED):
+                raise ValueError("Transicion de estado invalida")
 
-        # Actualizar estado
-        update_data = {
-            'state': ReservationState.APPROVED,
-            'approved_at': datetime.utcnow(),
-            'admin_notes': admin_notes
-        }
+            # Actualizar estado
+            update_data = {
+                'state': ReservationState.APPROVED,
+                'approved_at': datetime.utcnow(),
+                'admin_notes': admin_notes
+            }
+            self._apply_transition(reservation, update_data, session)
 
-        self.reservation_repo.update(reservation_id, update_data)
+            # Registrar auditoria
+            self._log_audit(admin_id, 'approve_reservation', reservation_id, session=session)
 
-        # Registrar auditoria
-        self._log_audit(admin_id, 'approve_reservation', reservation_id)
+        run_in_transaction(transition)
 
         return self.reservation_repo.find_by_id(reservation_id)
 
     def reject_reservation(self, reservation_id, admin_id, admin_notes=None):
         """Rechaza una reserva y libera inventario (CU-010)"""
-        reservation = self.reservation_repo.find_by_id(reservation_id)
+        def transition(session):
+            reservation = self.reservation_repo.find_by_id(reservation_id, session=session)
 
-        if not reservation:
-            raise ValueError("Reserva no encontrada")
+            if not reservation:
+                raise ValueError("Reserva no encontrada")
 
-        if reservation.state != ReservationState.PENDING:
-            raise ValueError(f"No se puede rechazar una reserva en estado {reservation.state}")
+            if reservation.state != ReservationState.PENDING:
+                raise ValueError(f"No se puede rechazar una reserva en estado {reservation.state}")
 
-        if not ReservationState.can_transition(reservation.state, ReservationState.REJECTED):
-            raise ValueError("Transicion de estado invalida")
+            if not ReservationState.can_transition(reservation.state, ReservationState.REJECTED):
+                raise ValueError("Transicion de estado invalida")
 
-        # Liberar inventario
-        for item in reservation.items:
-            self.inventory_repo.decrease_retained_stock(
-                variant_id=item['variant_id'],
-                quantity=item['quantity'],
-                reason=f'reservation_{str(reservation_id)}_rejected'
-            )
+            # Actualizar estado
+            update_data = {
+                'state': ReservationState.REJECTED,
+                'rejected_at': datetime.utcnow(),
+                'admin_notes': admin_notes
+            }
+            self._apply_transition(reservation, update_data, session)
 
-        # Actualizar estado
-        update_data = {
-            'state': ReservationState.REJECTED,
-            'rejected_at': datetime.utcnow(),
-            'admin_notes': admin_notes
-        }
+            # Liberar inventario
+            self._release_items(reservation, 'rejected', session)
 
-        self.reservation_repo.update(reservation_id, update_data)
+            # Registrar auditoria
+            self._log_audit(admin_id, 'reject_reservation', reservation_id, session=session)
 
-        # Registrar auditoria
-        self._log_audit(admin_id, 'reject_reservation', reservation_id)
+        run_in_transaction(transition)
+        expiry_scheduler.discard(reservation_id)
 
         return self.reservation_repo.find_by_id(reservation_id)
 
     def cancel_reservation(self, reservation_id, user_id=None, admin_id=None, is_forced=False):
         """Cancela una reserva y libera inventario (CU-009 y CU-010)"""
-        reservation = self.reservation_repo.find_by_id(reservation_id)
+        def transition(session):
+            reservation = self.reservation_repo.find_by_id(reservation_id, session=session)
 
-        if not reservation:
-            raise ValueError("Reserva no encontrada")
+            if not reservation:
+                raise ValueError("Reserva no encontrada")
 
-        # Validar permisos
-        if user_id and str(reservation.user_id) != str(user_id):
-            raise ValueError("No tienes permiso para cancelar esta reserva")
+            # Validar permisos
+            if user_id and str(reservation.user_id) != str(user_id):
+                raise ValueError("No tienes permiso para cancelar esta reserva")
 
-        # Validar estado
-        if reservation.state not in [ReservationState.PENDING, ReservationState.APPROVED]:
-            raise ValueError(f"No se puede cancelar una reserva en estado {reservation.state}")
+            # Validar estado
+            if reservation.state not in [ReservationState.PENDING, ReservationState.APPROVED]:
+                raise ValueError(f"No se puede cancelar una reserva en estado {reservation.state}")
 
-        if not ReservationState.can_transition(reservation.state, ReservationState.CANCELLED):
-            raise ValueError("Transicion de estado invalida")
+            if not ReservationState.can_transition(reservation.state, ReservationState.CANCELLED):
+                raise ValueError("Transicion de estado invalida")
 
-        # Liberar inventario
-        for item in reservation.items:
-            self.inventory_repo.decrease_retained_stock(
-                variant_id=item['variant_id'],
-                quantity=item['quantity'],
-                reason=f'reservation_{str(reservation_id)}_cancelled'
-            )
+            # Actualizar estado
+            update_data = {
+                'state': ReservationState.CANCELLED,
+                'cancelled_at': datetime.utcnow()
+            }
+            self._apply_transition(reservation, update_data, session)
 
-        # Actualizar estado
-        update_data = {
-            'state': ReservationState.CANCELLED,
-            'cancelled_at': datetime.utcnow()
-        }
+            # Liberar inventario
+            self._release_items(reservation, 'cancelled', session)
 
-        self.reservation_repo.update(reservation_id, update_data)
+            # Registrar auditoria
+            actor_id = admin_id if admin_id else user_id
+            action = 'force_cancel_reservation' if is_forced else 'cancel_reservation'
+            self._log_audit(actor_id, action, reservation_id, session=session)
 
-        # Registrar auditoria
-        actor_id = admin_id if admin_id else user_id
-        action = 'force_cancel_reservation' if is_forced else 'cancel_reservation'
-        self._log_audit(actor_id, action, reservation_id)
+        run_in_transaction(transition)
+        expiry_scheduler.discard(reservation_id)
 
         return self.reservation_repo.find_by_id(reservation_id)
 
-    def expire_reservations(self):
-        """Expira reservas vencidas automaticamente (CU-011)"""
-        expired_reservations = self.reservation_repo.find_expired()
-
+    def expire_reservations(self, batch_size=500, reservation_ids=None):
+        """
+        Expira reservas vencidas automaticamente (CU-011)
+        Procesa por lotes: cada lote se reclama con update_many + claim token,
+        los deltas de stock retenido se agregan por variante y se aplican con
+        un solo bulk_write, y los movimientos se insertan con insert_many.
+        Cada lote corre dentro de una transaccion.
+
+        Sin transacciones (standalone) el reclamo y la liberacion son
+        escrituras separadas: el barrido completo primero vuelve a liberar
+        los lotes reclamados hace mas de RESERVATION_EXPIRY_CLAIM_STALE_SECONDS
+        que no llegaron a marcar stock_released.
+        """
         results = {
             'processed': 0,
-            'errors': 0
+            'errors': 0,
+            'expired_ids': []
         }
 
-        for reservation in expired_reservations:
-            try:
-                # Liberar inventario
-                for item in reservation.items:
-                    self.inventory_repo.decrease_retained_stock(
-                        variant_id=item['variant_id'],
-                        quantity=item['quantity'],
-                        reason=f'reservation_{str(reservation._id)}_expired'
-                    )
-
-                # Actualizar estado
-                update_data = {
-                    'state': ReservationState.EXPIRED,
-                    'expired_at': datetime.utcnow()
-                }
-
-                self.reservation_repo.update(reservation._id, update_data)
-
-                results['processed'] += 1
-
-                logger.info(f"Reserva {reservation._id} expirada exitosamente")
+        def expire_batch(session, claim):
+            claim_token = str(ObjectId())
+            claimed = claim(claim_token, session)
 
-            except Exception as e:
-                logger.error(f"Error expirando reserva {reservation._id}: {str(e)}")
-                results['errors'] += 1
+            releases = [
+                {
+                    'variant_id': item['variant_id'],
+                    'quantity': item['quantity'],
+                    'reason': f'reservation_{str(reservation["_id"])}_expired'
+                }
+                for reservation in claimed
+                for item in reservation.get('items') or []
+            ]
+            self.inventory_repo.release_retained_bulk(releases, session=session)
+            self.reservation_repo.mark_stock_released(claim_token, session=session)
+
+            return [str(reservation['_id']) for reservation in claimed]
+
+        claims = []
+        if reservation_ids is None:
+            stale_before = datetime.utcnow() - timedelta(
+                seconds=get_config().RESERVATION_EXPIRY_CLAIM_STALE_SECONDS
+            )
+            claims.append(lambda token, session: self.reservation_repo.reclaim_unreleased_batch(
+                token, stale_before, limit=batch_size, session=session
+            ))
+        claims.append(lambda token, session: self.reservation_repo.claim_expired_batch(
+            token, limit=batch_size, reservation_ids=reservation_ids, session=session
+        ))
+
+        for claim in claims:
+            while True:
+                try:
+                    expired_ids = run_in_transaction(lambda session: expire_batch(session, claim))
+                except Exception as e:
+                    logger.error(f"Error expirando lote de reservas: {str(e)}")
+                    results['errors'] += 1
+                    break
+
+                processed = len(expired_ids)
+                results['processed'] += processed
+                results['expired_ids'].extend(expired_ids)
+                if processed:
+                    logger.info(f"Lote de {processed} reservas expirado exitosamente")
+
+                if processed < batch_size:
+                    break
 
         return results
 
@@ -224,21 +267,44 @@ class ReservationService:
 
         return results
 
-    def get_reservations_by_user(self, user_id, state=None, skip=0, limit=20):
+    def get_reservations_by_user(self, user_id, state=None, skip=0, limit=20, cursor=None):
         """Obtiene reservas de un usuario"""
-        return self.reservation_repo.find_by_user_id(user_id, state, skip, limit)
+        return self.reservation_repo.find_by_user_id(user_id, state, skip, limit, cursor=cursor)
 
-    def get_all_reservations(self, filters=None, skip=0, limit=20):
+    def get_all_reservations(self, filters=None, skip=0, limit=20, cursor=None):
         """Obtiene todas las reservas (ADMIN)"""
-        return self.reservation_repo.find_all(filters, skip, limit)
+        return self.reservation_repo.find_all(filters, skip, limit, cursor=cursor)
 
     def get_reservation_by_id(self, reservation_id):
         """Obtiene una reserva por ID"""
         return self.reservation_repo.find_by_id(reservation_id)
 
-    def _log_audit(self, actor_id, action, entity_id):
+    def _apply_transition(self, reservation, update_data, session):
+        """
+        Cambia el estado solo si la reserva sigue en el estado leido
+        Si otra operacion la modifico entretanto, aborta (y revierte la transaccion)
+        """
+        changed = self.reservation_repo.transition_state(
+            reservation._id,
+            [reservation.state],
+            update_data,
+            session=session
+        )
+        if not changed:
+            raise ValueError("La reserva fue modificada por otra operacion, intente de nuevo")
+
+    def _release_items(self, reservation, event, session):
+        """Libera el inventario retenido por una reserva"""
+        for item in reservation.items:
+            self.inventory_repo.decrease_retained_stock(
+                variant_id=item['variant_id'],
+                quantity=item['quantity'],
+                reason=f'reservation_{str(reservation._id)}_{event}',
+                session=session
+            )
+
+    def _log_audit(self, actor_id, action, entity_id, session=None):
         """Registra una accion en auditoria"""
-        from app.config.database import get_db
         db = get_db()
 
         audit_log = {
@@ -249,29 +315,97 @@ class ReservationService:
             'timestamp': datetime.utcnow()
         }
 
-        db.audit_logs.insert_one(audit_log)
-    
+        db.audit_logs.insert_one(audit_log, session=session)
+
     def export_reservations(self, fmt="csv", state=None, date_from=None, date_to=None):
+        """
+        Exporta reservas sin materializar el resultado completo
+
+        Returns:
+            tuple: (contenido, mimetype, filename). Para CSV el contenido es un
+            generador de bytes (respuesta en streaming); para XLSX es un archivo
+            temporal posicionado al inicio (el llamador lo cierra)
+        """
+        filters = self.build_export_filters(state, date_from, date_to)
+        fmt = self.normalize_export_format(fmt)
+        mimetype, filename = self.export_file_info(fmt)
 
-        filters = {
+        if fmt == "csv":
+            rows = self.reservation_repo.iter_export_rows(
+                filters=filters,
+                batch_size=get_config().EXPORT_BATCH_SIZE
+            )
+            return self._iter_csv(rows), mimetype, filename
+
+        spool = SpooledTemporaryFile(max_size=get_config().EXPORT_SPOOL_MAX_BYTES)
+        try:
+            self.write_export(spool, fmt, filters)
+        except Exception:
+            spool.close()
+            raise
+        spool.seek(0)
+
+        return spool, mimetype, filename
+
+    def build_export_filters(self, state=None, date_from=None, date_to=None):
+        """Filtros de exportación; fechas YYYY-MM-DD (ValueError si son inválidas)"""
+        return {
             "state": state,
             "date_from": self._parse_date_start(date_from),
             "date_to": self._parse_date_end(date_to),
         }
 
-        rows = self.reservation_repo.get_export_rows(filters=filters)
-
-        if fmt not in ("csv", "xlsx"):
-            fmt = "csv"
-
-        if fmt == "csv":
-            content = self._build_csv(rows)
-            filename = f"reservas-{datetime.utcnow().date().isoformat()}.csv"
-            return content, "text/csv; charset=utf-8", filename
+    @staticmethod
+    def normalize_export_format(fmt):
+        fmt = (fmt or "csv").lower()
+        return fmt if fmt in ("csv", "xlsx") else "csv"
+
+    @staticmethod
+    def export_file_info(fmt):
+        """Retorna (mimetype, filename) del archivo exportado"""
+        today = datetime.utcnow().date().isoformat()
+        if fmt == "xlsx":
+            return "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet", f"reservas-{today}.xlsx"
+        return "text/csv; charset=utf-8", f"reservas-{today}.csv"
+
+    def count_export_rows(self, filters):
+        """Total de filas (items) de la exportación, para reportar progreso"""
+        return self.reservation_repo.count_export_rows(filters=filters)
+
+    def write_export(self, fileobj, fmt, filters, on_progress=None, progress_every=1000):
+        """
+        Escribe la exportación completa en fileobj leyendo el cursor por lotes
+        on_progress(filas) se llama cada progress_every filas y al terminar
+
+        Returns:
+            int: filas escritas
+        """
+        cursor = self.reservation_repo.iter_export_rows(
+            filters=filters,
+            batch_size=get_config().EXPORT_BATCH_SIZE
+        )
+        written = 0
 
-        content = self._build_xlsx(rows)
-        filename = f"reservas-{datetime.utcnow().date().isoformat()}.xlsx"
-        return content, "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet", filename
+        def counted(rows):
+            nonlocal written
+            try:
+                for row in rows:
+                    yield row
+                    written += 1
+                    if on_progress and written % progress_every == 0:
+                        on_progress(written)
+            finally:
+                cursor.close()
+
+        if fmt == "xlsx":
+            self._write_xlsx(counted(cursor), fileobj)
+        else:
+            for chunk in self._iter_csv(counted(cursor)):
+                fileobj.write(chunk)
+
+        if on_progress:
+            on_progress(written)
+        return written
 
     def _parse_date_start(self, s):
         if not s:
@@ -287,76 +421,94 @@ class ReservationService:
         d = datetime.fromisoformat(s)
         return datetime(d.year, d.month, d.day) + timedelta(days=1) - timedelta(seconds=1)
 
-    def _build_csv(self, rows):
-        out = BytesIO()
-        # csv necesita texto: usamos write en str y luego encode
-        from io import StringIO
+    def _iter_csv(self, rows, rows_per_chunk=500):
+        """Genera el CSV en bloques de bytes a medida que llegan las filas"""
         sio = StringIO()
         w = csv.writer(sio)
 
-        w.writerow([
-            "reservation_id", "state", "created_at",
-            "user_name", "user_email",
-            "product_name", "variant_name", "quantity"
-        ])
-
-        for r in rows:
-            w.writerow([
-                r.get("reservation_id", ""),
-                r.get("state", ""),
-                r.get("created_at", ""),
-                r.get("user_name", ""),
-                r.get("user_email", ""),
-                r.get("product_name", ""),
-                r.get("variant_name", ""),
-                r.get("quantity", ""),
-            ])
-
-        out.write(sio.getvalue().encode("utf-8"))
-        return out.getvalue()
-
-    def _build_xlsx(self, rows):
-        wb = Workbook()
+        w.writerow(CSV_EXPORT_HEADER)
+
+        try:
+            for i, r in enumerate(rows, start=1):
+                w.writerow([
+                    r.get("reservation_id", ""),
+                    r.get("state", ""),
+                    r.get("created_at", ""),
+                    r.get("user_name", ""),
+                    r.get("user_email", ""),
+                    r.get("product_name", ""),
+                    r.get("variant_name", ""),
+                    r.get("quantity", ""),
+                ])
+
+                if i % rows_per_chunk == 0:
+                    yield sio.getvalue().encode("utf-8")
+                    sio.seek(0)
+                    sio.truncate(0)
+
+            yield sio.getvalue().encode("utf-8")
+        finally:
+            if hasattr(rows, "close"):
+                rows.close()
+
+    def _write_xlsx(self, rows, fileobj):
+        """
+        Escribe el XLSX en fileobj con un workbook write_only (las filas se
+        vuelcan a disco al agregarlas). Como los items de cada reserva llegan
+        contiguos, el resumen por reserva se emite al cambiar de reserva sin
+        acumular el resultado
+        """
+        wb = Workbook(write_only=True)
 
         # Sheet 1: Reservas (resumen)
-        ws1 = wb.active
-        ws1.title = "Reservas"
+        ws1 = wb.create_sheet("Reservas")
         ws1.append(["reservation_id", "state", "created_at", "user_name", "user_email", "items_count", "total_qty"])
 
-        summary = {}
-        for r in rows:
-            rid = r.get("reservation_id")
-            if not rid:
-                continue
-            if rid not in summary:
-                summary[rid] = {
-                    "state": r.get("state", ""),
-                    "created_at": r.get("created_at", ""),
-                    "user_name": r.get("user_name", ""),
-                    "user_email": r.get("user_email", ""),
-                    "items_count": 0,
-                    "total_qty": 0,
-                }
-            summary[rid]["items_count"] += 1
-            try:
-                summary[rid]["total_qty"] += int(r.get("quantity") or 0)
-            except Exception:
-                pass
-
-        for rid, s in summary.items():
-            ws1.append([rid, s["state"], s["created_at"], s["user_name"], s["user_email"], s["items_count"], s["total_qty"]])
-
         # Sheet 2: Items (detalle)
         ws2 = wb.create_sheet("Items")
         ws2.append(["reservation_id", "product_name", "variant_name", "quantity"])
-        for r in rows:
-            ws2.append([
-                r.get("reservation_id", ""),
-                r.get("product_name", ""),
-                r.get("variant_name", ""),
-                r.get("quantity", ""),
-            ])
-
-        bio = BytesIO()
-        wb.save(bio)
-        return bio.getvalue()
+
+        current_id = None
+        current = None
+
+        def flush():
+            if current is not None:
+                ws1.append([
+                    current_id, current["state"], current["created_at"], current["user_name"],
+                    current["user_email"], current["items_count"], current["total_qty"]
+                ])
+
+        try:
+            for r in rows:
+                ws2.append([
+                    r.get("reservation_id", ""),
+                    r.get("product_name", ""),
+                    r.get("variant_name", ""),
+                    r.get("quantity", ""),
+                ])
+
+                rid = r.get("reservation_id")
+                if not rid:
+                    continue
+                if rid != current_id:
+                    flush()
+                    current_id = rid
+                    current = {
+                        "state": r.get("state", ""),
+                        "created_at": r.get("created_at", ""),
+                        "user_name": r.get("user_name", ""),
+                        "user_email": r.get("user_email", ""),
+                        "items_count": 0,
+                        "total_qty": 0,
+                    }
+                current["items_count"] += 1
+                try:
+                    current["total_qty"] += int(r.get("quantity") or 0)
+                except Exception:
+                    pass
+            flush()
+        finally:
+            if hasattr(rows, "close"):
+                rows.close()
+
+        wb.save(fileobj)
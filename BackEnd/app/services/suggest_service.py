@@ -0,0 +1,153 @@
+"""
+Servicio de autocompletado del catálogo
+Mantiene por worker un índice de prefijos (arreglo ordenado + bisect) con los
+nombres de productos activos, categorías y tags normalizados. Las sugerencias
+se resuelven en memoria, sin consultar MongoDB.
+
+El índice se reconstruye en segundo plano cuando las escrituras de productos
+publican la invalidación del namespace 'products' (ver utils/local_cache) o
+cuando supera SUGGEST_INDEX_MAX_AGE segundos.
+"""
+from bisect import bisect_left
+import threading
+import time
+import logging
+
+from app.config.config import get_config
+from app.repositories.product_repository import ProductRepository, PRODUCTS_CACHE_NAMESPACE
+from app.utils.local_cache import on_invalidation
+from app.utils.text_utils import normalize_text
+
+logger = logging.getLogger(__name__)
+
+
+class SuggestIndex:
+    """
+    Arreglo ordenado de (clave normalizada, posición de la entrada)
+    Cada término se indexa por su texto completo y por el inicio de cada
+    palabra, para que "gris" sugiera "Porcelanato Mármol Gris".
+    """
+
+    def __init__(self, entries=None):
+        self.entries = []  # [(tipo, texto)]
+        self.keys = []
+        self.positions = []
+
+        pairs = []
+        for kind, text in entries or []:
+            normalized = normalize_text(text)
+            if not normalized:
+                continue
+
+            position = len(self.entries)
+            self.entries.append((kind, text))
+
+            words = normalized.split(' ')
+            for i in range(len(words)):
+                pairs.append((' '.join(words[i:]), position))
+
+        pairs.sort()
+        self.keys = [key for key, _ in pairs]
+        self.positions = [position for _, position in pairs]
+
+    def search(self, prefix, limit=10):
+        normalized = normalize_text(prefix)
+        if not normalized:
+            return []
+
+        results = []
+        seen = set()
+        i = bisect_left(self.keys, normalized)
+
+        while i < len(self.keys) and self.keys[i].startswith(normalized) and len(results) < limit:
+            position = self.positions[i]
+            if position not in seen:
+                seen.add(position)
+                kind, text = self.entries[position]
+                results.append({'text': text, 'type': kind})
+            i += 1
+
+        return results
+
+
+class SuggestService:
+    """Autocompletado del catálogo con un índice compartido por proceso"""
+
+    _index = None
+    _built_at = 0.0
+    _stale = True
+    _building = False
+    _lock = threading.Lock()
+    _subscribed = False
+
+    def __init__(self):
+        self.product_repo = ProductRepository()
+        self._subscribe()
+
+    @classmethod
+    def _subscribe(cls):
+        with cls._lock:
+            if cls._subscribed:
+                return
+            cls._subscribed = True
+        on_invalidation(PRODUCTS_CACHE_NAMESPACE, cls.mark_stale)
+
+    @classmethod
+    def mark_stale(cls):
+        """Marca el índice para reconstrucción (escritura de productos o catálogo)"""
+        cls._stale = True
+
+    def suggest(self, prefix, limit=10):
+        """
+        Sugerencias para el prefijo dado
+
+        Returns:
+            list: [{'text': str, 'type': 'producto'|'categoria'|'tag'}]
+        """
+        if SuggestService._index is None:
+            # Primera consulta del worker: construir de forma síncrona
+            self.rebuild()
+        elif self._needs_refresh():
+            self._rebuild_in_background()
+
+        return SuggestService._index.search(prefix, limit=limit)
+
+    def rebuild(self):
+        """Reconstruye el índice desde productos activos, categorías y tags"""
+        SuggestService._stale = False
+        started = time.monotonic()
+
+        entries = [('producto', name) for name in self.product_repo.get_active_names()]
+        entries += [('categoria', name) for name in self.product_repo.get_categories()]
+        entries += [('tag', name) for name in self.product_repo.get_tags()]
+
+        index = SuggestIndex(entries)
+        SuggestService._index = index
+        SuggestService._built_at = time.monotonic()
+
+        logger.info(
+            f"Índice de autocompletado reconstruido: {len(index.entries)} términos "
+            f"en {(SuggestService._built_at - started) * 1000:.1f} ms"
+        )
+        return index
+
+    def _needs_refresh(self):
+        max_age = get_config().SUGGEST_INDEX_MAX_AGE
+        return SuggestService._stale or (time.monotonic() - SuggestService._built_at) > max_age
+
+    def _rebuild_in_background(self):
+        with SuggestService._lock:
+            if SuggestService._building:
+                return
+            SuggestService._building = True
+
+        def run():
+            try:
+                self.rebuild()
+            except Exception as e:
+                SuggestService._stale = True
+                logger.error(f"Error reconstruyendo índice de autocompletado: {str(e)}")
+            finally:
+                SuggestService._building = False
+
+        threading.Thread(target=run, name='suggest-index-rebuild', daemon=True).start()
@@ -2,6 +2,7 @@ from datetime import datetime
 from bson import ObjectId
 from app.repositories.reservation_repository import ReservationRepository
 from app.config.database import get_db
+from app.utils.password_hasher import password_hasher
 import logging
 import re
 
@@ -88,15 +89,13 @@ class UserService:
     
     def change_password(self, user_id, current_password, new_password):
         """Cambia la contraseña de un usuario"""
-        from werkzeug.security import check_password_hash, generate_password_hash
-        
         # Validar que el usuario existe
         user = self.users_collection.find_one({'_id': ObjectId(user_id)})
         if not user:
             raise ValueError("Usuario no encontrado")
         
         # Verificar contraseña actual
-        if not check_password_hash(user['password'], current_password):
+        if not password_hasher.verify(current_password, user['password']):
             raise ValueError("Contraseña actual incorrecta")
         
         # Validar nueva contraseña
@@ -104,11 +103,11 @@ class UserService:
             raise ValueError("La nueva contraseña debe tener al menos 10 caracteres y 1 caracter especial")
         
         # Verificar que la nueva contraseña sea diferente
-        if check_password_hash(user['password'], new_password):
+        if password_hasher.verify(new_password, user['password']):
             raise ValueError("La nueva contraseña debe ser diferente a la actual")
         
         # Actualizar contraseña
-        hashed_password = generate_password_hash(new_password)
+        hashed_password = password_hasher.hash(new_password)
         result = self.users_collection.update_one(
             {'_id': ObjectId(user_id)},
             {
@@ -130,7 +129,6 @@ class UserService:
     
     def create_user(self, user_data):
         """Crea un nuevo usuario (ADMIN)"""
-        from werkzeug.security import generate_password_hash
         
         # Validar email
         if not self._validate_email(user_data.get('email')):
@@ -147,7 +145,7 @@ class UserService:
         # Crear usuario
         user = {
             'email': user_data['email'],
-            'password': generate_password_hash(user_data['password']),
+            'password': password_hasher.hash(user_data['password']),
             'name': user_data.get('name'),
             'phone': user_data.get('phone'),
             'role': user_data.get('role', 'CLIENT'),
@@ -164,7 +162,6 @@ class UserService:
     
     def update_user(self, user_id, update_data, admin_id):
         """Actualiza un usuario (ADMIN)"""
-        from werkzeug.security import generate_password_hash
         
         # Validar que el usuario existe
         user = self.users_collection.find_one({'_id': ObjectId(user_id)})
@@ -192,7 +189,7 @@ class UserService:
         if 'password' in update_data:
             if not self._validate_password(update_data['password']):
                 raise ValueError("Contraseña debe tener al menos 10 caracteres y 1 caracter especial")
-            filtered_data['password'] = generate_password_hash(update_data['password'])
+            filtered_data['password'] = password_hasher.hash(update_data['password'])
         
         if 'name' in update_data:
             filtered_data['name'] = update_data['name']
@@ -1,6 +1,7 @@
 from flask_jwt_extended import get_jwt
 from functools import wraps
 from flask import jsonify
+from app.utils.token_cache import token_cache
 import logging
 
 logger = logging.getLogger(__name__)
@@ -19,10 +20,7 @@ def token_required_and_not_revoked(fn):
     """
     @wraps(fn)
     def wrapper(*args, **kwargs):
-        jti = get_jwt()['jti']
-        auth_service = get_auth_service()
-        
-        if auth_service.is_token_revoked(jti):
+        if token_cache.is_token_revoked(get_jwt()):
             return jsonify({'error': 'Token revocado'}), 401
         
         return fn(*args, **kwargs)
@@ -38,17 +36,11 @@ def setup_jwt_callbacks(jwt):
     
     @jwt.token_in_blocklist_loader
     def check_if_token_revoked(jwt_header, jwt_payload):
-        """Verifica si un token esta en la lista de revocados"""
+        """Verifica si un token esta en la lista de revocados (ver token_cache)"""
         try:
-            logger.info(f"Verificando token - JTI: {jwt_payload.get('jti')}")
-            jti = jwt_payload['jti']
-            auth_service = get_auth_service()
-            result = auth_service.is_token_revoked(jti)
-            logger.info(f"Token revocado? {result}")
-            return result
+            return token_cache.is_token_revoked(jwt_payload)
         except Exception as e:
             logger.error(f"ERROR al verificar token: {str(e)}")
-            logger.exception(e)
             return False
     
     @jwt.expired_token_loader
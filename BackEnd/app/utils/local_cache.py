@@ -0,0 +1,215 @@
+"""
+Caché local por proceso (LRU + TTL) delante de Redis
+Evita el viaje de red y el json.loads en lecturas calientes (detalle de
+producto, búsquedas del catálogo). Cada namespace tiene su propia caché
+acotada; las escrituras publican el namespace en el canal de Redis
+CACHE_INVALIDATION_CHANNEL y todos los workers limpian su copia local.
+
+Sin Redis no hay forma de invalidar entre workers, por lo que la caché
+local se desactiva (get siempre falla y set no guarda).
+"""
+from collections import OrderedDict
+import threading
+import time
+import logging
+
+from app.config.config import get_config
+from app.config import database
+
+logger = logging.getLogger(__name__)
+
+CACHE_INVALIDATION_CHANNEL = "cache_invalidation"
+
+
+class LocalCache:
+    """
+    LRU acotada con TTL, segura para hilos
+    Lleva contadores de aciertos/fallos y una época que aumenta en cada
+    invalidación: set(epoch=...) descarta valores leídos antes de invalidar.
+    """
+
+    def __init__(self, namespace, max_entries=1024, ttl=30):
+        self.namespace = namespace
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries = OrderedDict()  # key -> (expires_at, value)
+        self._lock = threading.Lock()
+        self.epoch = 0
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        if not _listener.running:
+            return None
+
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] < now:
+                if entry is not None:
+                    del self._entries[key]
+                self.misses += 1
+                return None
+
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def set(self, key, value, epoch=None):
+        """
+        Guarda un valor; si se pasa epoch y hubo una invalidación desde
+        entonces, el valor (posiblemente viejo) no se guarda
+        """
+        if not _listener.running:
+            return
+
+        with self._lock:
+            if epoch is not None and epoch != self.epoch:
+                return
+
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.epoch += 1
+
+    def stats(self):
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_ratio': round(self.hits / total, 4) if total else 0.0
+            }
+
+
+class _InvalidationListener:
+    """Hilo que escucha CACHE_INVALIDATION_CHANNEL y limpia las cachés locales"""
+
+    RECONNECT_DELAY_SECONDS = 5
+
+    def __init__(self):
+        self._thread = None
+        self._lock = threading.Lock()
+        self.connected = False
+
+    @property
+    def running(self):
+        return self.connected and self._thread is not None and self._thread.is_alive()
+
+    def ensure_started(self):
+        if database.redis_client is None:
+            return
+
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(
+                    target=self._run,
+                    name='local-cache-invalidation',
+                    daemon=True
+                )
+                self._thread.start()
+
+    def _run(self):
+        while True:
+            pubsub = None
+            try:
+                pubsub = database.redis_client.pubsub(ignore_subscribe_messages=True)
+                pubsub.subscribe(CACHE_INVALIDATION_CHANNEL)
+                self.connected = True
+
+                while True:
+                    message = pubsub.get_message(timeout=1.0)
+                    if message and message.get('type') == 'message':
+                        _clear_namespace(message['data'])
+
+            except Exception as e:
+                logger.error(f"Listener de invalidación de caché desconectado: {str(e)}")
+            finally:
+                # Mientras no estemos suscritos no sabemos qué se invalidó
+                self.connected = False
+                _clear_all()
+                if pubsub is not None:
+                    try:
+                        pubsub.close()
+                    except Exception:
+                        pass
+
+            time.sleep(self.RECONNECT_DELAY_SECONDS)
+
+
+_caches = {}
+_caches_lock = threading.Lock()
+_callbacks = {}  # namespace -> [callable()] (índices en memoria derivados)
+_listener = _InvalidationListener()
+
+
+def get_local_cache(namespace):
+    """Obtiene (o crea) la caché local del namespace para este proceso"""
+    with _caches_lock:
+        cache = _caches.get(namespace)
+        if cache is None:
+            config = get_config()
+            cache = LocalCache(
+                namespace,
+                max_entries=config.LOCAL_CACHE_MAX_ENTRIES,
+                ttl=config.LOCAL_CACHE_TTL
+            )
+            _caches[namespace] = cache
+
+    _listener.ensure_started()
+    return cache
+
+
+def on_invalidation(namespace, callback):
+    """
+    Registra un callback que se ejecuta cuando el namespace se invalida
+    (localmente o por un mensaje de otro worker) y tras una reconexión
+    """
+    with _caches_lock:
+        _callbacks.setdefault(namespace, []).append(callback)
+    _listener.ensure_started()
+
+
+def publish_invalidation(namespace):
+    """
+    Invalida el namespace en este proceso y lo publica para el resto de workers
+    """
+    _clear_namespace(namespace)
+    database.RedisHelper.publish(CACHE_INVALIDATION_CHANNEL, namespace)
+
+
+def get_local_cache_stats():
+    """Contadores de aciertos/fallos de todas las cachés locales del proceso"""
+    with _caches_lock:
+        caches = list(_caches.values())
+    return {cache.namespace: cache.stats() for cache in caches}
+
+
+def _clear_namespace(namespace):
+    cache = _caches.get(namespace)
+    if cache is not None:
+        cache.clear()
+    _run_callbacks(_callbacks.get(namespace, []))
+
+
+def _clear_all():
+    with _caches_lock:
+        caches = list(_caches.values())
+        callbacks = [cb for namespace_callbacks in _callbacks.values() for cb in namespace_callbacks]
+    for cache in caches:
+        cache.clear()
+    _run_callbacks(callbacks)
+
+
+def _run_callbacks(callbacks):
+    for callback in list(callbacks):
+        try:
+            callback()
+        except Exception as e:
+            logger.error(f"Error en callback de invalidación de caché: {str(e)}")
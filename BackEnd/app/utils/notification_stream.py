@@ -0,0 +1,170 @@
+"""
+Difusión de eventos de notificaciones in-app a conexiones SSE
+NotificationRepository publica cada cambio (notificación nueva y delta del
+contador de no leídas) en NOTIFICATION_EVENTS_CHANNEL. Cada worker mantiene
+una sola suscripción a Redis y reparte los eventos a las colas en memoria
+de las conexiones abiertas de ese usuario (GET /api/notifications/stream):
+los clientes inactivos no consultan MongoDB.
+
+Si el listener pierde la suscripción, al reconectar se envía 'resync' a
+todas las conexiones para que recalculen el contador. Sin Redis los eventos
+solo llegan a las conexiones del mismo proceso.
+
+Las conexiones SSE quedan abiertas: en producción el endpoint se sirve desde
+stream.py con workers gevent (ver README) para que cada una no ocupe un
+hilo; la API sigue con workers de hilos.
+"""
+import json
+import queue
+import threading
+import time
+import logging
+
+from app.config.config import get_config
+from app.config import database
+
+logger = logging.getLogger(__name__)
+
+NOTIFICATION_EVENTS_CHANNEL = "notification_events"
+
+
+class NotificationStream:
+    """Suscripciones por usuario a los eventos de notificaciones"""
+
+    RECONNECT_DELAY_SECONDS = 5
+
+    def __init__(self):
+        self._subscribers = {}  # user_id -> set(queue.Queue)
+        self._lock = threading.Lock()
+        self._thread = None
+        self.connected = False
+
+    # ============================================================================
+    # API
+    # ============================================================================
+    def publish(self, user_id, event):
+        """
+        Publica un evento para el usuario en todos los workers
+
+        Args:
+            event: dict serializable con 'type' ('notification' o 'unread_delta')
+        """
+        payload = json.dumps({'user_id': str(user_id), 'event': event})
+
+        if database.redis_client is None:
+            self._dispatch(str(user_id), event)
+            return
+
+        database.RedisHelper.publish(NOTIFICATION_EVENTS_CHANNEL, payload)
+
+    def subscribe(self, user_id):
+        """Registra una conexión del usuario; retorna su cola de eventos"""
+        self.ensure_started()
+
+        events = queue.Queue(maxsize=get_config().NOTIFICATION_STREAM_QUEUE_SIZE)
+        with self._lock:
+            self._subscribers.setdefault(str(user_id), set()).add(events)
+        return events
+
+    def unsubscribe(self, user_id, events):
+        with self._lock:
+            user_queues = self._subscribers.get(str(user_id))
+            if user_queues is not None:
+                user_queues.discard(events)
+                if not user_queues:
+                    del self._subscribers[str(user_id)]
+
+    def stats(self):
+        with self._lock:
+            return {
+                'listening': self.running,
+                'users': len(self._subscribers),
+                'connections': sum(len(q) for q in self._subscribers.values()),
+            }
+
+    # ============================================================================
+    # LISTENER
+    # ============================================================================
+    @property
+    def running(self):
+        return self.connected and self._thread is not None and self._thread.is_alive()
+
+    def ensure_started(self):
+        if database.redis_client is None:
+            return
+
+        if self._thread is not None and self._thread.is_alive():
+            return
+
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(
+                    target=self._run,
+                    name='notification-stream',
+                    daemon=True
+                )
+                self._thread.start()
+
+    def _run(self):
+        resync = False
+        while True:
+            pubsub = None
+            try:
+                pubsub = database.redis_client.pubsub(ignore_subscribe_messages=True)
+                pubsub.subscribe(NOTIFICATION_EVENTS_CHANNEL)
+                self.connected = True
+
+                # Eventos perdidos mientras no estábamos suscritos
+                if resync:
+                    self._broadcast({'type': 'resync'})
+
+                while True:
+                    message = pubsub.get_message(timeout=1.0)
+                    if message and message.get('type') == 'message':
+                        data = json.loads(message['data'])
+                        self._dispatch(data['user_id'], data['event'])
+
+            except Exception as e:
+                logger.error(f"Listener de notificaciones desconectado: {str(e)}")
+            finally:
+                self.connected = False
+                resync = True
+                if pubsub is not None:
+                    try:
+                        pubsub.close()
+                    except Exception:
+                        pass
+
+            time.sleep(self.RECONNECT_DELAY_SECONDS)
+
+    def _dispatch(self, user_id, event):
+        with self._lock:
+            user_queues = list(self._subscribers.get(user_id, ()))
+        for events in user_queues:
+            self._offer(events, event)
+
+    def _broadcast(self, event):
+        with self._lock:
+            all_queues = [q for user_queues in self._subscribers.values() for q in user_queues]
+        for events in all_queues:
+            self._offer(events, event)
+
+    @staticmethod
+    def _offer(events, event):
+        try:
+            events.put_nowait(event)
+        except queue.Full:
+            # Cliente lento: descartar lo pendiente y pedirle que se resincronice
+            try:
+                while True:
+                    events.get_nowait()
+            except queue.Empty:
+                pass
+            try:
+                events.put_nowait({'type': 'resync'})
+            except queue.Full:
+                pass
+
+
+# Instancia compartida por el proceso
+notification_stream = NotificationStream()
@@ -0,0 +1,128 @@
+"""
+Hash de contraseñas unificado
+Un solo algoritmo (bcrypt) con costo configurable (PASSWORD_HASH_ROUNDS)
+para AuthService, UserService y el modelo User.
+
+El hash es CPU intensivo: se ejecuta en un pool de hilos acotado
+(PASSWORD_HASH_WORKERS; bcrypt y hashlib liberan el GIL) para que una
+ráfaga de logins no deje sin CPU al resto de peticiones del worker. Si hay
+más de PASSWORD_HASH_MAX_QUEUE operaciones esperando durante
+PASSWORD_HASH_QUEUE_TIMEOUT segundos se rechaza con PasswordHasherBusy.
+
+Los hashes anteriores (werkzeug pbkdf2/scrypt, o bcrypt con otro costo) se
+siguen verificando; needs_rehash indica cuándo reemplazarlos tras un login
+exitoso.
+"""
+from concurrent.futures import ThreadPoolExecutor
+from werkzeug.security import check_password_hash
+from app.config.config import get_config
+import bcrypt
+import threading
+import logging
+
+logger = logging.getLogger(__name__)
+
+# bcrypt solo usa los primeros 72 bytes de la contraseña
+BCRYPT_MAX_BYTES = 72
+
+
+class PasswordHasherBusy(RuntimeError):
+    """Demasiadas operaciones de hash en espera"""
+
+
+class PasswordHasher:
+    """Hash y verificación de contraseñas en un pool acotado"""
+
+    def __init__(self):
+        self._executor = None
+        self._slots = None
+        self._lock = threading.Lock()
+
+    # ============================================================================
+    # API
+    # ============================================================================
+    def hash(self, password):
+        """
+        Genera el hash bcrypt de la contraseña
+
+        Raises:
+            ValueError: si la contraseña supera BCRYPT_MAX_BYTES
+            PasswordHasherBusy: si el pool está saturado
+        """
+        encoded = password.encode('utf-8')
+        if len(encoded) > BCRYPT_MAX_BYTES:
+            raise ValueError(f"La contraseña no puede superar {BCRYPT_MAX_BYTES} bytes")
+
+        rounds = get_config().PASSWORD_HASH_ROUNDS
+        return self._submit(
+            lambda: bcrypt.hashpw(encoded, bcrypt.gensalt(rounds=rounds)).decode('utf-8')
+        )
+
+    def verify(self, password, hashed):
+        """
+        Verifica la contraseña contra un hash bcrypt o werkzeug (legado)
+
+        Raises:
+            PasswordHasherBusy: si el pool está saturado
+        """
+        if not password or not hashed:
+            return False
+        return self._submit(lambda: self._verify(password, hashed))
+
+    def needs_rehash(self, hashed):
+        """Indica si el hash usa otro algoritmo u otro costo que el configurado"""
+        if not self._is_bcrypt(hashed):
+            return True
+        try:
+            return int(hashed.split('$')[2]) != get_config().PASSWORD_HASH_ROUNDS
+        except (IndexError, ValueError):
+            return True
+
+    # ============================================================================
+    # POOL
+    # ============================================================================
+    def _submit(self, fn):
+        config = get_config()
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(
+                    max_workers=config.PASSWORD_HASH_WORKERS,
+                    thread_name_prefix='password-hash'
+                )
+                # Operaciones en ejecución + en cola
+                self._slots = threading.BoundedSemaphore(
+                    config.PASSWORD_HASH_WORKERS + config.PASSWORD_HASH_MAX_QUEUE
+                )
+
+        if not self._slots.acquire(timeout=config.PASSWORD_HASH_QUEUE_TIMEOUT):
+            logger.warning("Pool de hash de contraseñas saturado")
+            raise PasswordHasherBusy("Servicio ocupado, intente de nuevo en unos segundos")
+
+        try:
+            return self._executor.submit(fn).result()
+        finally:
+            self._slots.release()
+
+    def _verify(self, password, hashed):
+        if self._is_bcrypt(hashed):
+            encoded = password.encode('utf-8')
+            if len(encoded) > BCRYPT_MAX_BYTES:
+                return False
+            try:
+                return bcrypt.checkpw(encoded, hashed.encode('utf-8'))
+            except ValueError:
+                return False
+
+        # Hashes de werkzeug (pbkdf2:/scrypt:) anteriores a la unificación
+        try:
+            return check_password_hash(hashed, password)
+        except (ValueError, TypeError):
+            return False
+
+    @staticmethod
+    def _is_bcrypt(hashed):
+        return hashed.startswith(('$2a$', '$2b$', '$2y$'))
+
+
+# Instancia compartida por el proceso
+password_hasher = PasswordHasher()
@@ -0,0 +1,18 @@
+"""
+Utilidades de normalizacion de texto para busquedas
+"""
+import unicodedata
+
+
+def normalize_text(value):
+    """
+    Normaliza texto para comparaciones y busquedas por prefijo:
+    minusculas, sin acentos/diacriticos y con espacios colapsados
+    ("Porcelanato Mármol " -> "porcelanato marmol")
+    """
+    if not value:
+        return ''
+
+    decomposed = unicodedata.normalize('NFKD', str(value))
+    without_accents = ''.join(c for c in decomposed if not unicodedata.combining(c))
+    return ' '.join(without_accents.casefold().split())
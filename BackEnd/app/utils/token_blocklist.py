@@ -0,0 +1,339 @@
+"""
+Lista de tokens JWT revocados (blocklist)
+La consulta de revocación corre en cada petición autenticada, así que se
+resuelve en tres niveles:
+
+1. Filtro de Bloom por worker con los JTI revocados vigentes: la respuesta
+   habitual ("no revocado") no sale del proceso.
+2. Redis: revoked_jti:<jti> con TTL igual a la vida restante del token.
+   Solo se consulta si el filtro dice "quizás".
+3. MongoDB (revoked_tokens): registro durable, usado si el filtro dice
+   "quizás" y Redis no lo confirma (falso positivo o Redis sin datos), y
+   siempre que no haya Redis.
+
+Cerrar todas las sesiones de un usuario no registra JTI: incrementa su
+generación de tokens (users.token_generation, cacheada en Redis como
+token_gen:<user_id>). Los tokens llevan la generación vigente al emitirse
+en el claim TOKEN_GENERATION_CLAIM y los de una generación anterior se
+consideran revocados.
+
+Cada revocación y cada cambio de generación se publica en
+TOKEN_REVOCATION_CHANNEL y todos los workers lo aplican a su filtro y a su
+mapa local de generaciones. Mientras el listener no está suscrito el filtro no
+es confiable y se consulta Redis/MongoDB directamente; al (re)conectar y
+cada TOKEN_BLOOM_REBUILD_INTERVAL segundos se reconstruye desde MongoDB
+para descartar los JTI ya expirados.
+"""
+from bson import ObjectId
+from datetime import datetime
+from pymongo import ReturnDocument
+import hashlib
+import math
+import threading
+import time
+import logging
+
+from app.config.config import get_config
+from app.config import database
+
+logger = logging.getLogger(__name__)
+
+TOKEN_REVOCATION_CHANNEL = "token_revocations"
+REVOKED_JTI_PREFIX = "revoked_jti"
+TOKEN_GENERATION_PREFIX = "token_gen"
+TOKEN_GENERATION_CLAIM = "gen"
+
+
+class BloomFilter:
+    """
+    Filtro de Bloom de tamaño fijo (bytearray)
+    Sin falsos negativos; falsos positivos cerca de error_rate mientras no
+    se superen capacity elementos
+    """
+
+    def __init__(self, capacity=100000, error_rate=0.001):
+        self.capacity = capacity
+        self.size = max(8, int(-capacity * math.log(error_rate) / (math.log(2) ** 2)))
+        self.hash_count = max(1, round(self.size / capacity * math.log(2)))
+        self._bits = bytearray((self.size + 7) // 8)
+        self.count = 0
+
+    def _positions(self, item):
+        # Doble hashing (Kirsch-Mitzenmacher) sobre un solo digest
+        digest = hashlib.blake2b(item.encode('utf-8'), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], 'little')
+        h2 = int.from_bytes(digest[8:], 'little') | 1
+        return [(h1 + i * h2) % self.size for i in range(self.hash_count)]
+
+    def add(self, item):
+        for pos in self._positions(item):
+            self._bits[pos >> 3] |= 1 << (pos & 7)
+        self.count += 1
+
+    def __contains__(self, item):
+        return all(self._bits[pos >> 3] & (1 << (pos & 7)) for pos in self._positions(item))
+
+
+class TokenBlocklist:
+    """Revocación y consulta de JTI (ver docstring del módulo)"""
+
+    RECONNECT_DELAY_SECONDS = 5
+
+    def __init__(self):
+        self._bloom = None
+        self._bloom_built_at = 0.0
+        self._generations = {}  # user_id -> generación conocida por este worker
+        self._callbacks = []  # callable(kind, value) ante revocaciones (ver on_revocation)
+        self._thread = None
+        self._lock = threading.Lock()
+        self.connected = False
+
+    # ============================================================================
+    # API
+    # ============================================================================
+    def revoke(self, jti, token_type, expires_at):
+        """
+        Revoca un JTI hasta expires_at (datetime UTC de expiración del token)
+        """
+        database.get_db().revoked_tokens.insert_one({
+            'jti': jti,
+            'token_type': token_type,
+            'revoked_at': datetime.utcnow(),
+            'expires_at': expires_at
+        })
+
+        ttl = int((expires_at - datetime.utcnow()).total_seconds())
+        if database.redis_client is not None and ttl > 0:
+            try:
+                database.redis_client.setex(f"{REVOKED_JTI_PREFIX}:{jti}", ttl, token_type)
+            except Exception as e:
+                logger.error(f"Error guardando JTI revocado en Redis: {str(e)}")
+
+        # Este worker no espera a recibir su propio mensaje
+        bloom = self._bloom
+        if bloom is not None:
+            bloom.add(jti)
+        self._notify('jti', jti)
+        database.RedisHelper.publish(TOKEN_REVOCATION_CHANNEL, f"jti:{jti}")
+
+    def revoke_all(self, user_id):
+        """
+        Revoca todos los tokens emitidos al usuario incrementando su generación
+
+        Returns:
+            int: nueva generación
+        """
+        user = database.get_db().users.find_one_and_update(
+            {'_id': ObjectId(user_id)},
+            {'$inc': {'token_generation': 1}},
+            projection={'token_generation': 1},
+            return_document=ReturnDocument.AFTER
+        )
+        if not user:
+            raise ValueError("Usuario no encontrado")
+
+        generation = user['token_generation']
+        self._cache_generation(user_id, generation)
+        self._remember_generation(user_id, generation)
+        self._notify('gen', user_id)
+        database.RedisHelper.publish(TOKEN_REVOCATION_CHANNEL, f"gen:{user_id}:{generation}")
+
+        return generation
+
+    def get_generation(self, user_id):
+        """Generación vigente de tokens del usuario (0 si nunca cerró todas las sesiones)"""
+        self.ensure_started()
+
+        # Si el mapa se reemplaza mientras se consulta Redis/MongoDB, el valor
+        # leído se guarda en el mapa descartado y no en el nuevo
+        generations = self._generations
+        if self.running:
+            generation = generations.get(user_id)
+            if generation is not None:
+                return generation
+
+        generation = None
+        if database.redis_client is not None:
+            try:
+                cached = database.redis_client.get(f"{TOKEN_GENERATION_PREFIX}:{user_id}")
+                if cached is not None:
+                    generation = int(cached)
+            except Exception as e:
+                logger.error(f"Error consultando generación de tokens en Redis: {str(e)}")
+
+        if generation is None:
+            user = database.get_db().users.find_one(
+                {'_id': ObjectId(user_id)}, {'token_generation': 1}
+            ) or {}
+            generation = user.get('token_generation', 0)
+            # Solo si no existe: un revoke_all entre la lectura y la escritura
+            # ya guardó una generación mayor que no se debe pisar
+            self._cache_generation(user_id, generation, only_if_missing=True)
+
+        if self.running:
+            self._remember_generation(user_id, generation, generations)
+        return generation
+
+    def is_token_revoked(self, jwt_payload):
+        """
+        Indica si el token fue revocado: por generación anterior a la vigente
+        del usuario o por JTI
+        """
+        if jwt_payload.get(TOKEN_GENERATION_CLAIM, 0) < self.get_generation(jwt_payload['sub']):
+            return True
+        return self.is_revoked(jwt_payload['jti'])
+
+    def is_revoked(self, jti):
+        """Indica si el JTI fue revocado"""
+        self.ensure_started()
+
+        bloom = self._bloom
+        if self.running and bloom is not None and jti not in bloom:
+            return False
+
+        if database.redis_client is not None:
+            try:
+                if database.redis_client.exists(f"{REVOKED_JTI_PREFIX}:{jti}"):
+                    return True
+            except Exception as e:
+                logger.error(f"Error consultando JTI en Redis: {str(e)}")
+
+        return database.get_db().revoked_tokens.find_one({'jti': jti}, {'_id': 1}) is not None
+
+    def on_revocation(self, callback):
+        """
+        Registra callback(kind, value) para cachés derivadas: 'jti' con el JTI
+        revocado, 'gen' con el user_id que cerró todas sus sesiones y 'reset'
+        (value None) cuando el listener se desconecta
+        """
+        self._callbacks.append(callback)
+
+    def stats(self):
+        bloom = self._bloom
+        return {
+            'listening': self.running,
+            'known_generations': len(self._generations),
+            'bloom_entries': bloom.count if bloom is not None else None,
+            'bloom_age_seconds': int(time.monotonic() - self._bloom_built_at) if bloom is not None else None,
+        }
+
+    # ============================================================================
+    # LISTENER Y FILTRO DE BLOOM
+    # ============================================================================
+    @property
+    def running(self):
+        return self.connected and self._thread is not None and self._thread.is_alive()
+
+    def ensure_started(self):
+        if database.redis_client is None:
+            return
+
+        if self._thread is not None and self._thread.is_alive():
+            return
+
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(
+                    target=self._run,
+                    name='token-blocklist',
+                    daemon=True
+                )
+                self._thread.start()
+
+    def _run(self):
+        while True:
+            pubsub = None
+            try:
+                # Suscribirse antes de cargar: nada revocado durante la carga se pierde
+                pubsub = database.redis_client.pubsub(ignore_subscribe_messages=True)
+                pubsub.subscribe(TOKEN_REVOCATION_CHANNEL)
+                self._rebuild()
+                self.connected = True
+
+                rebuild_interval = get_config().TOKEN_BLOOM_REBUILD_INTERVAL
+                while True:
+                    message = pubsub.get_message(timeout=1.0)
+                    if message and message.get('type') == 'message':
+                        self._apply_message(message['data'])
+
+                    # Reconstruir para descartar expirados o si se llenó el filtro
+                    if (time.monotonic() - self._bloom_built_at > rebuild_interval
+                            or self._bloom.count > self._bloom.capacity):
+                        self._rebuild()
+
+            except Exception as e:
+                logger.error(f"Listener de revocación de tokens desconectado: {str(e)}")
+            finally:
+                # Sin suscripción el filtro y las generaciones pueden estar viejos
+                self.connected = False
+                self._generations = {}
+                self._notify('reset', None)
+                if pubsub is not None:
+                    try:
+                        pubsub.close()
+                    except Exception:
+                        pass
+
+            time.sleep(self.RECONNECT_DELAY_SECONDS)
+
+    def _apply_message(self, data):
+        kind, _, value = data.partition(':')
+        if kind == 'jti':
+            self._bloom.add(value)
+            self._notify('jti', value)
+        elif kind == 'gen':
+            user_id, _, generation = value.rpartition(':')
+            self._remember_generation(user_id, int(generation))
+            self._notify('gen', user_id)
+
+    def _notify(self, kind, value):
+        for callback in list(self._callbacks):
+            try:
+                callback(kind, value)
+            except Exception as e:
+                logger.error(f"Error en callback de revocación de tokens: {str(e)}")
+
+    def _remember_generation(self, user_id, generation, generations=None):
+        # Las generaciones solo crecen: max() evita que una lectura vieja
+        # pise una actualización recibida por el canal
+        if generations is None:
+            generations = self._generations
+        generations[user_id] = max(generation, generations.get(user_id, 0))
+
+    def _cache_generation(self, user_id, generation, only_if_missing=False):
+        if database.redis_client is None:
+            return
+        try:
+            database.redis_client.set(
+                f"{TOKEN_GENERATION_PREFIX}:{user_id}",
+                generation,
+                ex=get_config().JWT_REFRESH_TOKEN_EXPIRES,
+                nx=only_if_missing
+            )
+        except Exception as e:
+            logger.error(f"Error guardando generación de tokens en Redis: {str(e)}")
+
+    def _rebuild(self):
+        """Carga en un filtro nuevo los JTI revocados aún vigentes"""
+        config = get_config()
+        cursor = database.get_db().revoked_tokens.find(
+            {'expires_at': {'$gt': datetime.utcnow()}},
+            {'jti': 1, '_id': 0}
+        )
+
+        jtis = [doc['jti'] for doc in cursor if doc.get('jti')]
+        bloom = BloomFilter(
+            capacity=max(config.TOKEN_BLOOM_CAPACITY, len(jtis) * 2),
+            error_rate=config.TOKEN_BLOOM_ERROR_RATE
+        )
+        for jti in jtis:
+            bloom.add(jti)
+
+        self._bloom = bloom
+        self._bloom_built_at = time.monotonic()
+        # También acota el mapa de generaciones a los usuarios activos
+        self._generations = {}
+
+
+# Instancia compartida por el proceso
+token_blocklist = TokenBlocklist()
@@ -0,0 +1,159 @@
+"""
+Caché por worker de tokens de acceso ya validados
+El SPA repite el mismo token cientos de veces por minuto (p. ej. el sondeo
+de /api/notifications/unread-count). Cada petición decodificaba el JWT,
+verificaba la firma y consultaba la blocklist.
+
+- Claims: digest SHA-256 del token -> claims decodificados. Un token
+  firmado no cambia, así que no hace falta invalidarlos; solo se descartan
+  al expirar el token (claim exp) o a los TOKEN_CACHE_TTL segundos.
+- Revocación: jti -> revocado o no. Se invalida con los eventos de
+  utils/token_blocklist (pub/sub) y solo se usa mientras su listener está
+  suscrito; sin él se consulta la blocklist en cada petición.
+
+CachedJWTManager usa la caché al decodificar los tokens de la cabecera
+Authorization; check_if_token_revoked (utils/jwt_utils) usa is_token_revoked.
+"""
+from collections import OrderedDict
+from flask_jwt_extended import JWTManager
+from app.config.config import get_config
+from app.utils.token_blocklist import token_blocklist
+import hashlib
+import threading
+import time
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class TokenCache:
+    """LRU acotada con TTL para claims y estado de revocación, segura para hilos"""
+
+    def __init__(self):
+        self._claims = OrderedDict()  # digest -> (expira monotonic, exp del token, claims)
+        self._revoked = OrderedDict()  # jti -> (expira monotonic, revocado)
+        self._lock = threading.Lock()
+        self.epoch = 0
+        self.hits = 0
+        self.misses = 0
+
+    # ============================================================================
+    # CLAIMS
+    # ============================================================================
+    def get_claims(self, encoded_token):
+        """Claims del token si ya se validó y no expiró; None si no está"""
+        key = self._digest(encoded_token)
+        now = time.monotonic()
+
+        with self._lock:
+            entry = self._claims.get(key)
+            if entry is None or entry[0] < now or entry[1] <= time.time():
+                if entry is not None:
+                    del self._claims[key]
+                self.misses += 1
+                return None
+
+            self._claims.move_to_end(key)
+            self.hits += 1
+            # Copia: flask_jwt_extended guarda los claims por petición
+            return dict(entry[2])
+
+    def set_claims(self, encoded_token, claims):
+        exp = claims.get('exp')
+        if exp is None:
+            return
+
+        config = get_config()
+        key = self._digest(encoded_token)
+        with self._lock:
+            self._claims[key] = (time.monotonic() + config.TOKEN_CACHE_TTL, exp, dict(claims))
+            self._claims.move_to_end(key)
+            self._trim(self._claims, config.TOKEN_CACHE_MAX_ENTRIES)
+
+    # ============================================================================
+    # REVOCACIÓN
+    # ============================================================================
+    def is_token_revoked(self, jwt_payload):
+        """token_blocklist.is_token_revoked con el resultado cacheado por jti"""
+        if not token_blocklist.running:
+            return token_blocklist.is_token_revoked(jwt_payload)
+
+        jti = jwt_payload['jti']
+        now = time.monotonic()
+        with self._lock:
+            entry = self._revoked.get(jti)
+            if entry is not None and entry[0] >= now:
+                self._revoked.move_to_end(jti)
+                return entry[1]
+            epoch = self.epoch
+
+        revoked = token_blocklist.is_token_revoked(jwt_payload)
+
+        config = get_config()
+        with self._lock:
+            # Una revocación llegó mientras se consultaba: no guardar
+            if epoch == self.epoch:
+                self._revoked[jti] = (now + config.TOKEN_CACHE_TTL, revoked)
+                self._revoked.move_to_end(jti)
+                self._trim(self._revoked, config.TOKEN_CACHE_MAX_ENTRIES)
+
+        return revoked
+
+    def on_revocation(self, kind, value):
+        """Callback de token_blocklist: descarta estados que pueden haber cambiado"""
+        with self._lock:
+            self.epoch += 1
+            if kind == 'jti':
+                self._revoked.pop(value, None)
+            else:
+                # 'gen' (todas las sesiones de un usuario) o 'reset'
+                self._revoked.clear()
+
+    def stats(self):
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                'claims': len(self._claims),
+                'revocation_status': len(self._revoked),
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_ratio': round(self.hits / total, 4) if total else 0.0
+            }
+
+    @staticmethod
+    def _digest(encoded_token):
+        if isinstance(encoded_token, str):
+            encoded_token = encoded_token.encode('utf-8')
+        return hashlib.sha256(encoded_token).digest()
+
+    @staticmethod
+    def _trim(entries, max_entries):
+        while len(entries) > max_entries:
+            entries.popitem(last=False)
+
+
+# Instancia compartida por el proceso
+token_cache = TokenCache()
+token_blocklist.on_revocation(token_cache.on_revocation)
+
+
+class CachedJWTManager(JWTManager):
+    """
+    JWTManager que reutiliza los claims de tokens ya verificados
+    Solo aplica a tokens sin CSRF y sin allow_expired (cabecera Authorization);
+    el resto sigue el camino normal de flask_jwt_extended
+    """
+
+    # Sobrescribe un método interno de flask_jwt_extended (4.6, ver requirements.txt)
+    def _decode_jwt_from_config(self, encoded_token, csrf_value=None, allow_expired=False):
+        cacheable = csrf_value is None and not allow_expired
+        if cacheable:
+            claims = token_cache.get_claims(encoded_token)
+            if claims is not None:
+                return claims
+
+        claims = super()._decode_jwt_from_config(encoded_token, csrf_value, allow_expired)
+
+        if cacheable:
+            token_cache.set_claims(encoded_token, claims)
+        return claims
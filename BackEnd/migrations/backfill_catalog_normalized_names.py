@@ -0,0 +1,66 @@
+"""
+Migración: calcula 'name_normalized' en categorías y etiquetas existentes
+
+La unicidad de nombres del catálogo se apoya en el índice único
+name_normalized_unique (minúsculas, sin acentos) en lugar de búsquedas
+regex. Los documentos anteriores no tienen el campo y quedan fuera del
+índice hasta ejecutar esta migración. Si hay duplicados (p. ej. "Pisos" y
+"pisos") se listan para resolverlos a mano antes de escribir nada: el
+índice único ya existe (create_app lo crea al iniciar) y rechazaría el
+backfill.
+
+Ejecutar antes del primer despliegue que incluye name_normalized: mientras
+haya duplicados sin resolver la sincronización del catálogo no corre.
+
+Uso:
+    python migrations/backfill_catalog_normalized_names.py
+"""
+import os
+import sys
+
+# Agregar el path del proyecto
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import create_app
+from app.config.indexes import ensure_indexes
+from app.config.database import get_db
+from app.repositories.catalog_repository import CatalogRepository
+
+
+def main():
+    """Función principal"""
+    app = create_app()
+
+    with app.app_context():
+        catalog_repo = CatalogRepository()
+
+        # Antes de escribir: con duplicados el bulk_write fallaría por el índice único
+        duplicates = catalog_repo.find_normalized_duplicates()
+        if any(duplicates.values()):
+            labels = {"categories": "categorías", "tags": "etiquetas"}
+            for key, groups in duplicates.items():
+                for names in groups:
+                    print(f"⚠️  {labels[key]} duplicadas: {', '.join(names)}")
+            print("❌ Resuelva los duplicados y vuelva a ejecutar la migración")
+            sys.exit(1)
+
+        result = catalog_repo.backfill_normalized_names()
+
+        print(f"✅ Categorías actualizadas: {result['categories']}")
+        print(f"✅ Etiquetas actualizadas: {result['tags']}")
+
+        # Crear el índice único si falló al iniciar la aplicación
+        ensure_indexes(get_db())
+        print("✅ Índices del catálogo verificados")
+
+
+if __name__ == "__main__":
+    try:
+        main()
+    except KeyboardInterrupt:
+        print("\n\n⚠️  Proceso interrumpido por el usuario")
+    except Exception as e:
+        print(f"\n❌ Error: {str(e)}")
+        import traceback
+        traceback.print_exc()
+        sys.exit(1)
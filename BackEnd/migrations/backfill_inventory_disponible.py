@@ -0,0 +1,45 @@
+"""
+Migración: calcula el campo 'disponible' en los documentos de inventario
+
+Los documentos creados antes de que InventoryRepository mantuviera el campo
+no lo tienen, y las consultas de stock bajo (find_low_stock) los ignorarían.
+La migración es idempotente: recalcula 'disponible' = max(0, stock_total - stock_retenido)
+en todos los documentos.
+
+Uso:
+    python migrations/backfill_inventory_disponible.py
+"""
+import os
+import sys
+
+# Agregar el path del proyecto
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import create_app
+from app.repositories.inventory_repository import InventoryRepository
+
+
+def main():
+    """Función principal"""
+    # create_app aplica el manifiesto de índices (incluye inventory.disponible)
+    app = create_app()
+
+    with app.app_context():
+        inventory_repo = InventoryRepository()
+
+        total = inventory_repo.count()
+        modified = inventory_repo.backfill_disponible()
+
+        print(f"✅ Inventario actualizado: {modified} de {total} documentos modificados")
+
+
+if __name__ == "__main__":
+    try:
+        main()
+    except KeyboardInterrupt:
+        print("\n\n⚠️  Proceso interrumpido por el usuario")
+    except Exception as e:
+        print(f"\n❌ Error: {str(e)}")
+        import traceback
+        traceback.print_exc()
+        sys.exit(1)
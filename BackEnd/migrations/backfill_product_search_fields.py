@@ -0,0 +1,41 @@
+"""
+Migración: calcula 'nombre_normalizado' en los productos existentes
+
+La búsqueda por prefijo (autocompletado) consulta el índice de
+'nombre_normalizado' (minúsculas, sin acentos). ProductRepository lo mantiene
+en create/update; los productos anteriores necesitan este backfill.
+Al iniciar, create_app crea además el índice de texto 'products_text'.
+
+Uso:
+    python migrations/backfill_product_search_fields.py
+"""
+import os
+import sys
+
+# Agregar el path del proyecto
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import create_app
+from app.repositories.product_repository import ProductRepository
+
+
+def main():
+    """Función principal"""
+    app = create_app()
+
+    with app.app_context():
+        modified = ProductRepository().backfill_normalized_names()
+
+        print(f"✅ Productos actualizados: {modified} con nombre normalizado")
+
+
+if __name__ == "__main__":
+    try:
+        main()
+    except KeyboardInterrupt:
+        print("\n\n⚠️  Proceso interrumpido por el usuario")
+    except Exception as e:
+        print(f"\n❌ Error: {str(e)}")
+        import traceback
+        traceback.print_exc()
+        sys.exit(1)
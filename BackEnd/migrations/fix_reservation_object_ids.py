@@ -0,0 +1,52 @@
+"""
+Migración: convierte a ObjectId los ids guardados como string en reservas
+
+Versiones anteriores guardaban user_id e items.variant_id como string en
+algunas reservas. La exportación normaliza los ids en el pipeline, pero con
+los datos corregidos cada $lookup compara ObjectId contra ObjectId sobre el
+índice de _id y no hay conversiones por fila.
+La migración es idempotente: solo toca reservas que aún tienen ids string.
+
+Uso:
+    python migrations/fix_reservation_object_ids.py
+"""
+import os
+import sys
+
+# Agregar el path del proyecto
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import create_app
+from app.repositories.reservation_repository import ReservationRepository
+
+
+def main():
+    """Función principal"""
+    app = create_app()
+
+    with app.app_context():
+        reservation_repo = ReservationRepository()
+
+        pending = reservation_repo.count_legacy_ids()
+        if pending == 0:
+            print("✅ No hay reservas con ids en formato string")
+            return
+
+        modified = reservation_repo.normalize_legacy_ids()
+        remaining = reservation_repo.count_legacy_ids()
+
+        print(f"✅ Reservas corregidas: {modified} de {pending}")
+        if remaining:
+            print(f"⚠️  {remaining} reservas conservan ids string que no son ObjectId válidos")
+
+
+if __name__ == "__main__":
+    try:
+        main()
+    except KeyboardInterrupt:
+        print("\n\n⚠️  Proceso interrumpido por el usuario")
+    except Exception as e:
+        print(f"\n❌ Error: {str(e)}")
+        import traceback
+        traceback.print_exc()
+        sys.exit(1)
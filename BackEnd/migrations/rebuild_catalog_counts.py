@@ -0,0 +1,43 @@
+"""
+Migración: recalcula el contador productCount de categorías y etiquetas
+
+CatalogRepository mantiene productCount en cada alta, edición o baja de
+productos. Este comando lo recalcula desde products para los documentos
+creados antes de que existiera el contador o si se modificaron productos
+directamente en la base de datos.
+Es idempotente: solo escribe los contadores que difieren.
+
+Uso:
+    python migrations/rebuild_catalog_counts.py
+"""
+import os
+import sys
+
+# Agregar el path del proyecto
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import create_app
+from app.repositories.catalog_repository import CatalogRepository
+
+
+def main():
+    """Función principal"""
+    app = create_app()
+
+    with app.app_context():
+        result = CatalogRepository().rebuild_usage_counts()
+
+        print(f"✅ Categorías actualizadas: {result['categories']}")
+        print(f"✅ Etiquetas actualizadas: {result['tags']}")
+
+
+if __name__ == "__main__":
+    try:
+        main()
+    except KeyboardInterrupt:
+        print("\n\n⚠️  Proceso interrumpido por el usuario")
+    except Exception as e:
+        print(f"\n❌ Error: {str(e)}")
+        import traceback
+        traceback.print_exc()
+        sys.exit(1)
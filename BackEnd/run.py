@@ -3,8 +3,8 @@ Punto de entrada de la aplicación
 """
 import os
 from app import create_app
-from flask_jwt_extended import JWTManager
 from app.utils.jwt_utils import setup_jwt_callbacks
+from app.utils.token_cache import CachedJWTManager
 from app.jobs import init_scheduler
 from app.models.user import create_user, find_user_by_email
 from app.constants.roles import UserRole
@@ -15,8 +15,8 @@ from app.routes.inventory import inventory_bp
 # Crear la aplicación
 app = create_app()
 
-# Configurar JWT
-jwt = JWTManager(app)
+# Configurar JWT (reutiliza los claims de tokens ya verificados, ver token_cache)
+jwt = CachedJWTManager(app)
 setup_jwt_callbacks(jwt)
 
 # Registrar nuevos blueprints
@@ -0,0 +1,23 @@
+"""
+Punto de entrada del stream SSE de notificaciones
+Servicio aparte para GET /api/notifications/stream: cada conexión queda
+abierta, por lo que corre con workers gevent. La API (run.py) sigue con
+workers de hilos: gevent parchea threading y los pools de hash de
+contraseñas y de exportaciones pasarían a ser greenlets en el único hilo
+del worker, bloqueando todas sus peticiones.
+
+No inicia el scheduler: los jobs corren en los workers de la API.
+"""
+from app import create_app
+from app.utils.jwt_utils import setup_jwt_callbacks
+from app.utils.token_cache import CachedJWTManager
+from app.routes.notifications import notifications_bp
+
+# Crear la aplicación
+app = create_app()
+
+# Configurar JWT (mismos callbacks y blocklist que la API)
+jwt = CachedJWTManager(app)
+setup_jwt_callbacks(jwt)
+
+app.register_blueprint(notifications_bp, url_prefix="/api/notifications")
@@ -0,0 +1,113 @@
+"""
+Pruebas de Integridad - Paginación por cursor (keyset)
+========================================================
+
+Validan que recorrer todas las páginas de keyset_filter/keyset_sort visita
+cada documento exactamente una vez, incluidos los que tienen la clave de
+orden nula o ausente. No requieren MongoDB: el filtro se evalúa con la
+semántica de MongoDB para null (coincide con nulo y ausente, y nunca
+cumple $lt/$gt) y el orden replica el de MongoDB (nulos al inicio en
+ascendente y al final en descendente).
+
+Casos de Prueba:
+- INT-04: Recorrido completo con claves nulas/ausentes en ambos sentidos
+"""
+
+import os
+import sys
+from datetime import datetime, timedelta
+
+import pytest
+from bson import ObjectId
+
+sys.path.insert(0, os.path.abspath('.'))
+
+from app.repositories.pagination import encode_cursor, keyset_filter
+
+
+def matches(doc, query):
+    """Evalúa el subconjunto de operadores que genera keyset_filter"""
+    for key, condition in query.items():
+        if key == '$or':
+            if not any(matches(doc, sub) for sub in condition):
+                return False
+        elif key == '$and':
+            if not all(matches(doc, sub) for sub in condition):
+                return False
+        elif isinstance(condition, dict):
+            value = doc.get(key)
+            for op, arg in condition.items():
+                if op == '$ne':
+                    ok = value != arg
+                elif value is None or arg is None:
+                    ok = False
+                elif op == '$lt':
+                    ok = value < arg
+                else:
+                    ok = value > arg
+                if not ok:
+                    return False
+        elif doc.get(key) != condition:
+            return False
+    return True
+
+
+def mongo_order(docs, field, direction):
+    """Orden (field, _id) de MongoDB: null es menor que cualquier valor"""
+    def key(doc):
+        value = doc.get(field)
+        return (value is not None, value or datetime.min, doc['_id'])
+    return sorted(docs, key=key, reverse=direction == -1)
+
+
+def paginate(docs, field, direction, base_query=None, page_size=2):
+    """Recorre todas las páginas siguiendo el cursor de la última fila"""
+    seen = []
+    cursor = None
+    while True:
+        query = keyset_filter(dict(base_query or {}), field, cursor, direction=direction)
+        page = mongo_order([d for d in docs if matches(d, query)], field, direction)[:page_size]
+        if not page:
+            return seen
+        seen.extend(page)
+        last = page[-1]
+        cursor = encode_cursor(last.get(field), last['_id'])
+
+
+@pytest.fixture
+def docs():
+    start = datetime(2024, 1, 1)
+    rows = []
+    for i in range(7):
+        doc = {'_id': ObjectId(), 'user_id': 'u1' if i % 2 else 'u2'}
+        if i in (1, 4):
+            doc['created_at'] = None
+        elif i != 5:  # i == 5: sin el campo
+            # Dos filas con el mismo valor: desempate por _id
+            doc['created_at'] = start + timedelta(days=min(i, 3))
+        rows.append(doc)
+    return rows
+
+
+class TestKeysetPagination:
+    """INT-04: keyset_filter con claves nulas o ausentes"""
+
+    @pytest.mark.parametrize('direction', [-1, 1])
+    def test_visits_every_row_once(self, docs, direction):
+        seen = paginate(docs, 'created_at', direction)
+
+        assert [d['_id'] for d in seen] == [d['_id'] for d in mongo_order(docs, 'created_at', direction)]
+
+    @pytest.mark.parametrize('direction', [-1, 1])
+    def test_with_base_query(self, docs, direction):
+        seen = paginate(docs, 'created_at', direction, base_query={'user_id': 'u1'})
+        expected = mongo_order([d for d in docs if d['user_id'] == 'u1'], 'created_at', direction)
+
+        assert [d['_id'] for d in seen] == [d['_id'] for d in expected]
+
+    def test_descending_nulls_come_after_values(self, docs):
+        seen = paginate(docs, 'created_at', -1, page_size=1)
+        keys = [d.get('created_at') for d in seen]
+
+        assert keys[-3:] == [None, None, None]
+        assert None not in keys[:-3]
@@ -0,0 +1,146 @@
+"""
+Pruebas de Integridad - Transacciones del ciclo de vida de reservas
+=====================================================================
+
+Validan que run_in_transaction aplica todas las escrituras de una
+transición (reserva, inventario, movimientos) o ninguna.
+
+Requiere MongoDB como replica set de un solo nodo (ver docker-compose.yml):
+    MONGODB_URI=mongodb://localhost:27017/?replicaSet=rs0
+
+Casos de Prueba:
+- INT-01: Una transición exitosa confirma todas las escrituras
+- INT-02: Un error a mitad de transición revierte inventario y reserva
+- INT-03: ReservationService (aprobar, rechazar, cancelar) revierte reserva,
+  inventario, movimientos y auditoría si falla después de escribir inventario
+"""
+
+import os
+import sys
+
+import pytest
+from bson import ObjectId
+
+sys.path.insert(0, os.path.abspath('.'))
+os.environ.setdefault('MONGODB_DB', 'pisos_kermy_test_db')
+
+from app.config.database import get_db, run_in_transaction, transactions_supported
+from app.constants.states import ReservationState
+from app.models.inventory import Inventory
+from app.models.reservation import Reservation
+from app.repositories.inventory_repository import InventoryRepository
+from app.repositories.reservation_repository import ReservationRepository
+from app.services.reservation_service import ReservationService
+
+
+class ReservationFixture:
+    """Reserva pendiente con 4 unidades retenidas de una variante"""
+
+    @pytest.fixture(autouse=True)
+    def setup(self):
+        assert transactions_supported(), "MongoDB debe ejecutarse como replica set"
+
+        self.db = get_db()
+        self.inventory_repo = InventoryRepository()
+        self.reservation_repo = ReservationRepository()
+
+        self.variant_id = ObjectId()
+        self.db.inventory.insert_one(
+            Inventory(variant_id=self.variant_id, stock_total=10, stock_retenido=4).to_dict()
+        )
+
+        self.reservation = self.reservation_repo.create(Reservation(
+            user_id=ObjectId(),
+            items=[{'variant_id': str(self.variant_id), 'quantity': 4}],
+            state=ReservationState.PENDING
+        ))
+
+        yield
+
+        self.db.inventory.delete_many({'variant_id': self.variant_id})
+        self.db.inventory_movements.delete_many({'variant_id': self.variant_id})
+        self.db.reservations.delete_one({'_id': self.reservation._id})
+        self.db.audit_logs.delete_many({'entity_id': self.reservation._id})
+
+
+class TestReservationTransactions(ReservationFixture):
+    """Transiciones de reserva dentro de una transacción"""
+
+    def _cancel(self, session, fail=False):
+        self.reservation_repo.transition_state(
+            self.reservation._id,
+            [ReservationState.PENDING],
+            {'state': ReservationState.CANCELLED},
+            session=session
+        )
+        self.inventory_repo.decrease_retained_stock(
+            self.variant_id, 4, reason='test_cancel', session=session
+        )
+        if fail:
+            raise RuntimeError("fallo simulado a mitad de transición")
+
+    def test_int_01_commit(self):
+        run_in_transaction(self._cancel)
+
+        inventory = self.inventory_repo.find_by_variant_id(self.variant_id)
+        reservation = self.reservation_repo.find_by_id(self.reservation._id)
+
+        assert inventory['stock_retenido'] == 0
+        assert reservation.state == ReservationState.CANCELLED
+        assert self.db.inventory_movements.count_documents({'variant_id': self.variant_id}) == 1
+
+    def test_int_02_rollback(self):
+        with pytest.raises(RuntimeError):
+            run_in_transaction(lambda session: self._cancel(session, fail=True))
+
+        inventory = self.inventory_repo.find_by_variant_id(self.variant_id)
+        reservation = self.reservation_repo.find_by_id(self.reservation._id)
+
+        assert inventory['stock_retenido'] == 4
+        assert reservation.state == ReservationState.PENDING
+        assert self.db.inventory_movements.count_documents({'variant_id': self.variant_id}) == 0
+
+
+class TestReservationServiceTransactions(ReservationFixture):
+    """INT-03: transiciones de ReservationService con fallo inyectado"""
+
+    @pytest.fixture(autouse=True)
+    def failing_service(self, setup, monkeypatch):
+        self.service = ReservationService()
+        log_audit = self.service._log_audit
+
+        # La auditoría es la última escritura: se registra en la sesión y luego falla
+        def log_audit_then_fail(*args, **kwargs):
+            log_audit(*args, **kwargs)
+            raise RuntimeError("fallo simulado después de escribir inventario")
+
+        monkeypatch.setattr(self.service, '_log_audit', log_audit_then_fail)
+
+    def _assert_rolled_back(self):
+        inventory = self.inventory_repo.find_by_variant_id(self.variant_id)
+        reservation = self.reservation_repo.find_by_id(self.reservation._id)
+
+        assert inventory['stock_retenido'] == 4
+        assert reservation.state == ReservationState.PENDING
+        assert self.db.inventory_movements.count_documents({'variant_id': self.variant_id}) == 0
+        assert self.db.audit_logs.count_documents({'entity_id': self.reservation._id}) == 0
+
+    def test_int_03_approve_rollback(self):
+        with pytest.raises(RuntimeError):
+            self.service.approve_reservation(str(self.reservation._id), str(ObjectId()))
+
+        self._assert_rolled_back()
+
+    def test_int_03_reject_rollback(self):
+        with pytest.raises(RuntimeError):
+            self.service.reject_reservation(str(self.reservation._id), str(ObjectId()))
+
+        self._assert_rolled_back()
+
+    def test_int_03_cancel_rollback(self):
+        with pytest.raises(RuntimeError):
+            self.service.cancel_reservation(
+                str(self.reservation._id), user_id=str(self.reservation.user_id)
+            )
+
+        self._assert_rolled_back()
@@ -0,0 +1,254 @@
+"""
+Pruebas de Rendimiento - Planes de consulta de los repositorios
+=================================================================
+
+Verifican con explain() que las consultas de los repositorios usan los
+índices declarados en app/config/indexes.py y nunca recurren a COLLSCAN.
+Cada prueba llama al método real del repositorio sobre una base que
+registra las consultas emitidas (QueryRecorder) y explica esas mismas
+consultas: un cambio de filtro u orden en el repositorio se detecta aquí.
+
+Requiere MongoDB accesible (MONGODB_URI). Usa una base de datos de prueba
+separada (MONGODB_TEST_DB) para no tocar datos reales.
+
+Casos de Prueba:
+- PERF-01: Consultas de inventario y variantes
+- PERF-02: Consultas de reservas (expiración, usuario, listados)
+- PERF-03: Tokens revocados y notificaciones
+- PERF-04: Búsqueda de productos (texto completo y prefijo)
+- PERF-05: Paginación por cursor (keyset) sin etapa SORT en memoria
+"""
+
+import os
+import sys
+from datetime import datetime, timedelta
+
+import pytest
+from bson import ObjectId
+from pymongo import MongoClient
+
+sys.path.insert(0, os.path.abspath('.'))
+
+from app.config import database
+from app.config.indexes import ensure_indexes, get_plan_stages, is_collscan
+from app.repositories.pagination import encode_cursor
+from app.repositories.catalog_repository import CatalogRepository
+from app.repositories.inventory_repository import InventoryRepository
+from app.repositories.notification_repository import NotificationRepository
+from app.repositories.product_repository import ProductRepository, VariantRepository
+from app.repositories.reservation_repository import ReservationRepository
+from app.utils.token_blocklist import token_blocklist
+
+
+MONGODB_URI = os.getenv('MONGODB_URI', 'mongodb://localhost:27017')
+MONGODB_TEST_DB = os.getenv('MONGODB_TEST_DB', 'pisos_kermy_test_db')
+
+
+class RecordingCollection:
+    """
+    Colección real que además guarda un cursor equivalente a cada lectura
+    (find, find_one, count_documents y el $match/$sort inicial de aggregate)
+    """
+
+    def __init__(self, collection, queries):
+        self._collection = collection
+        self._queries = queries
+
+    def find(self, *args, **kwargs):
+        cursor = self._collection.find(*args, **kwargs)
+        self._queries.append(cursor)
+        return cursor
+
+    def find_one(self, filter=None, *args, **kwargs):
+        if filter is not None and not isinstance(filter, dict):
+            filter = {'_id': filter}
+        return next(self.find(filter, *args, **kwargs).limit(-1), None)
+
+    def count_documents(self, filter, **kwargs):
+        self._queries.append(self._collection.find(filter))
+        return self._collection.count_documents(filter, **kwargs)
+
+    def aggregate(self, pipeline, **kwargs):
+        if pipeline and '$match' in pipeline[0]:
+            cursor = self._collection.find(pipeline[0]['$match'])
+            if len(pipeline) > 1 and '$sort' in pipeline[1]:
+                cursor = cursor.sort(list(pipeline[1]['$sort'].items()))
+            self._queries.append(cursor)
+        return self._collection.aggregate(pipeline, **kwargs)
+
+    def __getattr__(self, name):
+        return getattr(self._collection, name)
+
+
+class QueryRecorder:
+    """Base de prueba que registra las consultas de los repositorios"""
+
+    def __init__(self, db):
+        self._db = db
+        self.queries = []
+
+    def __getattr__(self, name):
+        return RecordingCollection(self._db[name], self.queries)
+
+    def __getitem__(self, name):
+        return RecordingCollection(self._db[name], self.queries)
+
+
+@pytest.fixture(scope='module')
+def db():
+    client = MongoClient(MONGODB_URI, serverSelectionTimeoutMS=5000)
+    test_db = client[MONGODB_TEST_DB]
+    ensure_indexes(test_db)
+    yield test_db
+    client.close()
+
+
+@pytest.fixture
+def recorder(db):
+    return QueryRecorder(db)
+
+
+def repository(cls, recorder):
+    repo = cls()
+    repo._db = recorder
+    local_cache = getattr(repo, 'local_cache', None)
+    if local_cache is not None:
+        # Una búsqueda cacheada no llegaría a MongoDB
+        local_cache.clear()
+    return repo
+
+
+def explain_queries(recorder, call):
+    """Ejecuta call() y retorna las etapas del plan de cada consulta emitida"""
+    recorder.queries.clear()
+    call()
+    assert recorder.queries, "El repositorio no emitió consultas"
+    return [get_plan_stages(cursor.explain()) for cursor in recorder.queries]
+
+
+def assert_indexed(recorder, call):
+    for stages in explain_queries(recorder, call):
+        assert 'COLLSCAN' not in stages, f"COLLSCAN en plan: {stages}"
+
+
+class TestInventoryQueryPlans:
+    """PERF-01: InventoryRepository / VariantRepository"""
+
+    def test_find_by_variant_id(self, recorder):
+        repo = repository(InventoryRepository, recorder)
+        assert_indexed(recorder, lambda: repo.find_by_variant_id(ObjectId()))
+
+    def test_find_low_stock(self, recorder):
+        repo = repository(InventoryRepository, recorder)
+        assert_indexed(recorder, lambda: repo.find_low_stock(threshold=10, limit=50))
+
+    def test_find_variants_by_product_id(self, recorder):
+        repo = repository(VariantRepository, recorder)
+        assert_indexed(recorder, lambda: repo.find_by_product_id(ObjectId()))
+
+    def test_get_movements_by_variant(self, recorder):
+        repo = repository(InventoryRepository, recorder)
+        assert_indexed(recorder, lambda: repo.get_movements(variant_id=ObjectId()))
+
+    def test_get_movements_by_type(self, recorder):
+        repo = repository(InventoryRepository, recorder)
+        assert_indexed(recorder, lambda: repo.get_movements(movement_type='retain'))
+
+    def test_get_movements_by_actor_and_date_range(self, recorder):
+        repo = repository(InventoryRepository, recorder)
+        assert_indexed(recorder, lambda: repo.get_movements_detailed(filters={
+            'actor_id': str(ObjectId()),
+            'date_from': datetime.utcnow() - timedelta(days=30),
+            'date_to': datetime.utcnow(),
+        }))
+
+
+class TestReservationQueryPlans:
+    """PERF-02: ReservationRepository"""
+
+    def test_find_expired(self, recorder):
+        repo = repository(ReservationRepository, recorder)
+        assert_indexed(recorder, repo.find_expired)
+
+    def test_find_by_user_id(self, recorder):
+        repo = repository(ReservationRepository, recorder)
+        assert_indexed(recorder, lambda: repo.find_by_user_id(ObjectId()))
+
+    def test_find_all_sorted(self, recorder):
+        repo = repository(ReservationRepository, recorder)
+        assert_indexed(recorder, repo.find_all)
+
+
+class TestAuthAndNotificationQueryPlans:
+    """PERF-03: token_blocklist / NotificationRepository"""
+
+    def test_is_token_revoked(self, recorder, monkeypatch):
+        # Sin Redis ni listener la consulta llega siempre a revoked_tokens
+        monkeypatch.setattr(database, 'get_db', lambda: recorder)
+        monkeypatch.setattr(database, 'redis_client', None)
+        assert_indexed(recorder, lambda: token_blocklist.is_revoked('jti-inexistente'))
+
+    def test_revoked_tokens_ttl_index(self, db):
+        ttl = [
+            idx for idx in db.revoked_tokens.list_indexes()
+            if 'expireAfterSeconds' in idx
+        ]
+        assert ttl and dict(ttl[0]['key']) == {'expires_at': 1}
+
+    def test_user_notifications(self, recorder):
+        repo = repository(NotificationRepository, recorder)
+        assert_indexed(recorder, lambda: repo.get_user_notifications(str(ObjectId())))
+
+    def test_unread_count(self, recorder):
+        repo = repository(NotificationRepository, recorder)
+        assert_indexed(recorder, lambda: repo.get_unread_count(str(ObjectId())))
+
+
+class TestProductSearchQueryPlans:
+    """PERF-04: ProductRepository.search_and_filter"""
+
+    def test_text_search(self, recorder):
+        repo = repository(ProductRepository, recorder)
+        assert_indexed(recorder, lambda: repo.search_and_filter(search_text='porcelanato'))
+
+    def test_prefix_search(self, recorder):
+        repo = repository(ProductRepository, recorder)
+        assert_indexed(recorder, lambda: repo.search_and_filter(prefix='porc'))
+
+
+class TestKeysetPaginationQueryPlans:
+    """PERF-05: páginas por cursor resueltas por el índice (clave, _id)"""
+
+    def _assert_keyset_plan(self, recorder, call):
+        for stages in explain_queries(recorder, call):
+            assert 'COLLSCAN' not in stages, f"Plan sin índice: {stages}"
+            assert 'SORT' not in stages, f"Orden en memoria: {stages}"
+
+    def test_reservations_by_user_page(self, recorder):
+        repo = repository(ReservationRepository, recorder)
+        token = encode_cursor(datetime.utcnow(), ObjectId())
+        self._assert_keyset_plan(recorder, lambda: repo.find_by_user_id(ObjectId(), cursor=token))
+
+    def test_movements_page(self, recorder):
+        repo = repository(InventoryRepository, recorder)
+        token = encode_cursor(datetime.utcnow(), ObjectId())
+        self._assert_keyset_plan(recorder, lambda: repo.get_movements(cursor=token))
+
+    def test_products_page(self, recorder):
+        repo = repository(ProductRepository, recorder)
+        token = encode_cursor('porcelanato', ObjectId())
+        self._assert_keyset_plan(recorder, lambda: repo.search_and_filter(cursor=token))
+
+    def test_notifications_page(self, recorder):
+        repo = repository(NotificationRepository, recorder)
+        token = encode_cursor(datetime.utcnow(), ObjectId())
+        self._assert_keyset_plan(
+            recorder, lambda: repo.get_user_notifications(str(ObjectId()), cursor=token)
+        )
+
+    def test_catalog_rename_batch(self, recorder):
+        # Lote por rango de _id tras el último procesado (colección vacía: sin escrituras)
+        repo = repository(CatalogRepository, recorder)
+        self._assert_keyset_plan(recorder, lambda: repo.propagate_rename(
+            'tags', 'porcelanato-inexistente', 'porcelanato', after_id=ObjectId(), batch_size=500
+        ))
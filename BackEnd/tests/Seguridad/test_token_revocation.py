@@ -0,0 +1,298 @@
+"""
+Pruebas de Seguridad - Revocación de tokens en memoria
+=======================================================
+
+Validan la consulta de revocación que corre en cada petición autenticada
+(utils/token_blocklist y utils/token_cache) sin MongoDB ni Redis: los
+niveles externos se reemplazan por dobles en memoria que registran si se
+consultaron.
+
+Casos de Prueba:
+- SEC-04: Filtro de Bloom sin falsos negativos
+- SEC-05: TokenBlocklist consulta Redis/MongoDB mientras el listener no está suscrito
+  y el relleno de la generación no pisa una más nueva
+- SEC-06: TokenCache descarta estados de revocación ('jti', 'gen', 'reset') y respeta exp/TTL
+"""
+
+import os
+import sys
+import time
+
+import pytest
+
+sys.path.insert(0, os.path.abspath('.'))
+
+from app.config import database
+from app.config.config import get_config
+from app.utils import token_cache as token_cache_module
+from app.utils.token_blocklist import BloomFilter, TokenBlocklist, REVOKED_JTI_PREFIX
+from app.utils.token_cache import TokenCache
+
+
+class InMemoryRedis:
+    """Subconjunto de redis-py usado por TokenBlocklist"""
+
+    def __init__(self, values=None):
+        self.values = dict(values or {})
+        self.reads = 0
+
+    def exists(self, key):
+        self.reads += 1
+        return int(key in self.values)
+
+    def get(self, key):
+        self.reads += 1
+        return self.values.get(key)
+
+    def setex(self, key, ttl, value):
+        self.values[key] = str(value)
+
+    def set(self, key, value, ex=None, nx=False):
+        if nx and key in self.values:
+            return None
+        self.values[key] = str(value)
+        return True
+
+
+class RevokedTokensCollection:
+    def __init__(self, jtis=()):
+        self.jtis = set(jtis)
+        self.reads = 0
+
+    def find_one(self, query, projection=None):
+        self.reads += 1
+        return {'_id': 1} if query.get('jti') in self.jtis else None
+
+
+class UsersCollection:
+    def __init__(self):
+        self.generation = 0
+        self.on_read = None
+
+    def find_one(self, query, projection=None):
+        generation = self.generation
+        if self.on_read:
+            self.on_read()
+        return {'_id': query['_id'], 'token_generation': generation}
+
+
+class InMemoryDb:
+    def __init__(self, jtis=()):
+        self.revoked_tokens = RevokedTokensCollection(jtis)
+        self.users = UsersCollection()
+
+
+@pytest.fixture
+def backends(monkeypatch):
+    """Redis y MongoDB en memoria para token_blocklist"""
+    redis = InMemoryRedis()
+    db = InMemoryDb()
+    monkeypatch.setattr(database, 'redis_client', redis)
+    monkeypatch.setattr(database, 'get_db', lambda: db)
+    return redis, db
+
+
+def make_blocklist(monkeypatch, running):
+    blocklist = TokenBlocklist()
+    blocklist._bloom = BloomFilter(capacity=1000, error_rate=0.001)
+    # Sin hilo listener: el estado de suscripción se fija en la prueba
+    monkeypatch.setattr(blocklist, 'ensure_started', lambda: None)
+    monkeypatch.setattr(TokenBlocklist, 'running', property(lambda self: running))
+    return blocklist
+
+
+class TestBloomFilter:
+    """SEC-04: BloomFilter"""
+
+    def test_no_false_negatives(self):
+        bloom = BloomFilter(capacity=5000, error_rate=0.001)
+        jtis = [f"jti-{i}" for i in range(5000)]
+        for jti in jtis:
+            bloom.add(jti)
+
+        assert all(jti in bloom for jti in jtis)
+        assert bloom.count == 5000
+
+    def test_false_positive_rate_within_capacity(self):
+        bloom = BloomFilter(capacity=5000, error_rate=0.01)
+        for i in range(5000):
+            bloom.add(f"revocado-{i}")
+
+        false_positives = sum(f"vigente-{i}" in bloom for i in range(20000))
+        assert false_positives / 20000 < 0.03
+
+
+class TestTokenBlocklist:
+    """SEC-05: TokenBlocklist.is_revoked / is_token_revoked"""
+
+    def test_bypasses_filter_while_not_running(self, monkeypatch, backends):
+        redis, db = backends
+        blocklist = make_blocklist(monkeypatch, running=False)
+        # Revocado en otro worker: el filtro local (vacío) no lo sabe
+        redis.values[f"{REVOKED_JTI_PREFIX}:jti-remoto"] = 'access'
+
+        assert blocklist.is_revoked('jti-remoto') is True
+
+    def test_falls_back_to_mongo_while_not_running(self, monkeypatch, backends):
+        redis, db = backends
+        blocklist = make_blocklist(monkeypatch, running=False)
+        db.revoked_tokens.jtis.add('jti-durable')
+
+        assert blocklist.is_revoked('jti-durable') is True
+        assert blocklist.is_revoked('jti-vigente') is False
+        assert db.revoked_tokens.reads == 2
+
+    def test_filter_answers_not_revoked_without_io(self, monkeypatch, backends):
+        redis, db = backends
+        blocklist = make_blocklist(monkeypatch, running=True)
+
+        assert blocklist.is_revoked('jti-vigente') is False
+        assert redis.reads == 0
+        assert db.revoked_tokens.reads == 0
+
+    def test_filter_maybe_is_confirmed_outside(self, monkeypatch, backends):
+        redis, db = backends
+        blocklist = make_blocklist(monkeypatch, running=True)
+        blocklist._bloom.add('jti-expirado')
+
+        # Positivo del filtro sin registro en Redis ni MongoDB
+        assert blocklist.is_revoked('jti-expirado') is False
+        assert redis.reads == 1
+        assert db.revoked_tokens.reads == 1
+
+    def test_revocation_message_updates_filter_and_callbacks(self, monkeypatch, backends):
+        blocklist = make_blocklist(monkeypatch, running=True)
+        events = []
+        blocklist.on_revocation(lambda kind, value: events.append((kind, value)))
+
+        blocklist._apply_message('jti:jti-revocado')
+        blocklist._apply_message('gen:user-1:3')
+
+        assert 'jti-revocado' in blocklist._bloom
+        assert blocklist._generations['user-1'] == 3
+        assert events == [('jti', 'jti-revocado'), ('gen', 'user-1')]
+
+    def test_older_generation_is_revoked(self, monkeypatch, backends):
+        blocklist = make_blocklist(monkeypatch, running=True)
+        blocklist._apply_message('gen:user-1:2')
+
+        assert blocklist.is_token_revoked({'sub': 'user-1', 'jti': 'a', 'gen': 1}) is True
+        assert blocklist.is_token_revoked({'sub': 'user-1', 'jti': 'b', 'gen': 2}) is False
+
+    def test_generation_fill_does_not_overwrite_newer(self, monkeypatch, backends):
+        redis, db = backends
+        blocklist = make_blocklist(monkeypatch, running=False)
+        user_id = '65a000000000000000000001'
+        key = f"token_gen:{user_id}"
+
+        # revoke_all de otro worker entre la lectura de MongoDB y la escritura en Redis
+        def revoke_all_meanwhile():
+            db.users.generation = 1
+            redis.values[key] = '1'
+        db.users.on_read = revoke_all_meanwhile
+
+        assert blocklist.get_generation(user_id) == 0
+        assert redis.values[key] == '1'
+
+
+class CountingBlocklist:
+    """Doble de token_blocklist para TokenCache"""
+
+    def __init__(self, running=True):
+        self.running = running
+        self.revoked = set()
+        self.calls = 0
+
+    def is_token_revoked(self, payload):
+        self.calls += 1
+        return payload['jti'] in self.revoked
+
+
+@pytest.fixture
+def blocklist(monkeypatch):
+    fake = CountingBlocklist()
+    monkeypatch.setattr(token_cache_module, 'token_blocklist', fake)
+    return fake
+
+
+class TestTokenCache:
+    """SEC-06: TokenCache"""
+
+    def test_revocation_status_is_cached(self, blocklist):
+        cache = TokenCache()
+        payload = {'sub': 'user-1', 'jti': 'jti-1'}
+
+        assert cache.is_token_revoked(payload) is False
+        assert cache.is_token_revoked(payload) is False
+        assert blocklist.calls == 1
+
+    def test_not_cached_while_listener_down(self, blocklist):
+        blocklist.running = False
+        cache = TokenCache()
+        payload = {'sub': 'user-1', 'jti': 'jti-1'}
+
+        cache.is_token_revoked(payload)
+        cache.is_token_revoked(payload)
+        assert blocklist.calls == 2
+
+    def test_jti_event_drops_only_that_jti(self, blocklist):
+        cache = TokenCache()
+        cache.is_token_revoked({'sub': 'user-1', 'jti': 'jti-1'})
+        cache.is_token_revoked({'sub': 'user-1', 'jti': 'jti-2'})
+
+        blocklist.revoked.add('jti-1')
+        cache.on_revocation('jti', 'jti-1')
+
+        assert cache.is_token_revoked({'sub': 'user-1', 'jti': 'jti-1'}) is True
+        assert cache.is_token_revoked({'sub': 'user-1', 'jti': 'jti-2'}) is False
+        assert blocklist.calls == 3
+
+    @pytest.mark.parametrize('kind,value', [('gen', 'user-1'), ('reset', None)])
+    def test_gen_and_reset_events_clear_all(self, blocklist, kind, value):
+        cache = TokenCache()
+        cache.is_token_revoked({'sub': 'user-1', 'jti': 'jti-1'})
+        cache.is_token_revoked({'sub': 'user-2', 'jti': 'jti-2'})
+
+        cache.on_revocation(kind, value)
+
+        cache.is_token_revoked({'sub': 'user-1', 'jti': 'jti-1'})
+        cache.is_token_revoked({'sub': 'user-2', 'jti': 'jti-2'})
+        assert blocklist.calls == 4
+
+    def test_revocation_during_lookup_is_not_stored(self, blocklist):
+        cache = TokenCache()
+
+        def revoke_while_querying(payload):
+            blocklist.calls += 1
+            # Llega una revocación mientras se consulta la blocklist
+            cache.on_revocation('gen', payload['sub'])
+            return False
+
+        blocklist.is_token_revoked = revoke_while_querying
+        cache.is_token_revoked({'sub': 'user-1', 'jti': 'jti-1'})
+        cache.is_token_revoked({'sub': 'user-1', 'jti': 'jti-1'})
+        assert blocklist.calls == 2
+
+    def test_revocation_status_expires_after_ttl(self, blocklist, monkeypatch):
+        monkeypatch.setattr(get_config(), 'TOKEN_CACHE_TTL', -1)
+        cache = TokenCache()
+        payload = {'sub': 'user-1', 'jti': 'jti-1'}
+
+        cache.is_token_revoked(payload)
+        cache.is_token_revoked(payload)
+        assert blocklist.calls == 2
+
+    def test_claims_honour_token_exp(self):
+        cache = TokenCache()
+        cache.set_claims('token-vigente', {'sub': 'user-1', 'exp': time.time() + 300})
+        cache.set_claims('token-expirado', {'sub': 'user-1', 'exp': time.time() - 1})
+
+        assert cache.get_claims('token-vigente')['sub'] == 'user-1'
+        assert cache.get_claims('token-expirado') is None
+
+    def test_claims_expire_after_ttl(self, monkeypatch):
+        monkeypatch.setattr(get_config(), 'TOKEN_CACHE_TTL', -1)
+        cache = TokenCache()
+        cache.set_claims('token', {'sub': 'user-1', 'exp': time.time() + 300})
+
+        assert cache.get_claims('token') is None
@@ -11,7 +11,6 @@ MEJORAS:
 import sys
 import os
 from datetime import datetime
-from werkzeug.security import generate_password_hash
 from bson import ObjectId
 from pymongo import MongoClient
 from dotenv import load_dotenv
@@ -23,6 +22,7 @@ load_dotenv()
 sys.path.insert(0, os.path.abspath('.'))
 
 from app.constants.roles import UserRole
+from app.utils.password_hasher import password_hasher
 from app.constants.states import ProductState
 
 
@@ -66,7 +66,7 @@ def create_users(db):
     users = [
         {
             'email': 'admin@pisoskermy.com',
-            'password': generate_password_hash('Admin123!'),
+            'password': password_hasher.hash('Admin123!'),
             'name': 'Administrador Pisos Kermy',
             'phone': '88888888',
             'role': UserRole.ADMIN,
@@ -76,7 +76,7 @@ def create_users(db):
         },
         {
             'email': 'cliente1@example.com',
-            'password': generate_password_hash('Cliente123!'),
+            'password': password_hasher.hash('Cliente123!'),
             'name': 'Juan Perez',
             'phone': '87654321',
             'role': UserRole.CLIENT,
@@ -86,7 +86,7 @@ def create_users(db):
         },
         {
             'email': 'cliente2@example.com',
-            'password': generate_password_hash('Cliente123!'),
+            'password': password_hasher.hash('Cliente123!'),
             'name': 'Maria Rodriguez',
             'phone': '87654322',
             'role': UserRole.CLIENT,
@@ -354,6 +354,8 @@ def create_products_and_inventory(db):
     print(f"\nCreando {len(inventory_records)} registros de inventario:")
 
     for inv in inventory_records:
+        # Campo mantenido que usan find_low_stock y los filtros de stock
+        inv['disponible'] = max(0, inv['stock_total'] - inv['stock_retenido'])
         inv['actualizado_en'] = datetime.utcnow()
         inv['creado_en'] = datetime.utcnow()
 
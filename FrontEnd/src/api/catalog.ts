@@ -1,10 +1,26 @@
 import { apiGet, apiPost, apiPut, apiDelete } from "./http";
 
+export type CatalogRename = {
+  id: string;
+  kind: "category" | "tag";
+  entity_id: string;
+  old_name: string;
+  new_name: string;
+  state: "pending" | "running" | "done" | "failed";
+  progress: { processed: number; total: number | null; percent: number };
+  attempts: number;
+  error: string | null;
+  created_at: string | null;
+  finished_at: string | null;
+};
+
 export type CatalogCategory = {
   _id: string;
   name: string;
   slug: string;
   productCount: number;
+  // Solo al renombrar: propagación a productos en segundo plano
+  rename?: CatalogRename | null;
 };
 
 export type CatalogTag = {
@@ -12,6 +28,7 @@ export type CatalogTag = {
   name: string;
   slug: string;
   productCount: number;
+  rename?: CatalogRename | null;
 };
 
 export async function fetchCatalogCategories(): Promise<CatalogCategory[]> {
@@ -51,3 +68,8 @@ export async function updateCatalogTag(id: string, name: string): Promise<Catalo
 export async function deleteCatalogTag(id: string): Promise<void> {
   await apiDelete(`/api/catalog/tags/${id}`);
 }
+
+export async function fetchCatalogRename(id: string): Promise<CatalogRename> {
+  const data = await apiGet<{ rename: CatalogRename }>(`/api/catalog/renames/${id}`);
+  return data.rename;
+}
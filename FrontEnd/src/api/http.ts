@@ -188,6 +188,23 @@ export async function apiDelete<T>(path: string): Promise<T> {
   return res.json() as Promise<T>;
 }
 
+// Respuesta en streaming (SSE): EventSource no permite enviar la cabecera
+// Authorization, así que se usa fetch y se lee el body incrementalmente
+export async function apiStream(path: string, signal: AbortSignal): Promise<Response> {
+  const res = await fetchWithAuth(`${API_URL}${path}`, {
+    method: "GET",
+    headers: { Accept: "text/event-stream" },
+    signal,
+  });
+
+  if (!res.ok || !res.body) {
+    const text = await res.text();
+    throw new Error(text || `HTTP ${res.status}`);
+  }
+
+  return res;
+}
+
 // src/api/http.ts
 export async function apiDownload(path: string): Promise<{ blob: Blob; filename: string | null }> {
   const res = await fetchWithAuth(`${API_URL}${path}`, { method: "GET" });
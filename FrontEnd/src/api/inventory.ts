@@ -103,14 +103,24 @@ export async function fetchInventoryMovements(params?: {
     limit?: number;
     movement_type?: string;
     variant_id?: string;
+    actor_id?: string;
+    product?: string;
+    date_from?: string;
+    date_to?: string;
+    cursor?: string;
   }) {
     const qs = new URLSearchParams();
     if (params?.skip != null) qs.set("skip", String(params.skip));
     if (params?.limit != null) qs.set("limit", String(params.limit));
     if (params?.movement_type) qs.set("movement_type", params.movement_type);
     if (params?.variant_id) qs.set("variant_id", params.variant_id);
+    if (params?.actor_id) qs.set("actor_id", params.actor_id);
+    if (params?.product) qs.set("product", params.product);
+    if (params?.date_from) qs.set("date_from", params.date_from);
+    if (params?.date_to) qs.set("date_to", params.date_to);
+    if (params?.cursor) qs.set("cursor", params.cursor);
 
-    return apiGet<{ movements: InventoryMovement[] }>(`/api/inventory/movements?${qs.toString()}`);
+    return apiGet<{ movements: InventoryMovement[]; next_cursor: string | null }>(`/api/inventory/movements?${qs.toString()}`);
   }
 
 // Get all inventory for admin
@@ -1,4 +1,4 @@
-import { apiGet, apiPut, apiDelete } from "./http";
+import { apiGet, apiPut, apiDelete, apiStream } from "./http";
 
 export interface Notification {
   id: string;
@@ -24,6 +24,31 @@ export interface UnreadCountResponse {
   unread_count: number;
 }
 
+export interface NotificationStreamHandlers {
+  // Contador completo: al conectar y al resincronizar
+  onUnreadCount: (count: number) => void;
+  onNotification: (notification: Notification, unreadDelta: number) => void;
+  onUnreadDelta: (delta: number) => void;
+}
+
+const STREAM_RECONNECT_MS = 5000;
+
+function dispatchStreamEvent(block: string, handlers: NotificationStreamHandlers) {
+  let event = "message";
+  const data: string[] = [];
+  for (const line of block.split("\n")) {
+    if (line.startsWith("event:")) event = line.slice(6).trim();
+    else if (line.startsWith("data:")) data.push(line.slice(5).trim());
+  }
+  // Comentarios (": keepalive") no traen data
+  if (data.length === 0) return;
+
+  const payload = JSON.parse(data.join("\n"));
+  if (event === "unread_count") handlers.onUnreadCount(payload);
+  else if (event === "notification") handlers.onNotification(payload.notification, payload.unread_delta);
+  else if (event === "unread_delta") handlers.onUnreadDelta(payload.delta);
+}
+
 const notificationService = {
   // Obtener notificaciones del usuario
   getNotifications: async (params?: {
@@ -60,6 +85,42 @@ const notificationService = {
   deleteNotification: async (notificationId: string): Promise<void> => {
     await apiDelete<void>(`/api/notifications/${notificationId}`);
   },
+
+  // Suscribirse al stream SSE; reconecta hasta que se llame a la funcion retornada
+  subscribe: (handlers: NotificationStreamHandlers): (() => void) => {
+    const controller = new AbortController();
+
+    const run = async () => {
+      while (!controller.signal.aborted) {
+        try {
+          const res = await apiStream("/api/notifications/stream", controller.signal);
+          const reader = res.body!.pipeThrough(new TextDecoderStream()).getReader();
+          let buffer = "";
+
+          while (true) {
+            const { value, done } = await reader.read();
+            if (done) break;
+            buffer += value;
+
+            let boundary;
+            while ((boundary = buffer.indexOf("\n\n")) !== -1) {
+              dispatchStreamEvent(buffer.slice(0, boundary), handlers);
+              buffer = buffer.slice(boundary + 2);
+            }
+          }
+          // El servidor cierra al expirar el token: reconectar con el actual
+          continue;
+        } catch (error) {
+          if (controller.signal.aborted) return;
+          console.error("Stream de notificaciones desconectado:", error);
+        }
+        await new Promise((resolve) => setTimeout(resolve, STREAM_RECONNECT_MS));
+      }
+    };
+
+    run();
+    return () => controller.abort();
+  },
 };
 
 export default notificationService;
\ No newline at end of file
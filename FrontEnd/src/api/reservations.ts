@@ -78,20 +78,50 @@ export type ExportReservationsParams = {
   date_to?: string;   // YYYY-MM-DD
 };
 
-export async function exportReservations(params: ExportReservationsParams) {
-  const qs = new URLSearchParams();
-  qs.set("format", params.format);
+export type ExportJob = {
+  id: string;
+  state: "pending" | "running" | "done" | "failed";
+  format: "csv" | "xlsx";
+  progress: { rows: number; total_rows: number | null; percent: number };
+  filename: string | null;
+  error: string | null;
+  expires_at: string | null;
+};
+
+const EXPORT_POLL_INTERVAL_MS = 1000;
+
+// La exportación se genera en segundo plano: se encola, se consulta el
+// progreso y al terminar se descarga el archivo
+export async function exportReservations(
+  params: ExportReservationsParams,
+  onProgress?: (job: ExportJob) => void
+) {
+  const { job: created } = await apiPost<{ job: ExportJob }>(`/api/reservations/export/jobs`, {
+    format: params.format,
+    state: params.state || undefined,
+    date_from: params.date_from || undefined,
+    date_to: params.date_to || undefined,
+  });
+
+  let job = created;
+  onProgress?.(job);
+
+  while (job.state === "pending" || job.state === "running") {
+    await new Promise((resolve) => setTimeout(resolve, EXPORT_POLL_INTERVAL_MS));
+    ({ job } = await apiGet<{ job: ExportJob }>(`/api/reservations/export/jobs/${job.id}`));
+    onProgress?.(job);
+  }
 
-  if (params.state) qs.set("state", params.state);
-  if (params.date_from) qs.set("date_from", params.date_from);
-  if (params.date_to) qs.set("date_to", params.date_to);
+  if (job.state === "failed") {
+    throw new Error(job.error || "La exportación falló");
+  }
 
-  const { blob, filename } = await apiDownload(`/api/reservations/export?${qs.toString()}`);
+  const { blob, filename } = await apiDownload(`/api/reservations/export/jobs/${job.id}/download`);
 
   const url = URL.createObjectURL(blob);
   const a = document.createElement("a");
   a.href = url;
-  a.download = filename || `reservas.${params.format}`;
+  a.download = filename || job.filename || `reservas.${params.format}`;
   document.body.appendChild(a);
   a.click();
   a.remove();
@@ -58,16 +58,24 @@ const AdminLayout = ({ children }: AdminLayoutProps) => {
   const navigate = useNavigate();
   const { user, logout } = useAuth();
 
-  // Cargar notificaciones al montar el componente y cada 30 segundos
+  // Cargar notificaciones al montar y recibir cambios por el stream SSE
   useEffect(() => {
     loadNotifications();
-    
-    // Polling cada 30 segundos para nuevas notificaciones
-    const interval = setInterval(() => {
-      loadNotifications();
-    }, 30000);
-    
-    return () => clearInterval(interval);
+
+    const unsubscribe = notificationService.subscribe({
+      onUnreadCount: (count) => setUnreadCount(count),
+      onNotification: (notification, unreadDelta) => {
+        setNotifications((prev) =>
+          prev.some((n) => n.id === notification.id)
+            ? prev
+            : [notification, ...prev].slice(0, 20)
+        );
+        setUnreadCount((prev) => Math.max(0, prev + unreadDelta));
+      },
+      onUnreadDelta: (delta) => setUnreadCount((prev) => Math.max(0, prev + delta)),
+    });
+
+    return unsubscribe;
   }, []);
 
   const loadNotifications = async () => {
@@ -98,13 +106,8 @@ const AdminLayout = ({ children }: AdminLayoutProps) => {
       await notificationService.deleteNotification(id);
       
       // Actualizar estado local - eliminar de la lista
+      // (el contador llega por el stream como unread_delta)
       setNotifications((prev) => prev.filter((n) => n.id !== id));
-      
-      // Decrementar contador si no estaba leída
-      const notification = notifications.find((n) => n.id === id);
-      if (notification && !notification.read) {
-        setUnreadCount((prev) => Math.max(0, prev - 1));
-      }
     } catch (error) {
       console.error("Error eliminando notificación:", error);
     }
@@ -114,8 +117,8 @@ const AdminLayout = ({ children }: AdminLayoutProps) => {
     try {
       setLoadingNotifications(true);
       await notificationService.markAllAsRead();
-      // Recargar notificaciones
-      await loadNotifications();
+      // El contador llega por el stream como unread_delta
+      setNotifications((prev) => prev.map((n) => ({ ...n, read: true })));
     } catch (error) {
       console.error("Error marcando todas como leídas:", error);
     } finally {